@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import functools
+import statistics
+from typing import Any, Callable, Dict, List, Optional
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from clickhouse_driver import Client
+from src.database.clickhouse_client import ClickHouseClient
+
+# Orders table DDL per schema variant; None keeps the schema created by ClickHouseClient
+SCHEMA_VARIANTS: Dict[str, Optional[str]] = {
+    'current': None,
+    'unsampled': '''
+        CREATE TABLE IF NOT EXISTS orders (
+            id UInt64, name String, email String,
+            created_at DateTime, updated_at DateTime, processed_at DateTime,
+            total_price Decimal(10,2), subtotal_price Decimal(10,2),
+            total_tax Decimal(10,2), total_discounts Decimal(10,2),
+            currency String, financial_status String, fulfillment_status String,
+            customer_id UInt64, customer_email String, customer_first_name String,
+            customer_last_name String, customer_phone String,
+            billing_address_city String, billing_address_province String, billing_address_country String,
+            shipping_address_city String, shipping_address_province String, shipping_address_country String,
+            note String, tags String
+        ) ENGINE = ReplacingMergeTree()
+        ORDER BY (id, created_at)
+    '''
+}
+
+# Deterministic synthetic data: every value is a hash of the row number
+ORDERS_INSERT = """
+INSERT INTO orders
+SELECT
+    number + 1 AS id,
+    concat('#', toString(1000 + number % 9000)) AS name,
+    concat(lower(first_name), '.', lower(last_name), toString(customer), '@example.com') AS email,
+    toDateTime('2024-01-01 00:00:00') + toIntervalSecond(cityHash64(number, 'created') % (365 * 86400)) AS created_at,
+    created_at + toIntervalDay(1 + cityHash64(number, 'updated') % 5) AS updated_at,
+    created_at AS processed_at,
+    toDecimal64(round(subtotal - discounts + subtotal * 0.06, 2), 2) AS total_price,
+    toDecimal64(round(subtotal, 2), 2) AS subtotal_price,
+    toDecimal64(round(subtotal * 0.06, 2), 2) AS total_tax,
+    toDecimal64(round(discounts, 2), 2) AS total_discounts,
+    'USD' AS currency,
+    ['paid', 'pending', 'refunded'][1 + cityHash64(number, 'financial') % 3] AS financial_status,
+    ['fulfilled', 'partial', 'unfulfilled', ''][1 + cityHash64(number, 'fulfillment') % 4] AS fulfillment_status,
+    customer AS customer_id,
+    email AS customer_email,
+    first_name AS customer_first_name,
+    last_name AS customer_last_name,
+    concat('555-', leftPad(toString(customer % 10000), 4, '0')) AS customer_phone,
+    city AS billing_address_city,
+    province AS billing_address_province,
+    'United States' AS billing_address_country,
+    city AS shipping_address_city,
+    province AS shipping_address_province,
+    'United States' AS shipping_address_country,
+    '' AS note,
+    if(cityHash64(number, 'returning') % 5 < 2, 'Returning Customer', 'New Customer') AS tags
+FROM (
+    SELECT
+        number,
+        1 + cityHash64(number, 'customer') % {customers} AS customer,
+        ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda'][1 + customer % 8] AS first_name,
+        ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis'][1 + intDiv(customer, 8) % 8] AS last_name,
+        ['New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix', 'Seattle'][1 + cityHash64(number, 'city') % 6] AS city,
+        ['NY', 'CA', 'IL', 'TX', 'AZ', 'WA'][1 + cityHash64(number, 'city') % 6] AS province,
+        20 + (cityHash64(number, 'price') % 98000) / 100 AS subtotal,
+        if(cityHash64(number, 'discount') % 10 < 3, subtotal * (0.1 + (cityHash64(number, 'rate') % 20) / 100), 0) AS discounts
+    FROM numbers({orders})
+)
+"""
+
+ORDER_ITEMS_INSERT = """
+INSERT INTO order_items
+SELECT
+    number + 1 AS id,
+    1 + intDiv(number, {items_per_order}) AS order_id,
+    concat('Product ', toString(product)) AS name,
+    toDecimal64(round(price, 2), 2) AS price,
+    toUInt32(1 + cityHash64(number, 'quantity') % 3) AS quantity,
+    concat('SKU-', toString(product), '-', toString(variant)) AS sku,
+    concat('Product ', toString(product)) AS title,
+    39072856 + product * 3 + variant AS variant_id,
+    632910392 + product AS product_id,
+    toDecimal64(round(if(cityHash64(number, 'discount') % 10 < 3, price * 0.1, 0), 2), 2) AS total_discount,
+    toDateTime('2024-01-01 00:00:00')
+        + toIntervalSecond(cityHash64(intDiv(number, {items_per_order}), 'created') % (365 * 86400)) AS order_created_at
+FROM (
+    SELECT
+        number,
+        cityHash64(number, 'product') % 50 AS product,
+        cityHash64(number, 'variant') % 3 AS variant,
+        10 + (cityHash64(number, 'price') % 50000) / 100 AS price
+    FROM numbers({items})
+)
+"""
+
+
+def bootstrap_client() -> Client:
+    """Driver client on the default database, used to create and inspect benchmark databases"""
+    return Client(
+        host=os.getenv('CLICKHOUSE_HOST', '127.0.0.1'),
+        port=int(os.getenv('CLICKHOUSE_PORT', 9000)),
+        user=os.getenv('CLICKHOUSE_USER', 'default'),
+        password=os.getenv('CLICKHOUSE_PASSWORD', '')
+    )
+
+
+def prepare_database(admin: Client, schema: str, orders: int, items_per_order: int, regenerate: bool) -> str:
+    """
+    Create the database of a schema variant and fill it with synthetic data
+
+    Data is generated server-side with INSERT ... SELECT FROM numbers(), so it
+    is deterministic and never passes through Python. Existing data of the
+    right size is reused.
+
+    Returns:
+        Database name
+    """
+    database = f"analytics_bench_{schema}"
+    if regenerate:
+        admin.execute(f"DROP DATABASE IF EXISTS {database}")
+    admin.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+    if SCHEMA_VARIANTS[schema]:
+        admin.execute(SCHEMA_VARIANTS[schema].replace('EXISTS orders', f'EXISTS {database}.orders'))
+
+    os.environ['CLICKHOUSE_DATABASE'] = database
+    client = ClickHouseClient()  # creates any missing tables with the repo's schema
+    existing = client.execute_query("SELECT count() FROM orders")[0][0]
+    if existing != orders:
+        print(f"Generating {orders:,} orders in {database}...")
+        client.execute_query("TRUNCATE TABLE orders")
+        client.execute_query("TRUNCATE TABLE order_items")
+        customers = max(1, orders * 2 // 5)
+        client.execute_query(ORDERS_INSERT.format(orders=orders, customers=customers))
+        client.execute_query(ORDER_ITEMS_INSERT.format(items=orders * items_per_order, items_per_order=items_per_order))
+        client.force_merge('orders')
+        client.force_merge('order_items')
+    return database
+
+
+def analytics_methods(approximate: bool) -> Dict[str, Callable[[], Any]]:
+    """Every get_* method of ShopifyAnalytics and BaseAnalytics, bound to fresh instances"""
+    from src.analytics.base.base_analytics import BaseAnalytics
+    from src.analytics.shopify_analytics import ShopifyAnalytics
+
+    targets = [ShopifyAnalytics(ClickHouseClient(), approximate=approximate), BaseAnalytics(approximate=approximate)]
+    methods = {}
+    for target in targets:
+        for name in sorted(dir(target)):
+            if name.startswith('get_') and callable(getattr(target, name)):
+                methods[f"{type(target).__name__}.{name}"] = getattr(target, name)
+    if not approximate:
+        methods["BaseAnalytics.get_all_metrics[fused]"] = functools.partial(targets[1].get_all_metrics, fused=True)
+    return methods
+
+
+def _drop_caches(client: ClickHouseClient) -> None:
+    """Drop ClickHouse caches so the next run is cold; the OS page cache is left alone"""
+    for cache in ('MARK CACHE', 'UNCOMPRESSED CACHE', 'QUERY CACHE'):
+        try:
+            client.execute_query(f"SYSTEM DROP {cache}")
+        except Exception:
+            pass  # not supported by this server version or not permitted
+
+
+def _owner_client(method: Callable[[], Any]) -> ClickHouseClient:
+    target = method.func.__self__ if isinstance(method, functools.partial) else method.__self__
+    return target.client
+
+
+def run_method(method: Callable[[], Any], tag: str) -> Dict[str, Any]:
+    """Run a method once, tagging its queries so query_log entries can be found later"""
+    client = _owner_client(method)
+    client.reset_query_stats()
+    client.client.settings['log_comment'] = tag
+    try:
+        start = time.perf_counter()
+        method()
+        wall_time = time.perf_counter() - start
+    finally:
+        client.client.settings.pop('log_comment', None)
+    return dict(client.query_stats, wall_time=wall_time)
+
+
+def benchmark_variant(run_id: str, variant: str, approximate: bool, warm_runs: int) -> Dict[str, Dict[str, Any]]:
+    """Time every method cold, then warm_runs more times, in the current database"""
+    results = {}
+    for name, method in analytics_methods(approximate).items():
+        _drop_caches(_owner_client(method))
+        cold_tag = f"analytics-bench:{run_id}:{variant}:{name}:cold"
+        try:
+            cold = run_method(method, cold_tag)
+            warm = [run_method(method, f"analytics-bench:{run_id}:{variant}:{name}:warm") for _ in range(warm_runs)]
+        except Exception as e:
+            print(f"  {name} failed: {str(e).splitlines()[0]}")
+            continue
+        results[name] = {
+            'cold_seconds': cold['wall_time'],
+            'warm_seconds': statistics.median(run['wall_time'] for run in warm) if warm else None,
+            'queries': cold['queries'],
+            'read_rows': cold['read_rows'],
+            'read_bytes': cold['read_bytes'],
+            'result_rows': cold['result_rows'],
+            'log_comment': cold_tag
+        }
+        print(f"  {name}: {cold['wall_time']:.3f}s cold")
+    return results
+
+
+def attach_memory_usage(admin: Client, run_id: str, results: Dict[str, Dict[str, Dict[str, Any]]]) -> None:
+    """Add the peak query memory of each cold run, read from system.query_log"""
+    admin.execute("SYSTEM FLUSH LOGS")
+    rows = admin.execute(
+        "SELECT log_comment, max(memory_usage) FROM system.query_log "
+        "WHERE type = 'QueryFinish' AND log_comment LIKE %(prefix)s GROUP BY log_comment",
+        {'prefix': f"analytics-bench:{run_id}:%"}
+    )
+    peak_memory = dict(rows)
+    for variant_results in results.values():
+        for result in variant_results.values():
+            result['peak_memory_bytes'] = peak_memory.get(result.pop('log_comment'))
+
+
+def print_comparison(results: Dict[str, Dict[str, Dict[str, Any]]]) -> None:
+    """Print one row per method and variant, with speedups relative to the first variant"""
+    variants = list(results)
+    methods = sorted({name for variant_results in results.values() for name in variant_results})
+    reference = variants[0]
+
+    header = (f"{'method':<48} {'variant':<22} {'cold (s)':>9} {'warm (s)':>9} {'vs ' + reference:>14} "
+              f"{'rows read':>13} {'MB read':>9} {'peak MB':>9}")
+    print(header)
+    print('-' * len(header))
+    for name in methods:
+        base = results[reference].get(name)
+        for variant in variants:
+            result = results[variant].get(name)
+            if result is None:
+                continue
+            warm = result['warm_seconds']
+            if base and base.get('warm_seconds') and warm:
+                relative = f"{base['warm_seconds'] / warm:.2f}x"
+            else:
+                relative = '-'
+            memory = result.get('peak_memory_bytes')
+            print(f"{name:<48} {variant:<22} {result['cold_seconds']:>9.3f} "
+                  f"{'-' if warm is None else format(warm, '.3f'):>9} {relative:>14} "
+                  f"{result['read_rows']:>13,} {result['read_bytes'] / 1e6:>9.1f} "
+                  f"{'-' if memory is None else format(memory / 1e6, '.1f'):>9}")
+
+
+def main():
+    """Benchmark analytics queries on synthetic data across schema and query variants"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--orders', type=int, default=1000000, help="Number of synthetic orders")
+    parser.add_argument('--items-per-order', type=int, default=3, help="Line items per order")
+    parser.add_argument('--schemas', default='current', help=f"Comma-separated schema variants: {', '.join(SCHEMA_VARIANTS)}")
+    parser.add_argument('--modes', default='exact', help="Comma-separated query modes: exact, approximate")
+    parser.add_argument('--warm-runs', type=int, default=3, help="Warm runs per method, the median is reported")
+    parser.add_argument('--regenerate', action='store_true', help="Drop and regenerate the benchmark databases")
+    parser.add_argument('--save', help="Write results to this JSON file")
+    parser.add_argument('--against', action='append', default=[],
+                        help="Results JSON of an earlier run to include as variants, e.g. from another branch")
+    args = parser.parse_args()
+
+    schemas = [schema for schema in args.schemas.split(',') if schema]
+    modes = [mode for mode in args.modes.split(',') if mode]
+    unknown = (set(schemas) - set(SCHEMA_VARIANTS)) | (set(modes) - {'exact', 'approximate'})
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(sorted(unknown))}")
+
+    admin = bootstrap_client()
+    run_id = uuid.uuid4().hex[:8]
+    results: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for path in args.against:
+        with open(path, encoding='utf-8') as f:
+            label = os.path.splitext(os.path.basename(path))[0]
+            for variant, variant_results in json.load(f).items():
+                results[f"{label}:{variant}"] = variant_results
+
+    current: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for schema in schemas:
+        prepare_database(admin, schema, args.orders, args.items_per_order, args.regenerate)
+        for mode in modes:
+            variant = f"{schema}/{mode}"
+            print(f"Benchmarking {variant}")
+            current[variant] = benchmark_variant(run_id, variant, mode == 'approximate', args.warm_runs)
+    attach_memory_usage(admin, run_id, current)
+    results.update(current)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    print()
+    print_comparison(results)
+
+
+if __name__ == "__main__":
+    main()
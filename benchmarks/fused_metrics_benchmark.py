@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+from typing import Any, Dict, Tuple
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.analytics.base.base_analytics import BaseAnalytics
+
+
+def run_metrics(analytics: BaseAnalytics, fused: bool) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Run get_all_metrics once and return its result with the server-side query statistics"""
+    analytics.client.reset_query_stats()
+    start = time.perf_counter()
+    metrics = analytics.get_all_metrics(fused=fused)
+    stats = dict(analytics.client.query_stats, wall_time=time.perf_counter() - start)
+    return metrics, stats
+
+
+def main():
+    """Compare the separate-query and fused modes of BaseAnalytics.get_all_metrics"""
+    analytics = BaseAnalytics()
+    separate_metrics, separate = run_metrics(analytics, fused=False)
+    fused_metrics, fused = run_metrics(analytics, fused=True)
+
+    print(f"{'mode':<10} {'queries':>8} {'rows read':>14} {'bytes read':>16} {'wall time (s)':>14}")
+    for name, stats in (("separate", separate), ("fused", fused)):
+        print(f"{name:<10} {stats['queries']:>8} {stats['read_rows']:>14,} "
+              f"{stats['read_bytes']:>16,} {stats['wall_time']:>14.3f}")
+
+    if separate['read_bytes']:
+        saved = 1 - fused['read_bytes'] / separate['read_bytes']
+        print(f"\nFused mode scanned {saved:.1%} fewer bytes")
+
+    if separate_metrics != fused_metrics:
+        print("WARNING: fused metrics differ from separate metrics")
+        sys.exit(1)
+    print("Fused metrics match separate metrics")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tracemalloc
+import multiprocessing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.database.clickhouse_client import ClickHouseClient
+from src.etl.extractor import ShopifyDataExtractor
+from src.etl.loader import ShopifyDataLoader
+from src.etl.pipeline import ETLPipeline
+from src.etl.transformer import ShopifyDataTransformer
+from src.interfaces.event_queue import EventQueue
+from src.interfaces.file_watcher import FileWatcher
+from src.utils.data_generator import VectorizedOrderGenerator
+
+DEFAULT_BASELINE = os.path.join(project_root, 'benchmarks', 'ingest_baseline.json')
+DEFAULT_DATA_DIR = os.path.join(project_root, 'benchmarks', '.data')
+
+DATASET_SEED = 0
+DATASET_END_DATE = datetime(2024, 1, 1)
+ORDERS_PER_FILE = 10000
+
+# Stages measured on the first file only to estimate allocations per row
+ALLOCATION_SAMPLE_ROWS = 2000
+
+STAGES = ('read_json', 'extract_order', 'transform_orders', 'insert_data', 'pipeline_run')
+
+
+class RecordingDriver:
+    """Stands in for clickhouse_driver.Client, recording inserted columns instead of sending them"""
+
+    def __init__(self):
+        self.inserted_rows: Dict[str, int] = {}
+        self.columns: Dict[str, List[str]] = {}
+        self.queries: List[str] = []
+
+    def execute(self, query: str, params: Any = None, **kwargs) -> Any:
+        if query.startswith('INSERT INTO') and params is not None:
+            table = query.split()[2]
+            self.columns[table] = query[query.index('(') + 1:query.index(')')].split(', ')
+            # Transpose into columns as the native protocol does, then drop them to keep memory flat
+            columns = list(zip(*params))
+            rows = len(columns[0]) if columns else 0
+            self.inserted_rows[table] = self.inserted_rows.get(table, 0) + rows
+            return rows
+        self.queries.append(query)
+        return []
+
+
+class RecordingClickHouseClient(ClickHouseClient):
+    """ClickHouseClient backed by a RecordingDriver, with no server connection"""
+
+    def __init__(self):
+        self.client = RecordingDriver()
+        self.reset_query_stats()
+
+
+class IdleFileWatcher(FileWatcher):
+    def start(self, callback: Callable) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class IdleEventQueue(EventQueue):
+    def add_processor(self, processor: Callable[[Dict[str, Any]], None]) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def put(self, event: Dict[str, Any]) -> None:
+        pass
+
+
+def build_dataset(size: int, data_dir: str) -> str:
+    """
+    Write a dataset of `size` orders split into files of ORDERS_PER_FILE orders
+
+    Orders come from the VectorizedOrderGenerator with a fixed seed and end
+    date, so a size always yields the same data. Datasets are cached by size
+    and end date.
+
+    Returns:
+        Directory containing the dataset
+    """
+    dataset_dir = os.path.join(data_dir, f"orders_{size}_{DATASET_END_DATE:%Y%m%d}")
+    if os.path.exists(os.path.join(dataset_dir, 'COMPLETE')):
+        return dataset_dir
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+
+    VectorizedOrderGenerator(seed=DATASET_SEED, end_date=DATASET_END_DATE).save_chunks_to_json(size, dataset_dir, ORDERS_PER_FILE, prefix='orders')
+    Path(dataset_dir, 'COMPLETE').touch()
+    return dataset_dir
+
+
+def _json_files(dataset_dir: str) -> List[Path]:
+    return sorted(Path(dataset_dir).glob('*.json'))
+
+
+def run_stage(stage: str, dataset_dir: str) -> Dict[str, float]:
+    """
+    Run one stage over the whole dataset, timing only that stage
+
+    Inputs of later stages are prepared file by file, so memory reflects one
+    file at a time except for pipeline_run, which runs ETLPipeline.run as is.
+
+    Returns:
+        Dict with rows and seconds
+    """
+    extractor = ShopifyDataExtractor(dataset_dir)
+    transformer = ShopifyDataTransformer()
+    client = RecordingClickHouseClient()
+    rows, elapsed = 0, 0.0
+
+    if stage == 'pipeline_run':
+        pipeline = ETLPipeline(dataset_dir, IdleFileWatcher(), IdleEventQueue(),
+                               extractor, transformer, ShopifyDataLoader(client))
+        start = time.perf_counter()
+        pipeline.run()
+        elapsed = time.perf_counter() - start
+        return {'rows': client.client.inserted_rows.get('orders', 0), 'seconds': elapsed}
+
+    for file_path in _json_files(dataset_dir):
+        start = time.perf_counter()
+        data = extractor._read_json_file(file_path)
+        if stage == 'read_json':
+            elapsed += time.perf_counter() - start
+            rows += len(data['orders'])
+            continue
+
+        start = time.perf_counter()
+        orders = [extractor.extract_record(order) for order in data['orders']]
+        if stage == 'extract_order':
+            elapsed += time.perf_counter() - start
+            rows += len(orders)
+            continue
+
+        start = time.perf_counter()
+        transformed_orders, transformed_items = transformer.transform_orders(orders)
+        if stage == 'transform_orders':
+            elapsed += time.perf_counter() - start
+            rows += len(transformed_orders)
+            continue
+
+        start = time.perf_counter()
+        client.insert_data('orders', transformed_orders)
+        client.insert_data('order_items', transformed_items)
+        elapsed += time.perf_counter() - start
+        rows += len(transformed_orders)
+
+    return {'rows': rows, 'seconds': elapsed}
+
+
+def measure_allocations(stage: str, dataset_dir: str) -> Optional[float]:
+    """
+    Peak traced bytes per row of a stage
+
+    Measured in a separate pass because tracemalloc slows the stage down.
+    read_json reads the whole first file, the other stages run on its first
+    ALLOCATION_SAMPLE_ROWS orders.
+    """
+    if stage == 'pipeline_run':
+        return None
+    extractor = ShopifyDataExtractor(dataset_dir)
+    transformer = ShopifyDataTransformer()
+    client = RecordingClickHouseClient()
+    file_path = _json_files(dataset_dir)[0]
+
+    if stage == 'read_json':
+        tracemalloc.start()
+        rows = len(extractor._read_json_file(file_path)['orders'])
+    else:
+        orders = extractor._read_json_file(file_path)['orders'][:ALLOCATION_SAMPLE_ROWS]
+        rows = len(orders)
+        if stage != 'extract_order':
+            orders = [extractor.extract_record(order) for order in orders]
+        if stage == 'insert_data':
+            transformed_orders, transformed_items = transformer.transform_orders(orders)
+
+        tracemalloc.start()
+        if stage == 'extract_order':
+            [extractor.extract_record(order) for order in orders]
+        elif stage == 'transform_orders':
+            transformer.transform_orders(orders)
+        else:
+            client.insert_data('orders', transformed_orders)
+            client.insert_data('order_items', transformed_items)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / max(1, rows)
+
+
+def _stage_worker(stage: str, dataset_dir: str, results: multiprocessing.Queue) -> None:
+    result = run_stage(stage, dataset_dir)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result['peak_rss_mb'] = maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    result['alloc_bytes_per_row'] = measure_allocations(stage, dataset_dir)
+    results.put(result)
+
+
+def benchmark(stage: str, dataset_dir: str) -> Dict[str, float]:
+    """Run a stage in a fresh process so its peak RSS is its own"""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_stage_worker, args=(stage, dataset_dir, results))
+    process.start()
+    result = results.get()
+    process.join()
+    result['rows_per_sec'] = result['rows'] / result['seconds'] if result['seconds'] else 0.0
+    return result
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """
+    Compare results with a baseline
+
+    Returns:
+        Descriptions of metrics that regressed by more than the tolerance
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if not reference:
+            continue
+        if reference.get('rows_per_sec') and result['rows_per_sec'] < reference['rows_per_sec'] * (1 - tolerance):
+            regressions.append(f"{key}: {result['rows_per_sec']:,.0f} rows/s vs {reference['rows_per_sec']:,.0f}")
+        for metric in ('peak_rss_mb', 'alloc_bytes_per_row'):
+            if reference.get(metric) and result.get(metric) and result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{key}: {metric} {result[metric]:,.1f} vs {reference[metric]:,.1f}")
+    return regressions
+
+
+def main():
+    """Benchmark each ingest stage and the full pipeline against a recording ClickHouse stand-in"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--sizes', default='10000',
+                        help="Comma-separated dataset sizes in orders, e.g. 10000,100000,1000000,10000000")
+    parser.add_argument('--stages', default=','.join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Directory caching generated datasets")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument('--update-baseline', action='store_true', help="Store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    stages = [stage for stage in args.stages.split(',') if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'stage':<18} {'orders':>10} {'rows/s':>12} {'peak RSS (MB)':>14} {'alloc B/row':>12}")
+    for size in sizes:
+        dataset_dir = build_dataset(size, args.data_dir)
+        for stage in stages:
+            result = benchmark(stage, dataset_dir)
+            results[f"{stage}@{size}"] = result
+            alloc = result['alloc_bytes_per_row']
+            print(f"{stage:<18} {size:>10,} {result['rows_per_sec']:>12,.0f} {result['peak_rss_mb']:>14,.1f} "
+                  f"{'-' if alloc is None else format(alloc, ',.0f'):>12}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline updated: {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions against baseline" if baseline else "\nNo baseline to compare against")
+
+
+if __name__ == "__main__":
+    main()
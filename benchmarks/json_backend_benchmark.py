@@ -0,0 +1,88 @@
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from src.utils.data_generator import VectorizedOrderGenerator
+from src.utils.json_backend import available_backends, get_backend
+
+SAMPLE_FILE = os.path.join(project_root, 'data', 'orders_sample.json')
+DATASET_SEED = 0
+DATASET_END_DATE = datetime(2024, 1, 1)
+
+
+def load_datasets(num_orders: int) -> Dict[str, Tuple[bytes, List[bytes]]]:
+    """Encode the sample file and generated orders as a JSON document and as NDJSON lines"""
+    with open(SAMPLE_FILE, 'rb') as f:
+        sample_orders = json.loads(f.read())['orders']
+    generated_orders = VectorizedOrderGenerator(seed=DATASET_SEED, end_date=DATASET_END_DATE).generate_orders(num_orders)
+
+    datasets = {}
+    for name, orders in (('sample', sample_orders), ('generated', generated_orders)):
+        document = json.dumps({'orders': orders}, indent=2).encode('utf-8')
+        lines = [json.dumps(order).encode('utf-8') for order in orders]
+        datasets[name] = (document, lines)
+    return datasets
+
+
+def time_median(func: Callable[[], Any], repeats: int) -> float:
+    """Median wall time of repeated calls, with the garbage collector paused as timeit does"""
+    timings = []
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return statistics.median(timings)
+
+
+def main():
+    """Compare parse and serialize throughput of the installed JSON backends"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--orders', type=int, default=20000, help="Number of generated orders")
+    parser.add_argument('--repeats', type=int, default=5, help="Runs per measurement, the median is reported")
+    args = parser.parse_args()
+
+    datasets = load_datasets(args.orders)
+    reference = get_backend('json')
+    mismatches = []
+
+    print(f"{'dataset':<10} {'backend':<9} {'parse MB/s':>11} {'NDJSON MB/s':>12} {'orders/s':>12} {'dump MB/s':>10}")
+    for dataset, (document, lines) in datasets.items():
+        expected = reference.loads(document)
+        num_orders = len(expected['orders'])
+        ndjson_bytes = sum(len(line) + 1 for line in lines)
+        for name in available_backends():
+            backend = get_backend(name)
+            if backend.loads(document) != expected or [backend.loads(line) for line in lines] != expected['orders']:
+                mismatches.append((dataset, name))
+
+            parse = time_median(lambda: backend.loads(document), args.repeats)
+            parse_lines = time_median(lambda: [backend.loads(line) for line in lines], args.repeats)
+            dumped = backend.dumps(expected, indent=True)
+            dump = time_median(lambda: backend.dumps(expected, indent=True), args.repeats)
+            print(f"{dataset:<10} {name:<9} {len(document) / parse / 1e6:>11.1f} "
+                  f"{ndjson_bytes / parse_lines / 1e6:>12.1f} {num_orders / parse_lines:>12,.0f} "
+                  f"{len(dumped) / dump / 1e6:>10.1f}")
+
+    if mismatches:
+        for dataset, name in mismatches:
+            print(f"WARNING: {name} parsed {dataset} differently from stdlib json")
+        sys.exit(1)
+    print("All backends parsed identical results")
+
+
+if __name__ == "__main__":
+    main()
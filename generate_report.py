@@ -9,9 +9,10 @@ from src.analytics.base.report_generator import AnalyticsReportGenerator
 
 def main():
     """Generate the analytics report"""
-    generator = AnalyticsReportGenerator()
+    # Section state is kept next to the report so reruns only rebuild changed sections
+    generator = AnalyticsReportGenerator(state_path=os.path.join(project_root, ".analytics_report_state.json"))
     output_path = os.path.join(project_root, "analytics_report.html")
-    generator.save_report(output_path)
+    generator.save_report(output_path, force='--force' in sys.argv)
     print(f"Report generated successfully at: {output_path}")
 
 if __name__ == "__main__":
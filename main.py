@@ -1,15 +1,20 @@
 import logging
 from typing import Optional
 from pathlib import Path
+import os
 import time
 
 from src.etl.extractor import ShopifyDataExtractor
 from src.etl.transformer import ShopifyDataTransformer
 from src.etl.loader import ShopifyDataLoader
+from src.etl.dedup import OrderDedupIndex
+from src.etl.watermarks import WatermarkStore
 from src.database.clickhouse_client import ClickHouseClient
 from src.services.file_watcher import FileWatcherService
 from src.services.event_queue import InMemoryEventQueue
 from src.etl.pipeline import ETLPipeline
+from src.monitoring.exporters import PrometheusExporter
+from src.monitoring.profiling import profiler
 
 logger = logging.getLogger(__name__)
 
@@ -27,11 +32,23 @@ def main():
     db_client = ClickHouseClient()
     
     # Create dependencies
-    file_watcher = FileWatcherService(str(data_dir))
+    # Queue file references; the event worker parses each file once, streaming
+    file_watcher = FileWatcherService(str(data_dir), file_refs=True)
     event_queue = InMemoryEventQueue()
     extractor = ShopifyDataExtractor(str(data_dir))
     transformer = ShopifyDataTransformer()
-    loader = ShopifyDataLoader(db_client)
+    # Skip re-delivered orders before sending them, from the versions already in the table
+    loader = ShopifyDataLoader(db_client, OrderDedupIndex.from_table(db_client))
+    # Load only orders updated since the last run; kept outside the watched data directory
+    watermarks = WatermarkStore(os.getenv('WATERMARK_FILE', 'state/watermarks.json'))
+    
+    # Expose per-stage metrics locally for Prometheus scraping
+    metrics_exporter = PrometheusExporter(port=int(os.getenv('METRICS_PORT', 9108)))
+    metrics_exporter.start()
+    
+    # Profiling hooks stay idle until toggled with SIGUSR1 or the control file
+    profiler.install_signal_handler()
+    profiler.watch_control_file(os.path.join(profiler.output_dir, 'PROFILE'))
     
     try:
         # Create and run pipeline
@@ -41,11 +58,14 @@ def main():
             event_queue=event_queue,
             extractor=extractor,
             transformer=transformer,
-            loader=loader
+            loader=loader,
+            watermarks=watermarks
         )
         
-        # Run initial ETL
-        pipeline.run()
+        # Run initial ETL; BACKFILL=1 bulk reloads every order regardless of the marks,
+        # BACKFILL=replace also replaces the order partitions the files cover
+        backfill = os.getenv('BACKFILL', '')
+        pipeline.run(backfill=backfill in ('1', 'replace'), replace_partitions=backfill == 'replace')
         
         # Keep running to process new orders
         try:
@@ -53,6 +73,8 @@ def main():
                 time.sleep(1)
         except KeyboardInterrupt:
             pipeline.stop()
+            metrics_exporter.stop()
+            profiler.stop()
             
     except Exception as e:
         logger.error(f"Pipeline execution failed: {str(e)}")
@@ -3,5 +3,7 @@ Analytics package for Shopify data analysis
 """
 
 from .shopify_analytics import ShopifyAnalytics
+from .rfm import RFMAnalyzer
+from .cohorts import CohortAnalyzer
  
-__all__ = ['ShopifyAnalytics'] 
\ No newline at end of file
+__all__ = ['ShopifyAnalytics', 'RFMAnalyzer', 'CohortAnalyzer'] 
\ No newline at end of file
@@ -1,4 +1,5 @@
 from .base_analytics import BaseAnalytics
 from .report_generator import AnalyticsReportGenerator
+from .approximation import ApproximateQueryMode, ExactQueryMode, Estimate
 
-__all__ = ['BaseAnalytics', 'AnalyticsReportGenerator'] 
\ No newline at end of file
+__all__ = ['BaseAnalytics', 'AnalyticsReportGenerator', 'ApproximateQueryMode', 'ExactQueryMode', 'Estimate'] 
\ No newline at end of file
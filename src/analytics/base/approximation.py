@@ -0,0 +1,168 @@
+import math
+from typing import Any, Dict, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Two-sided z-scores for the supported confidence levels
+Z_SCORES = {0.90: 1.645, 0.95: 1.96, 0.99: 2.576}
+
+# Standard error of uniqCombined at its default HyperLogLog precision (2^17 cells)
+HLL_RELATIVE_ERROR = 1.04 / math.sqrt(2 ** 17)
+
+# Rank band around the median used to turn quantile sketch error into a value range
+QUANTILE_RANK_BAND = 0.01
+
+
+class Estimate(NamedTuple):
+    """A metric value with the half-width of its confidence interval"""
+    value: float
+    error: float
+
+
+class ExactQueryMode:
+    """
+    Builds exact aggregate expressions.
+
+    Analytics classes format their queries through a query mode, so the same
+    query text runs exactly or approximately depending on the mode in use.
+    """
+
+    approximate = False
+
+    def sample_clause(self, table: str) -> str:
+        """SAMPLE clause to append after the table name"""
+        return ""
+
+    def sample_ratio(self, table: str) -> float:
+        """Fraction of the table actually read"""
+        return 1.0
+
+    def distinct(self, column: str) -> str:
+        """Expression counting distinct values of a column"""
+        return f"count(DISTINCT {column})"
+
+    def unsampled_distinct(self, column: str, table: str, group_by: str = "",
+                           where: str = "") -> Optional[Dict[Any, int]]:
+        """
+        Distinct counts of a column over the whole table, for tables read with a SAMPLE clause
+
+        Returns None when the table is read in full, so the query's own
+        distinct expression applies. Otherwise maps each group_by value, or
+        None without group_by, to its count.
+        """
+        return None
+
+    def median_band(self, column: str) -> str:
+        """Expression returning [lower, median, upper] for a column"""
+        return f"[quantileExact(0.5)({column}), quantileExact(0.5)({column}), quantileExact(0.5)({column})]"
+
+    def count(self, sampled: float, table: str) -> Estimate:
+        return Estimate(float(sampled), 0.0)
+
+    def sum(self, sampled: float, sampled_squares: float, table: str) -> Estimate:
+        return Estimate(float(sampled), 0.0)
+
+    def distinct_count(self, count: float, table: str) -> Estimate:
+        return Estimate(float(count), 0.0)
+
+    def ratio(self, numerator: Estimate, denominator: Estimate) -> Estimate:
+        value = numerator.value / denominator.value if denominator.value else 0.0
+        return Estimate(value, 0.0)
+
+    def median(self, band) -> Estimate:
+        return Estimate(float(band[1]), 0.0)
+
+
+class ApproximateQueryMode(ExactQueryMode):
+    """
+    Builds sampled and sketch-based aggregate expressions.
+
+    Tables with a SAMPLE BY key are read with a SAMPLE clause and totals are
+    scaled by the inverse sampling ratio. Orders are sampled by a hash of their
+    ID, so error bounds treat them as sampled independently. A customer with k
+    orders is sampled with probability 1 - (1 - p)^k, so distinct counts cannot
+    be scaled from a sample; they use uniqCombined over the unsampled table.
+    Quantiles use t-digest.
+    """
+
+    approximate = True
+
+    def __init__(self, db_client, sample_ratio: float = 0.1, confidence: float = 0.95):
+        """
+        Initialize the approximate query mode
+
+        Args:
+            db_client: ClickHouse client used to look up sampling keys
+            sample_ratio: Fraction of rows to read from sampled tables
+            confidence: Confidence level of the reported error bounds
+        """
+        if not 0 < sample_ratio <= 1:
+            raise ValueError("sample_ratio must be in (0, 1]")
+        if confidence not in Z_SCORES:
+            raise ValueError(f"confidence must be one of {sorted(Z_SCORES)}")
+        self.db_client = db_client
+        self.requested_ratio = sample_ratio
+        self.z = Z_SCORES[confidence]
+        self._sampling_keys: Dict[str, str] = {}
+
+    def _has_sampling_key(self, table: str) -> bool:
+        if table not in self._sampling_keys:
+            result = self.db_client.execute_query(
+                f"SELECT sampling_key FROM system.tables "
+                f"WHERE database = currentDatabase() AND name = '{table}'"
+            )
+            self._sampling_keys[table] = result[0][0] if result else ""
+            if not self._sampling_keys[table]:
+                logger.warning(f"Table {table} has no SAMPLE BY key, reading it in full")
+        return bool(self._sampling_keys[table])
+
+    def sample_clause(self, table: str) -> str:
+        if self.requested_ratio < 1 and self._has_sampling_key(table):
+            return f"SAMPLE {self.requested_ratio}"
+        return ""
+
+    def sample_ratio(self, table: str) -> float:
+        return self.requested_ratio if self.sample_clause(table) else 1.0
+
+    def distinct(self, column: str) -> str:
+        return f"uniqCombined({column})"
+
+    def unsampled_distinct(self, column: str, table: str, group_by: str = "",
+                           where: str = "") -> Optional[Dict[Any, int]]:
+        if not self.sample_clause(table):
+            return None
+        where_clause = f"WHERE {where}" if where else ""
+        if not group_by:
+            result = self.db_client.execute_query(f"SELECT {self.distinct(column)} FROM {table} {where_clause}")
+            return {None: result[0][0]}
+        return dict(self.db_client.execute_query(
+            f"SELECT {group_by} as group_key, {self.distinct(column)} FROM {table} {where_clause} GROUP BY group_key"
+        ))
+
+    def median_band(self, column: str) -> str:
+        return f"quantilesTDigest({0.5 - QUANTILE_RANK_BAND}, 0.5, {0.5 + QUANTILE_RANK_BAND})({column})"
+
+    def count(self, sampled: float, table: str) -> Estimate:
+        p, sampled = self.sample_ratio(table), float(sampled)
+        return Estimate(sampled / p, self.z * math.sqrt(sampled * (1 - p)) / p)
+
+    def sum(self, sampled: float, sampled_squares: float, table: str) -> Estimate:
+        p, sampled, sampled_squares = self.sample_ratio(table), float(sampled), float(sampled_squares)
+        return Estimate(sampled / p, self.z * math.sqrt(sampled_squares * (1 - p)) / p)
+
+    def distinct_count(self, count: float, table: str) -> Estimate:
+        # Counted over the unsampled table, see unsampled_distinct
+        return Estimate(float(count), self.z * HLL_RELATIVE_ERROR * float(count))
+
+    def ratio(self, numerator: Estimate, denominator: Estimate) -> Estimate:
+        if not denominator.value or not numerator.value:
+            return Estimate(0.0, 0.0)
+        value = numerator.value / denominator.value
+        # Relative errors add in quadrature; ignoring their positive covariance is conservative
+        relative_error = math.hypot(numerator.error / numerator.value, denominator.error / denominator.value)
+        return Estimate(value, relative_error * abs(value))
+
+    def median(self, band) -> Estimate:
+        lower, value, upper = (float(v) for v in band)
+        return Estimate(value, max(value - lower, upper - value))
@@ -1,5 +1,7 @@
 from typing import Dict, Any, Sequence
 from src.database.clickhouse_client import ClickHouseClient
+from src.analytics.base.approximation import ApproximateQueryMode, Estimate, ExactQueryMode
+from src.analytics.cohorts import CohortAnalyzer
 
 class BaseAnalytics:
     """
@@ -8,9 +10,23 @@ class BaseAnalytics:
     and can drive immediate business decisions.
     """
     
-    def __init__(self):
-        """Initialize the BaseAnalytics with ClickHouse connection"""
+    def __init__(self, approximate: bool = False, sample_ratio: float = 0.1):
+        """
+        Initialize the BaseAnalytics with ClickHouse connection
+        
+        Args:
+            approximate: Use sampling and sketch aggregates, and report error bounds
+            sample_ratio: Fraction of orders to read in approximate mode
+        """
         self.client = ClickHouseClient()
+        self.mode = ApproximateQueryMode(self.client, sample_ratio) if approximate else ExactQueryMode()
+        self.cohorts = CohortAnalyzer(self.client)
+
+    def _with_error_bounds(self, data: Dict[str, Any], estimates: Dict[str, Estimate]) -> Dict[str, Any]:
+        """Attach the 95% confidence half-widths of estimated metrics in approximate mode"""
+        if self.mode.approximate:
+            data["error_bounds"] = {name: round(estimate.error, 2) for name, estimate in estimates.items()}
+        return data
         
     def get_sales_overview(self) -> Dict[str, Any]:
         """
@@ -23,36 +39,39 @@ class BaseAnalytics:
             - average_order_value: Average revenue per order
             - total_customers: Number of unique customers
         """
-        query = """
+        query = f"""
         SELECT 
             sum(total_price) as total_revenue,
             count() as total_orders,
-            sum(total_price) / count() as average_order_value,
-            count(DISTINCT customer_id) as total_customers
-        FROM orders
+            {self.mode.distinct('customer_id')} as total_customers,
+            sum(toFloat64(total_price) * toFloat64(total_price)) as total_revenue_squares
+        FROM orders {self.mode.sample_clause('orders')}
         """
         result = self.client.execute_query(query)
-        if not result or not result[0]:
+        if not result or not result[0] or not result[0][1]:
             return {
                 "total_revenue": 0.0,
                 "total_orders": 0,
                 "average_order_value": 0.0,
                 "total_customers": 0
             }
+        customers = self.mode.unsampled_distinct('customer_id', 'orders')
             
-        data = {
-            "total_revenue": result[0][0],
-            "total_orders": result[0][1],
-            "average_order_value": result[0][2],
-            "total_customers": result[0][3]
+        revenue = self.mode.sum(result[0][0], result[0][3], 'orders')
+        orders = self.mode.count(result[0][1], 'orders')
+        estimates = {
+            "total_revenue": revenue,
+            "total_orders": orders,
+            "average_order_value": self.mode.ratio(revenue, orders),
+            "total_customers": self.mode.distinct_count(customers[None] if customers is not None else result[0][2], 'orders')
         }
         
-        return {
-            "total_revenue": round(float(data["total_revenue"]), 2),
-            "total_orders": data["total_orders"],
-            "average_order_value": round(float(data["average_order_value"]), 2),
-            "total_customers": data["total_customers"]
-        }
+        return self._with_error_bounds({
+            "total_revenue": round(estimates["total_revenue"].value, 2),
+            "total_orders": round(estimates["total_orders"].value),
+            "average_order_value": round(estimates["average_order_value"].value, 2),
+            "total_customers": round(estimates["total_customers"].value)
+        }, estimates)
     
     def get_monthly_sales_trend(self) -> Dict[str, Sequence[Dict[str, Any]]]:
         """
@@ -65,29 +84,35 @@ class BaseAnalytics:
             - orders: Number of orders in the month
             - customers: Number of unique customers in the month
         """
-        query = """
+        query = f"""
         SELECT 
             toYYYYMM(created_at) as month,
             sum(total_price) as revenue,
             count() as orders,
-            count(DISTINCT customer_id) as customers
-        FROM orders
+            {self.mode.distinct('customer_id')} as customers,
+            sum(toFloat64(total_price) * toFloat64(total_price)) as revenue_squares
+        FROM orders {self.mode.sample_clause('orders')}
         GROUP BY month
         ORDER BY month
         """
         result = self.client.execute_query(query)
         if not result:
             return {"monthly_trend": []}
+        customers = self.mode.unsampled_distinct('customer_id', 'orders', group_by='toYYYYMM(created_at)')
             
-        data = [
-            {
-                "month": str(row[0]),
-                "revenue": round(float(row[1]), 2),
-                "orders": row[2],
-                "customers": row[3]
+        data = []
+        for row in result:
+            estimates = {
+                "revenue": self.mode.sum(row[1], row[4], 'orders'),
+                "orders": self.mode.count(row[2], 'orders'),
+                "customers": self.mode.distinct_count(customers.get(row[0], 0) if customers is not None else row[3], 'orders')
             }
-            for row in result
-        ]
+            data.append(self._with_error_bounds({
+                "month": str(row[0]),
+                "revenue": round(estimates["revenue"].value, 2),
+                "orders": round(estimates["orders"].value),
+                "customers": round(estimates["customers"].value)
+            }, estimates))
         
         return {"monthly_trend": data}
     
@@ -101,69 +126,15 @@ class BaseAnalytics:
             - average_orders_per_customer: Average number of orders per customer
             - customer_retention_rate: Percentage of customers who returned within 90 days
         """
-        # Get repeat customer rate and average orders
-        query = """
-        WITH customer_orders AS (
-            SELECT 
-                customer_id,
-                count() as order_count
-            FROM orders
-            GROUP BY customer_id
-        )
-        SELECT 
-            countIf(order_count > 1) * 100.0 / count() as repeat_customer_rate,
-            avg(order_count) as average_orders_per_customer
-        FROM customer_orders
-        """
-        result = self.client.execute_query(query)
-        if not result or not result[0]:
-            return {
-                "repeat_customer_rate": 0.0,
-                "average_orders_per_customer": 0.0,
-                "customer_retention_rate": 0.0
-            }
-            
-        data = {
-            "repeat_customer_rate": result[0][0],
-            "average_orders_per_customer": result[0][1]
-        }
-        
-        # Get 90-day retention rate
-        retention_query = """
-        WITH customer_first_orders AS (
-            SELECT 
-                customer_id,
-                min(created_at) as first_order_date
-            FROM orders
-            GROUP BY customer_id
-        ),
-        customer_second_orders AS (
-            SELECT 
-                o.customer_id,
-                min(o.created_at) as second_order_date
-            FROM orders o
-            JOIN customer_first_orders f ON o.customer_id = f.customer_id
-            WHERE o.created_at > f.first_order_date
-            GROUP BY o.customer_id
-        )
-        SELECT 
-            countIf(dateDiff('day', first_order_date, second_order_date) <= 90) * 100.0 / count() as retention_rate
-        FROM customer_first_orders f
-        LEFT JOIN customer_second_orders s ON f.customer_id = s.customer_id
-        """
-        retention_result = self.client.execute_query(retention_query)
-        retention_rate = retention_result[0][0] if retention_result and retention_result[0] else 0
-        
-        return {
-            "repeat_customer_rate": round(float(data["repeat_customer_rate"]), 2),
-            "average_orders_per_customer": round(float(data["average_orders_per_customer"]), 2),
-            "customer_retention_rate": round(float(retention_rate), 2)
-        }
+        return self.cohorts.get_retention_summary(window_days=90)
     
-    def get_product_performance(self) -> Dict[str, Sequence[Dict[str, Any]]]:
+    def get_product_performance(self, limit: int = 10) -> Dict[str, Sequence[Dict[str, Any]]]:
         """
         Get basic product performance metrics.
         
+        Args:
+            limit: Number of top products to return, by revenue
+        
         Returns:
             Dict containing top products with:
             - product_name: Name of the product
@@ -171,7 +142,7 @@ class BaseAnalytics:
             - total_revenue: Total revenue from the product
             - average_price: Average price per unit
         """
-        query = """
+        query = f"""
         SELECT 
             name as product_name,
             sum(quantity) as total_quantity,
@@ -180,7 +151,7 @@ class BaseAnalytics:
         FROM order_items
         GROUP BY product_name
         ORDER BY total_revenue DESC
-        LIMIT 10
+        LIMIT {int(limit)}
         """
         result = self.client.execute_query(query)
         if not result:
@@ -213,7 +184,8 @@ class BaseAnalytics:
         query = """
         SELECT 
             countIf(total_discounts > 0) * 100.0 / count() as discount_usage_rate,
-            sumIf(total_discounts, total_discounts > 0) / countIf(total_discounts > 0) as average_discount_amount,
+            if(countIf(total_discounts > 0) > 0,
+               sumIf(total_discounts, total_discounts > 0) / countIf(total_discounts > 0), 0) as average_discount_amount,
             sum(total_discounts) as total_discount_amount,
             sumIf(total_price, total_discounts > 0) as revenue_with_discounts,
             sumIf(total_price, total_discounts = 0) as revenue_without_discounts
@@ -245,13 +217,153 @@ class BaseAnalytics:
             "revenue_without_discounts": round(float(data["revenue_without_discounts"]), 2)
         }
     
-    def get_all_metrics(self) -> Dict[str, Any]:
+    def _get_fused_orders_metrics(self) -> Dict[str, Any]:
+        """
+        Compute every orders-based metric in a single pass over the orders table.
+        
+        The innermost query groups orders by customer and order time, the
+        middle one aggregates once per customer, keeping only the two earliest
+        distinct order times as CohortAnalyzer does, and the outer query folds
+        the per-customer states into totals. -If combinators give the discount
+        split and sumMap gives the monthly breakdown. Results match
+        get_sales_overview, get_monthly_sales_trend, get_customer_retention_metrics
+        and get_discount_impact.
+        
+        Returns:
+            Dict with sales_overview, monthly_trends, customer_retention and discount_impact
+        """
+        query = """
+        SELECT 
+            sum(order_count) as total_orders,
+            sum(revenue) as total_revenue,
+            count() as total_customers,
+            countIf(order_count > 1) * 100.0 / count() as repeat_customer_rate,
+            avg(order_count) as average_orders_per_customer,
+            countIf(length(order_times) > 1 AND dateDiff('day', order_times[1], order_times[2]) <= 90) * 100.0 / count() as retention_rate,
+            sum(customer_discounted_orders) as discounted_orders,
+            if(discounted_orders > 0, sum(customer_discount_amount) / discounted_orders, 0) as average_discount_amount,
+            sum(customer_discounts) as total_discount_amount,
+            sum(customer_revenue_with_discounts) as revenue_with_discounts,
+            sum(customer_revenue_without_discounts) as revenue_without_discounts,
+            sumMap(month_totals.1, month_totals.2, month_totals.3) as monthly_totals,
+            sumMap(active_months, arrayMap(m -> toUInt64(1), active_months)) as monthly_customers
+        FROM (
+            SELECT 
+                customer_id,
+                sum(orders) as order_count,
+                sum(time_revenue) as revenue,
+                groupArraySorted(2)(created_at) as order_times,
+                sum(discounted_orders) as customer_discounted_orders,
+                sum(discount_amount) as customer_discount_amount,
+                sum(discounts) as customer_discounts,
+                sum(revenue_with_discounts) as customer_revenue_with_discounts,
+                sum(revenue_without_discounts) as customer_revenue_without_discounts,
+                sumMap([toYYYYMM(created_at)], [time_revenue], [orders]) as month_totals,
+                groupUniqArray(toYYYYMM(created_at)) as active_months
+            FROM (
+                SELECT 
+                    customer_id,
+                    created_at,
+                    count() as orders,
+                    sum(total_price) as time_revenue,
+                    countIf(total_discounts > 0) as discounted_orders,
+                    sumIf(total_discounts, total_discounts > 0) as discount_amount,
+                    sum(total_discounts) as discounts,
+                    sumIf(total_price, total_discounts > 0) as revenue_with_discounts,
+                    sumIf(total_price, total_discounts = 0) as revenue_without_discounts
+                FROM orders
+                GROUP BY customer_id, created_at
+            )
+            GROUP BY customer_id
+        )
+        """
+        result = self.client.execute_query(query, settings=self.cohorts.settings)
+        row = result[0] if result else None
+        if not row or not row[0]:
+            return {
+                "sales_overview": {
+                    "total_revenue": 0.0,
+                    "total_orders": 0,
+                    "average_order_value": 0.0,
+                    "total_customers": 0
+                },
+                "monthly_trends": {"monthly_trend": []},
+                "customer_retention": {
+                    "repeat_customer_rate": 0.0,
+                    "average_orders_per_customer": 0.0,
+                    "customer_retention_rate": 0.0
+                },
+                "discount_impact": {
+                    "discount_usage_rate": 0.0,
+                    "average_discount_amount": 0.0,
+                    "total_discount_amount": 0.0,
+                    "revenue_with_discounts": 0.0,
+                    "revenue_without_discounts": 0.0
+                }
+            }
+        
+        (total_orders, total_revenue, total_customers, repeat_rate, avg_orders, retention_rate,
+         discounted_orders, average_discount_amount, total_discount_amount, revenue_with, revenue_without,
+         monthly_totals, monthly_customers) = row
+        
+        months, revenues, orders = monthly_totals
+        customers_by_month = dict(zip(*monthly_customers))
+        
+        return {
+            "sales_overview": {
+                "total_revenue": round(float(total_revenue), 2),
+                "total_orders": total_orders,
+                "average_order_value": round(float(total_revenue) / total_orders, 2),
+                "total_customers": total_customers
+            },
+            "monthly_trends": {
+                "monthly_trend": [
+                    {
+                        "month": str(month),
+                        "revenue": round(float(revenue), 2),
+                        "orders": month_orders,
+                        "customers": customers_by_month[month]
+                    }
+                    for month, revenue, month_orders in zip(months, revenues, orders)
+                ]
+            },
+            "customer_retention": {
+                "repeat_customer_rate": round(float(repeat_rate), 2),
+                "average_orders_per_customer": round(float(avg_orders), 2),
+                "customer_retention_rate": round(float(retention_rate), 2)
+            },
+            "discount_impact": {
+                "discount_usage_rate": round(discounted_orders * 100.0 / total_orders, 2),
+                "average_discount_amount": round(float(average_discount_amount), 2),
+                "total_discount_amount": round(float(total_discount_amount), 2),
+                "revenue_with_discounts": round(float(revenue_with), 2),
+                "revenue_without_discounts": round(float(revenue_without), 2)
+            }
+        }
+    
+    def get_all_metrics(self, fused: bool = False) -> Dict[str, Any]:
         """
         Get all basic analytics metrics in one call.
         
+        Args:
+            fused: Compute the orders-based metrics in one table pass instead of
+                one query per metric. Only available in exact mode.
+        
         Returns:
             Dict containing all metrics from other methods
         """
+        if fused:
+            if self.mode.approximate:
+                raise ValueError("Fused metrics are exact, disable approximate mode to use them")
+            metrics = self._get_fused_orders_metrics()
+            return {
+                "sales_overview": metrics["sales_overview"],
+                "monthly_trends": metrics["monthly_trends"],
+                "customer_retention": metrics["customer_retention"],
+                "product_performance": self.get_product_performance(),
+                "discount_impact": metrics["discount_impact"]
+            }
+        
         return {
             "sales_overview": self.get_sales_overview(),
             "monthly_trends": self.get_monthly_sales_trend(),
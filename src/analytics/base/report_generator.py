@@ -1,12 +1,135 @@
-from typing import Dict, Any
+import io
+import os
+import html
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, TextIO
 from datetime import datetime
+import logging
 from src.analytics.base.base_analytics import BaseAnalytics
+from src.analytics.base import report_templates
+
+logger = logging.getLogger(__name__)
+
+# Tables each report section reads; a section is rebuilt only when one of them changed
+SECTION_SOURCES = {
+    "sales_overview": ("orders",),
+    "customer_retention": ("orders",),
+    "product_performance": ("order_items",),
+    "discount_impact": ("orders",)
+}
+
+# Cheap per-table change markers. ReplacingMergeTree bumps updated_at on replaced orders,
+# and order_items has no timestamp, so its marker is the row count and newest active part.
+TABLE_WATERMARK_QUERIES = {
+    "orders": "SELECT count(), max(updated_at) FROM orders",
+    "order_items": """
+        SELECT sum(rows), max(modification_time)
+        FROM system.parts
+        WHERE database = currentDatabase() AND table = 'order_items' AND active
+    """
+}
+
+# Bump when section HTML or metric definitions change, to invalidate persisted state
+STATE_VERSION = 2
+
+# Number of top products rendered as metric cards ahead of the paginated product table
+TOP_PRODUCT_CARDS = 5
 
 class AnalyticsReportGenerator:
-    """Generates HTML reports for base analytics metrics with formulas and explanations"""
+    """
+    Generates HTML reports for base analytics metrics with formulas and explanations
+
+    Reports are regenerated incrementally: each section's metrics and HTML are
+    kept together with high-water marks of the tables it reads, and only
+    sections whose tables changed since the last build are recomputed.
+    With a state_path the state survives restarts.
+
+    Sections are rendered from precompiled templates into fragment files next
+    to the state, and the report is streamed into its output one fragment at a
+    time, so memory stays bounded as sections grow.
+    """
     
-    def __init__(self):
+    def __init__(self, state_path: Optional[str] = None, product_limit: int = 10,
+                 page_size: int = 50, render_workers: int = 4):
+        """
+        Initialize the report generator
+        
+        Args:
+            state_path: JSON file persisting section state between runs, in memory only if omitted
+            product_limit: Number of products listed in the product performance section
+            page_size: Products per page of the product table
+            render_workers: Maximum number of sections rendered in parallel
+        """
         self.analytics = BaseAnalytics()
+        self.state_path = state_path
+        self.product_limit = product_limit
+        self.page_size = page_size
+        self.render_workers = max(1, render_workers)
+        self.fragments_dir = f"{state_path}.sections" if state_path else None
+        if self.fragments_dir:
+            os.makedirs(self.fragments_dir, exist_ok=True)
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict[str, Any]:
+        """Load persisted section state, discarding it if missing, unreadable or outdated"""
+        empty = {
+            "version": STATE_VERSION,
+            "approximate": self.analytics.mode.approximate,
+            "product_limit": self.product_limit,
+            "sections": {}
+        }
+        if not self.state_path or not os.path.exists(self.state_path):
+            return empty
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable report state {self.state_path}: {str(e)}")
+            return empty
+        if (state.get("version") != STATE_VERSION or state.get("approximate") != empty["approximate"]
+                or state.get("product_limit") != empty["product_limit"]):
+            return empty
+        # A missing fragment file forces its section to be rebuilt
+        state["sections"] = {
+            section: entry for section, entry in state["sections"].items()
+            if "html_path" not in entry or os.path.exists(entry["html_path"])
+        }
+        return state
+
+    def _save_state(self) -> None:
+        """Persist section state atomically"""
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _get_watermarks(self) -> Dict[str, List[str]]:
+        """Read the current high-water marks of every source table"""
+        watermarks = {}
+        for table, query in TABLE_WATERMARK_QUERIES.items():
+            result = self.analytics.client.execute_query(query)
+            watermarks[table] = [str(value) for value in result[0]] if result else []
+        return watermarks
+
+    def _compute_metrics(self, sections: List[str]) -> Dict[str, Any]:
+        """Compute the metrics of the given sections"""
+        orders_sections = {"sales_overview", "customer_retention", "discount_impact"}
+        if orders_sections.issubset(sections) and not self.analytics.mode.approximate:
+            # All orders-based sections are stale, one fused pass is cheaper than three queries
+            metrics = self.analytics._get_fused_orders_metrics()
+        else:
+            metrics = {}
+        getters = {
+            "sales_overview": self.analytics.get_sales_overview,
+            "customer_retention": self.analytics.get_customer_retention_metrics,
+            "product_performance": lambda: self.analytics.get_product_performance(self.product_limit),
+            "discount_impact": self.analytics.get_discount_impact
+        }
+        return {section: metrics[section] if section in metrics else getters[section]() for section in sections}
         
     def _get_css_styles(self) -> str:
         """Returns CSS styles for the report"""
@@ -70,6 +193,18 @@ class AnalyticsReportGenerator:
                 border-radius: 4px;
                 margin: 10px 0;
             }
+            .product-page {
+                margin: 10px 0;
+            }
+            .product-table {
+                width: 100%;
+                border-collapse: collapse;
+            }
+            .product-table th, .product-table td {
+                padding: 6px 10px;
+                border-bottom: 1px solid #eee;
+                text-align: left;
+            }
         </style>
         """
     
@@ -84,214 +219,167 @@ class AnalyticsReportGenerator:
                 return f"{prefix}${value:.2f}{suffix}"
         return f"{prefix}{value}{suffix}"
     
-    def _generate_sales_overview_section(self, metrics: Dict[str, Any]) -> str:
-        """Generates HTML for sales overview section"""
+    def _render_sales_overview(self, metrics: Dict[str, Any]) -> Iterator[str]:
+        """Renders the sales overview section"""
         sales = metrics["sales_overview"]
-        return f"""
-        <div class="section">
-            <h2>Sales Overview</h2>
-            <div class="metric-card">
-                <h3>Total Revenue</h3>
-                <div class="metric-value">{self._format_metric_value(sales['total_revenue'])}</div>
-                <div class="formula">Total Revenue = Σ(Order Total Price)</div>
-                <div class="explanation">
-                    The sum of all order values, representing the total income generated from sales.
-                </div>
-            </div>
-            
-            <div class="metric-card">
-                <h3>Total Orders</h3>
-                <div class="metric-value">{sales['total_orders']}</div>
-                <div class="formula">Total Orders = Count(Orders)</div>
-                <div class="explanation">
-                    The total number of orders processed, indicating sales volume.
-                </div>
-            </div>
-            
-            <div class="metric-card">
-                <h3>Average Order Value (AOV)</h3>
-                <div class="metric-value">{self._format_metric_value(sales['average_order_value'])}</div>
-                <div class="formula">AOV = Total Revenue ÷ Total Orders</div>
-                <div class="explanation">
-                    The average amount spent per order, a key metric for understanding customer spending patterns.
-                </div>
-            </div>
-            
-            <div class="metric-card">
-                <h3>Total Customers</h3>
-                <div class="metric-value">{sales['total_customers']}</div>
-                <div class="formula">Total Customers = Count(Distinct Customer IDs)</div>
-                <div class="explanation">
-                    The number of unique customers who have made purchases.
-                </div>
-            </div>
-        </div>
-        """
+        yield report_templates.SALES_OVERVIEW.substitute(
+            total_revenue=self._format_metric_value(sales['total_revenue']),
+            total_orders=sales['total_orders'],
+            average_order_value=self._format_metric_value(sales['average_order_value']),
+            total_customers=sales['total_customers']
+        )
     
-    def _generate_customer_retention_section(self, metrics: Dict[str, Any]) -> str:
-        """Generates HTML for customer retention section"""
-        retention = metrics["customer_retention"]
-        return f"""
-        <div class="section">
-            <h2>Customer Retention Metrics</h2>
-            <div class="metric-card">
-                <h3>Repeat Customer Rate</h3>
-                <div class="metric-value">{retention['repeat_customer_rate']}%</div>
-                <div class="formula">Repeat Customer Rate = (Customers with Multiple Orders ÷ Total Customers) × 100</div>
-                <div class="explanation">
-                    Percentage of customers who have made more than one purchase, indicating customer loyalty.
-                </div>
-            </div>
-            
-            <div class="metric-card">
-                <h3>Average Orders per Customer</h3>
-                <div class="metric-value">{retention['average_orders_per_customer']}</div>
-                <div class="formula">Average Orders = Total Orders ÷ Total Customers</div>
-                <div class="explanation">
-                    The average number of orders placed by each customer, showing customer engagement level.
-                </div>
-            </div>
-            
-            <div class="metric-card">
-                <h3>90-Day Retention Rate</h3>
-                <div class="metric-value">{retention['customer_retention_rate']}%</div>
-                <div class="formula">90-Day Retention = (Customers Returning within 90 Days ÷ Total Customers) × 100</div>
-                <div class="explanation">
-                    Percentage of customers who make a repeat purchase within 90 days of their first order.
-                </div>
-            </div>
-            
-            <div class="insight">
-                <h3>Key Insights</h3>
-                <ul>
-                    <li>A high repeat customer rate (>30%) indicates strong customer loyalty</li>
-                    <li>Average orders per customer > 2 suggests successful customer retention strategies</li>
-                    <li>90-day retention rate helps evaluate the effectiveness of post-purchase engagement</li>
-                </ul>
-            </div>
-        </div>
-        """
+    def _render_customer_retention(self, metrics: Dict[str, Any]) -> Iterator[str]:
+        """Renders the customer retention section"""
+        yield report_templates.CUSTOMER_RETENTION.substitute(metrics["customer_retention"])
     
-    def _generate_product_performance_section(self, metrics: Dict[str, Any]) -> str:
-        """Generates HTML for product performance section"""
-        products = metrics["product_performance"]["top_products"][:5]  # Top 5 products
-        products_html = ""
-        for product in products:
-            products_html += f"""
-            <div class="metric-card">
-                <h3>{product['product_name']}</h3>
-                <div class="metric-value">
-                    Revenue: {self._format_metric_value(product['total_revenue'])}<br>
-                    Quantity: {product['total_quantity']}<br>
-                    Avg Price: {self._format_metric_value(product['average_price'])}
-                </div>
-                <div class="formula">
-                    Revenue = Σ(Price × Quantity)<br>
-                    Average Price = Total Revenue ÷ Total Quantity
-                </div>
-                <div class="explanation">
-                    Performance metrics for this product, showing its contribution to overall sales.
-                </div>
-            </div>
-            """
-        
-        return f"""
-        <div class="section">
-            <h2>Top Product Performance</h2>
-            {products_html}
-            <div class="insight">
-                <h3>Product Analysis</h3>
-                <ul>
-                    <li>Products with high revenue and quantity indicate strong demand</li>
-                    <li>Average price helps identify pricing strategy effectiveness</li>
-                    <li>Compare product performance to identify growth opportunities</li>
-                </ul>
-            </div>
-        </div>
-        """
+    def _render_product_performance(self, metrics: Dict[str, Any]) -> Iterator[str]:
+        """Renders the top products as cards followed by the full product table, one page at a time"""
+        products = metrics["product_performance"]["top_products"]
+        yield report_templates.PRODUCT_SECTION_START.substitute()
+
+        def product_values(product: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                "product_name": html.escape(str(product['product_name'])),
+                "total_revenue": self._format_metric_value(product['total_revenue']),
+                "total_quantity": product['total_quantity'],
+                "average_price": self._format_metric_value(product['average_price'])
+            }
+
+        for product in products[:TOP_PRODUCT_CARDS]:
+            yield report_templates.PRODUCT_CARD.substitute(product_values(product))
+
+        if len(products) > TOP_PRODUCT_CARDS:
+            for start in range(0, len(products), self.page_size):
+                page = products[start:start + self.page_size]
+                rows = [
+                    report_templates.PRODUCT_ROW.substitute(product_values(product), rank=start + offset + 1)
+                    for offset, product in enumerate(page)
+                ]
+                yield report_templates.PRODUCT_PAGE_START.substitute(
+                    open_attribute=" open" if start == 0 else "",
+                    first_rank=start + 1,
+                    last_rank=start + len(page),
+                    product_count=len(products)
+                ) + ''.join(rows) + report_templates.PRODUCT_PAGE_END.substitute()
+
+        yield report_templates.PRODUCT_SECTION_END.substitute()
     
-    def _generate_discount_impact_section(self, metrics: Dict[str, Any]) -> str:
-        """Generates HTML for discount impact section"""
+    def _render_discount_impact(self, metrics: Dict[str, Any]) -> Iterator[str]:
+        """Renders the discount impact section"""
         discounts = metrics["discount_impact"]
-        return f"""
-        <div class="section">
-            <h2>Discount Impact Analysis</h2>
-            <div class="metric-card">
-                <h3>Discount Usage Rate</h3>
-                <div class="metric-value">{discounts['discount_usage_rate']}%</div>
-                <div class="formula">Discount Usage Rate = (Orders with Discounts ÷ Total Orders) × 100</div>
-                <div class="explanation">
-                    Percentage of orders that used discounts, indicating discount strategy effectiveness.
-                </div>
-            </div>
-            
-            <div class="metric-card">
-                <h3>Average Discount Amount</h3>
-                <div class="metric-value">{self._format_metric_value(discounts['average_discount_amount'])}</div>
-                <div class="formula">Average Discount = Total Discount Amount ÷ Number of Discounted Orders</div>
-                <div class="explanation">
-                    The average discount value applied per order, showing discount generosity.
-                </div>
-            </div>
-            
-            <div class="metric-card">
-                <h3>Revenue Comparison</h3>
-                <div class="metric-value">
-                    With Discounts: {self._format_metric_value(discounts['revenue_with_discounts'])}<br>
-                    Without Discounts: {self._format_metric_value(discounts['revenue_without_discounts'])}
-                </div>
-                <div class="formula">
-                    Revenue with Discounts = Σ(Order Total Price where Discount > 0)<br>
-                    Revenue without Discounts = Σ(Order Total Price where Discount = 0)
-                </div>
-                <div class="explanation">
-                    Comparison of revenue from discounted vs. non-discounted orders.
-                </div>
-            </div>
+        yield report_templates.DISCOUNT_IMPACT.substitute(
+            discount_usage_rate=discounts['discount_usage_rate'],
+            average_discount_amount=self._format_metric_value(discounts['average_discount_amount']),
+            revenue_with_discounts=self._format_metric_value(discounts['revenue_with_discounts']),
+            revenue_without_discounts=self._format_metric_value(discounts['revenue_without_discounts'])
+        )
+
+    def _render_section(self, section: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Renders one section and stores its HTML
+
+        With persisted state the HTML is streamed into a fragment file, otherwise
+        it is kept in memory.
+
+        Returns:
+            Section entry with either an 'html' or an 'html_path' key
+        """
+        renderers = {
+            "sales_overview": self._render_sales_overview,
+            "customer_retention": self._render_customer_retention,
+            "product_performance": self._render_product_performance,
+            "discount_impact": self._render_discount_impact
+        }
+        chunks = renderers[section]({section: metrics})
+        if not self.fragments_dir:
+            return {"html": ''.join(chunks)}
+
+        fragment_path = os.path.join(self.fragments_dir, f"{section}.html")
+        tmp_path = f"{fragment_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(chunks)
+        os.replace(tmp_path, fragment_path)
+        return {"html_path": fragment_path}
+
+    def refresh_sections(self, force: bool = False) -> List[str]:
+        """
+        Recompute and re-render the sections whose source tables changed
+        
+        Metrics are queried sequentially over the shared connection, and the
+        stale sections are then rendered in parallel.
+        
+        Args:
+            force: Rebuild every section regardless of its high-water marks
             
-            <div class="insight">
-                <h3>Discount Strategy Insights</h3>
-                <ul>
-                    <li>High discount usage rate may indicate price sensitivity</li>
-                    <li>Compare revenue with/without discounts to evaluate discount effectiveness</li>
-                    <li>Monitor average discount amount to maintain profitability</li>
-                </ul>
-            </div>
-        </div>
+        Returns:
+            Names of the rebuilt sections
         """
-    
-    def generate_report(self) -> str:
-        """Generates a complete HTML report with all metrics"""
-        metrics = self.analytics.get_all_metrics()
+        watermarks = self._get_watermarks()
+        sections = self.state["sections"]
+        stale = [
+            section for section, tables in SECTION_SOURCES.items()
+            if force or section not in sections
+            or sections[section]["watermarks"] != {table: watermarks[table] for table in tables}
+        ]
+        if not stale:
+            return stale
+
+        metrics = self._compute_metrics(stale)
+        with ThreadPoolExecutor(max_workers=min(self.render_workers, len(stale))) as executor:
+            rendered = dict(zip(stale, executor.map(self._render_section, stale, [metrics[s] for s in stale])))
+
+        for section in stale:
+            sections[section] = {
+                "watermarks": {table: watermarks[table] for table in SECTION_SOURCES[section]},
+                "metrics": metrics[section],
+                **rendered[section]
+            }
+        self._save_state()
+        logger.info(f"Rebuilt report sections: {', '.join(stale)}")
+        return stale
+
+    def write_report(self, stream: TextIO, force: bool = False) -> None:
+        """
+        Streams the complete HTML report into a text stream, one section at a time
         
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Shopify Analytics Report - {datetime.now().strftime('%Y-%m-%d')}</title>
-            {self._get_css_styles()}
-        </head>
-        <body>
-            <div class="container">
-                <h1>Shopify Analytics Report</h1>
-                <p>Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                
-                {self._generate_sales_overview_section(metrics)}
-                {self._generate_customer_retention_section(metrics)}
-                {self._generate_product_performance_section(metrics)}
-                {self._generate_discount_impact_section(metrics)}
-            </div>
-        </body>
-        </html>
+        Args:
+            stream: Writable text stream
+            force: Rebuild every section instead of only the ones whose data changed
+        """
+        self.refresh_sections(force)
+        now = datetime.now()
+        stream.write(report_templates.REPORT_HEADER.substitute(
+            report_date=now.strftime('%Y-%m-%d'),
+            generated_at=now.strftime('%Y-%m-%d %H:%M:%S'),
+            css=self._get_css_styles()
+        ))
+        for section in SECTION_SOURCES:
+            entry = self.state["sections"][section]
+            if "html_path" in entry:
+                with open(entry["html_path"], encoding='utf-8') as f:
+                    shutil.copyfileobj(f, stream)
+            else:
+                stream.write(entry["html"])
+        stream.write(report_templates.REPORT_FOOTER.substitute())
+
+    def generate_report(self, force: bool = False) -> str:
         """
+        Generates a complete HTML report with all metrics
         
-        return html
+        Args:
+            force: Rebuild every section instead of only the ones whose data changed
+        """
+        buffer = io.StringIO()
+        self.write_report(buffer, force)
+        return buffer.getvalue()
     
-    def save_report(self, filepath: str) -> None:
-        """Saves the HTML report to a file"""
-        html = self.generate_report()
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(html)
+    def save_report(self, filepath: str, force: bool = False) -> None:
+        """Streams the HTML report into a file, replacing it once complete"""
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            self.write_report(f, force)
+        os.replace(tmp_path, filepath)
 
 def main():
     """Example usage of the report generator"""
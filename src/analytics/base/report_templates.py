@@ -0,0 +1,204 @@
+"""
+HTML templates for the analytics report.
+
+Templates are compiled once at import, and rendering only substitutes
+precomputed values, so no section HTML is rebuilt with string concatenation.
+"""
+from string import Template
+
+REPORT_HEADER = Template("""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Shopify Analytics Report - $report_date</title>
+            $css
+        </head>
+        <body>
+            <div class="container">
+                <h1>Shopify Analytics Report</h1>
+                <p>Generated on: $generated_at</p>
+""")
+
+REPORT_FOOTER = Template("""
+            </div>
+        </body>
+        </html>
+""")
+
+SALES_OVERVIEW = Template("""
+        <div class="section">
+            <h2>Sales Overview</h2>
+            <div class="metric-card">
+                <h3>Total Revenue</h3>
+                <div class="metric-value">$total_revenue</div>
+                <div class="formula">Total Revenue = Σ(Order Total Price)</div>
+                <div class="explanation">
+                    The sum of all order values, representing the total income generated from sales.
+                </div>
+            </div>
+
+            <div class="metric-card">
+                <h3>Total Orders</h3>
+                <div class="metric-value">$total_orders</div>
+                <div class="formula">Total Orders = Count(Orders)</div>
+                <div class="explanation">
+                    The total number of orders processed, indicating sales volume.
+                </div>
+            </div>
+
+            <div class="metric-card">
+                <h3>Average Order Value (AOV)</h3>
+                <div class="metric-value">$average_order_value</div>
+                <div class="formula">AOV = Total Revenue ÷ Total Orders</div>
+                <div class="explanation">
+                    The average amount spent per order, a key metric for understanding customer spending patterns.
+                </div>
+            </div>
+
+            <div class="metric-card">
+                <h3>Total Customers</h3>
+                <div class="metric-value">$total_customers</div>
+                <div class="formula">Total Customers = Count(Distinct Customer IDs)</div>
+                <div class="explanation">
+                    The number of unique customers who have made purchases.
+                </div>
+            </div>
+        </div>
+""")
+
+CUSTOMER_RETENTION = Template("""
+        <div class="section">
+            <h2>Customer Retention Metrics</h2>
+            <div class="metric-card">
+                <h3>Repeat Customer Rate</h3>
+                <div class="metric-value">$repeat_customer_rate%</div>
+                <div class="formula">Repeat Customer Rate = (Customers with Multiple Orders ÷ Total Customers) × 100</div>
+                <div class="explanation">
+                    Percentage of customers who have made more than one purchase, indicating customer loyalty.
+                </div>
+            </div>
+
+            <div class="metric-card">
+                <h3>Average Orders per Customer</h3>
+                <div class="metric-value">$average_orders_per_customer</div>
+                <div class="formula">Average Orders = Total Orders ÷ Total Customers</div>
+                <div class="explanation">
+                    The average number of orders placed by each customer, showing customer engagement level.
+                </div>
+            </div>
+
+            <div class="metric-card">
+                <h3>90-Day Retention Rate</h3>
+                <div class="metric-value">$customer_retention_rate%</div>
+                <div class="formula">90-Day Retention = (Customers Returning within 90 Days ÷ Total Customers) × 100</div>
+                <div class="explanation">
+                    Percentage of customers who make a repeat purchase within 90 days of their first order.
+                </div>
+            </div>
+
+            <div class="insight">
+                <h3>Key Insights</h3>
+                <ul>
+                    <li>A high repeat customer rate (>30%) indicates strong customer loyalty</li>
+                    <li>Average orders per customer > 2 suggests successful customer retention strategies</li>
+                    <li>90-day retention rate helps evaluate the effectiveness of post-purchase engagement</li>
+                </ul>
+            </div>
+        </div>
+""")
+
+PRODUCT_SECTION_START = Template("""
+        <div class="section">
+            <h2>Top Product Performance</h2>
+""")
+
+PRODUCT_CARD = Template("""
+            <div class="metric-card">
+                <h3>$product_name</h3>
+                <div class="metric-value">
+                    Revenue: $total_revenue<br>
+                    Quantity: $total_quantity<br>
+                    Avg Price: $average_price
+                </div>
+                <div class="formula">
+                    Revenue = Σ(Price × Quantity)<br>
+                    Average Price = Total Revenue ÷ Total Quantity
+                </div>
+                <div class="explanation">
+                    Performance metrics for this product, showing its contribution to overall sales.
+                </div>
+            </div>
+""")
+
+PRODUCT_PAGE_START = Template("""
+            <details class="product-page"$open_attribute>
+                <summary>Products $first_rank-$last_rank of $product_count</summary>
+                <table class="product-table">
+                    <tr><th>#</th><th>Product</th><th>Revenue</th><th>Quantity</th><th>Avg Price</th></tr>
+""")
+
+PRODUCT_ROW = Template("""                    <tr><td>$rank</td><td>$product_name</td><td>$total_revenue</td><td>$total_quantity</td><td>$average_price</td></tr>
+""")
+
+PRODUCT_PAGE_END = Template("""                </table>
+            </details>
+""")
+
+PRODUCT_SECTION_END = Template("""
+            <div class="insight">
+                <h3>Product Analysis</h3>
+                <ul>
+                    <li>Products with high revenue and quantity indicate strong demand</li>
+                    <li>Average price helps identify pricing strategy effectiveness</li>
+                    <li>Compare product performance to identify growth opportunities</li>
+                </ul>
+            </div>
+        </div>
+""")
+
+DISCOUNT_IMPACT = Template("""
+        <div class="section">
+            <h2>Discount Impact Analysis</h2>
+            <div class="metric-card">
+                <h3>Discount Usage Rate</h3>
+                <div class="metric-value">$discount_usage_rate%</div>
+                <div class="formula">Discount Usage Rate = (Orders with Discounts ÷ Total Orders) × 100</div>
+                <div class="explanation">
+                    Percentage of orders that used discounts, indicating discount strategy effectiveness.
+                </div>
+            </div>
+
+            <div class="metric-card">
+                <h3>Average Discount Amount</h3>
+                <div class="metric-value">$average_discount_amount</div>
+                <div class="formula">Average Discount = Total Discount Amount ÷ Number of Discounted Orders</div>
+                <div class="explanation">
+                    The average discount value applied per order, showing discount generosity.
+                </div>
+            </div>
+
+            <div class="metric-card">
+                <h3>Revenue Comparison</h3>
+                <div class="metric-value">
+                    With Discounts: $revenue_with_discounts<br>
+                    Without Discounts: $revenue_without_discounts
+                </div>
+                <div class="formula">
+                    Revenue with Discounts = Σ(Order Total Price where Discount > 0)<br>
+                    Revenue without Discounts = Σ(Order Total Price where Discount = 0)
+                </div>
+                <div class="explanation">
+                    Comparison of revenue from discounted vs. non-discounted orders.
+                </div>
+            </div>
+
+            <div class="insight">
+                <h3>Discount Strategy Insights</h3>
+                <ul>
+                    <li>High discount usage rate may indicate price sensitivity</li>
+                    <li>Compare revenue with/without discounts to evaluate discount effectiveness</li>
+                    <li>Monitor average discount amount to maintain profitability</li>
+                </ul>
+            </div>
+        </div>
+""")
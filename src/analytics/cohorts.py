@@ -0,0 +1,158 @@
+import pandas as pd
+from typing import Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One row per customer, computed straight from the orders table. Distinct
+# order times are grouped first, so only the two earliest are kept per customer
+# and both GROUP BYs can spill to disk.
+CUSTOMER_ACTIVITY_FROM_ORDERS = """
+    SELECT
+        customer_id,
+        sum(orders) as order_count,
+        groupArraySorted(2)(created_at) as first_order_times,
+        groupUniqArray(toStartOfMonth(created_at)) as activity_months
+    FROM (
+        SELECT customer_id, created_at, count() as orders
+        FROM orders
+        GROUP BY customer_id, created_at
+    )
+    GROUP BY customer_id
+"""
+
+
+class CohortAnalyzer:
+    """
+    Join-free customer retention and cohort analysis.
+
+    Every metric is derived from a GROUP BY customer_id pass that keeps each
+    customer's two earliest distinct order times and their active months, so
+    first and second order dates come from one aggregation instead of
+    self-joins or window functions. Per-customer state grows with the number
+    of active months, not orders, and GROUP BY state spills to disk past a
+    configurable size, keeping memory bounded regardless of the number of
+    customers.
+    """
+
+    def __init__(self, clickhouse_client, spill_threshold_bytes: int = 1 << 30):
+        """
+        Initialize the analyzer
+
+        Args:
+            clickhouse_client: ClickHouse client instance
+            spill_threshold_bytes: GROUP BY state size above which ClickHouse spills to disk
+        """
+        self.client = clickhouse_client
+        self.settings: Dict[str, Any] = {
+            'max_bytes_before_external_group_by': spill_threshold_bytes
+        }
+
+    def get_retention_summary(self, window_days: int = 90) -> Dict[str, float]:
+        """
+        Compute repeat rate, orders per customer and N-day retention in one pass
+
+        Args:
+            window_days: Days after the first order within which a second order counts as retained
+
+        Returns:
+            Dict containing repeat_customer_rate, average_orders_per_customer
+            and customer_retention_rate
+        """
+        query = f"""
+        SELECT
+            countIf(order_count > 1) * 100.0 / count() as repeat_customer_rate,
+            avg(order_count) as average_orders_per_customer,
+            countIf(length(first_order_times) > 1
+                AND dateDiff('day', first_order_times[1], first_order_times[2]) <= {int(window_days)}) * 100.0 / count()
+                as customer_retention_rate
+        FROM ({CUSTOMER_ACTIVITY_FROM_ORDERS})
+        """
+        result = self.client.execute_query(query, settings=self.settings)
+        if not result or not result[0] or result[0][1] is None:
+            return {
+                "repeat_customer_rate": 0.0,
+                "average_orders_per_customer": 0.0,
+                "customer_retention_rate": 0.0
+            }
+        repeat_rate, avg_orders, retention_rate = result[0]
+        return {
+            "repeat_customer_rate": round(float(repeat_rate), 2),
+            "average_orders_per_customer": round(float(avg_orders), 2),
+            "customer_retention_rate": round(float(retention_rate), 2)
+        }
+
+    def get_cohort_matrix(self, max_months: int = 12) -> pd.DataFrame:
+        """
+        Build a cohort retention matrix
+
+        Customers are grouped by the month of their first order, and each
+        cell counts the customers of that cohort active N months later.
+
+        Args:
+            max_months: Largest months-since-first-order offset to include
+
+        Returns:
+            DataFrame with cohort_month, months_since_first_order, customers,
+            cohort_size and retention_rate columns
+        """
+        query = f"""
+        SELECT
+            arrayMin(activity_months) as cohort_month,
+            dateDiff('month', cohort_month, activity_month) as months_since_first_order,
+            count() as customers
+        FROM ({CUSTOMER_ACTIVITY_FROM_ORDERS})
+        ARRAY JOIN activity_months as activity_month
+        WHERE months_since_first_order <= {int(max_months)}
+        GROUP BY cohort_month, months_since_first_order
+        ORDER BY cohort_month, months_since_first_order
+        """
+        df = pd.DataFrame(self.client.execute_columnar(query, settings=self.settings), copy=False)
+        if df.empty:
+            return df.assign(cohort_size=pd.Series(dtype='int64'), retention_rate=pd.Series(dtype='float64'))
+
+        cohort_sizes = df.loc[df['months_since_first_order'] == 0].set_index('cohort_month')['customers']
+        df['cohort_size'] = df['cohort_month'].map(cohort_sizes)
+        df['retention_rate'] = df['customers'] / df['cohort_size'] * 100
+        return df
+
+    def get_daily_retention(self, days: int = 365) -> pd.DataFrame:
+        """
+        Split each day's customers into new and returning
+
+        A customer is new on the day of their first order within the window and
+        returning on every later day, or on the first day if they ordered again
+        that day. Per-day order totals come from a single sumMap per customer.
+
+        Args:
+            days: Number of days of history to analyze
+
+        Returns:
+            DataFrame with order_date, total_customers, new_customers,
+            returning_customers, returning_customer_value, retention_rate
+            and new_customer_rate columns
+        """
+        query = f"""
+        SELECT
+            order_date,
+            count() as total_customers,
+            countIf(order_date = first_date) as new_customers,
+            countIf(order_date != first_date OR day_orders > 1) as returning_customers,
+            sum(if(order_date = first_date, day_revenue - first_value, day_revenue))
+                / sum(if(order_date = first_date, day_orders - 1, day_orders)) as returning_customer_value,
+            (returning_customers / total_customers) * 100 as retention_rate,
+            (new_customers / total_customers) * 100 as new_customer_rate
+        FROM (
+            SELECT
+                toDate(min(created_at)) as first_date,
+                argMin(toFloat64(total_price), created_at) as first_value,
+                sumMap([toDate(created_at)], [toFloat64(total_price)], [toUInt64(1)]) as daily
+            FROM orders
+            WHERE created_at >= now() - INTERVAL {int(days)} DAY
+            GROUP BY customer_id
+        )
+        ARRAY JOIN daily.1 as order_date, daily.2 as day_revenue, daily.3 as day_orders
+        GROUP BY order_date
+        ORDER BY order_date
+        """
+        return pd.DataFrame(self.client.execute_columnar(query, settings=self.settings), copy=False)
@@ -0,0 +1,121 @@
+import numpy as np
+import plotly.graph_objects as go
+from typing import Callable, Optional, Sequence, Union
+
+# Series longer than this are downsampled with LTTB before plotting
+MAX_SERIES_POINTS = 2000
+
+# Data with more points than this is rendered with WebGL, judged before any downsampling
+WEBGL_THRESHOLD = 5000
+
+
+class LazyFigure:
+    """
+    Defers building a plotly figure until it is first used.
+
+    Analytics methods return a LazyFigure next to their DataFrame, so callers
+    that only need the data never pay for plotting. Attribute access is
+    forwarded to the built figure, so a LazyFigure can be used wherever a
+    go.Figure is expected (write_html, show, update_layout, ...).
+    """
+
+    def __init__(self, builder: Callable[[], go.Figure]):
+        """
+        Initialize the lazy figure
+
+        Args:
+            builder: Zero-argument callable that builds the figure
+        """
+        self._builder = builder
+        self._figure: Optional[go.Figure] = None
+
+    @property
+    def is_built(self) -> bool:
+        return self._figure is not None
+
+    def build(self) -> go.Figure:
+        """Build the figure on first use and return it"""
+        if self._figure is None:
+            self._figure = self._builder()
+            self._builder = None
+        return self._figure
+
+    def __getattr__(self, name):
+        return getattr(self.build(), name)
+
+
+def lttb_indices(x: Sequence, y: Sequence, threshold: int) -> np.ndarray:
+    """
+    Select points with the Largest-Triangle-Three-Buckets algorithm
+
+    Keeps the first and last points and, from each bucket in between, the point
+    forming the largest triangle with the previously selected point and the
+    average of the next bucket. This preserves the visual shape of a series.
+
+    Args:
+        x: Monotonic x values (numbers or datetimes)
+        y: Numeric y values
+        threshold: Number of points to keep
+
+    Returns:
+        Sorted indices of the selected points
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype(np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    selected = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[selected] - avg_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (avg_y - y[selected])
+        )
+        selected = start + int(np.argmax(area))
+        indices[bucket + 1] = selected
+
+    return indices
+
+
+def time_series_trace(x: Sequence, y: Sequence, max_points: int = MAX_SERIES_POINTS,
+                      **kwargs) -> Union[go.Scatter, go.Scattergl]:
+    """
+    Build a scatter/line trace sized for the browser
+
+    Series longer than WEBGL_THRESHOLD points are rendered with WebGL, and
+    series longer than max_points are downsampled with LTTB.
+
+    Args:
+        x: X values
+        y: Y values
+        max_points: Maximum number of points to plot
+        **kwargs: Extra trace properties (name, mode, line, ...)
+
+    Returns:
+        go.Scatter or go.Scattergl trace
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    trace_type = go.Scattergl if len(x) > WEBGL_THRESHOLD else go.Scatter
+    if len(x) > max_points:
+        keep = lttb_indices(x, y, max_points)
+        x, y = x[keep], y[keep]
+    return trace_type(x=x, y=y, **kwargs)
+
+
+def scatter_render_mode(points: int) -> str:
+    """render_mode for plotly.express 2D scatter and line charts of the given number of points"""
+    return 'webgl' if points > WEBGL_THRESHOLD else 'svg'
@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Segment rules evaluated in order; the first matching rule wins.
+# Each rule is (segment, min_r, max_r, min_f, max_f) on 1-5 scores.
+SEGMENT_RULES = [
+    ('Champions', 4, 5, 4, 5),
+    ('Loyal Customers', 1, 5, 4, 5),
+    ('New Customers', 4, 5, 1, 1),
+    ('Potential Loyalists', 3, 5, 2, 5),
+    ('At Risk', 1, 2, 3, 5),
+    ('Hibernating', 1, 2, 1, 2),
+]
+DEFAULT_SEGMENT = 'Needs Attention'
+
+CUSTOMER_RFM_QUERY = """
+    SELECT
+        customer_id,
+        dateDiff('day', max(created_at), now()) as recency,
+        count() as frequency,
+        toFloat64(sum(total_price)) as monetary
+    FROM orders
+    {where}
+    GROUP BY customer_id
+"""
+
+
+class RFMAnalyzer:
+    """
+    Computes Recency, Frequency, Monetary (RFM) scores for customers.
+
+    Per-customer aggregation and scoring run inside ClickHouse, and only
+    segment-level aggregates (at most quantiles**3 rows) are returned.
+    The same scoring is available as vectorized NumPy for data already in memory.
+    """
+
+    def __init__(self, clickhouse_client, quantiles: int = 5):
+        """
+        Initialize the analyzer
+
+        Args:
+            clickhouse_client: ClickHouse client instance
+            quantiles: Number of score buckets per dimension
+        """
+        if quantiles < 2:
+            raise ValueError("quantiles must be at least 2")
+        self.client = clickhouse_client
+        self.quantiles = quantiles
+
+    @property
+    def _levels(self) -> Sequence[float]:
+        return [i / self.quantiles for i in range(1, self.quantiles)]
+
+    def _segment_sql(self) -> str:
+        """Build the multiIf expression mapping scores to a segment name"""
+        conditions = []
+        for segment, min_r, max_r, min_f, max_f in SEGMENT_RULES:
+            conditions.append(
+                f"r_score BETWEEN {self._scale(min_r)} AND {self._scale(max_r)} "
+                f"AND f_score BETWEEN {self._scale(min_f)} AND {self._scale(max_f)}, '{segment}'"
+            )
+        return f"multiIf({', '.join(conditions)}, '{DEFAULT_SEGMENT}')"
+
+    def _scale(self, score: int) -> int:
+        """Map a rule bound on the 1-5 scale onto the configured number of quantiles"""
+        return max(1, min(self.quantiles, round(score * self.quantiles / 5)))
+
+    def get_thresholds(self) -> Dict[str, np.ndarray]:
+        """
+        Compute quantile thresholds for each RFM dimension in ClickHouse
+
+        Returns:
+            Dict with 'recency', 'frequency' and 'monetary' threshold arrays
+        """
+        levels = ', '.join(str(level) for level in self._levels)
+        query = f"""
+        SELECT
+            quantilesTDigest({levels})(recency) as recency,
+            quantilesTDigest({levels})(frequency) as frequency,
+            quantilesTDigest({levels})(monetary) as monetary
+        FROM ({CUSTOMER_RFM_QUERY.format(where='')})
+        """
+        result = self.client.execute_columnar(query)
+        return {
+            name: np.asarray(values[0] if len(values) else [], dtype=np.float64)
+            for name, values in result.items()
+        }
+
+    def get_score_summary(self, thresholds: Optional[Dict[str, np.ndarray]] = None) -> pd.DataFrame:
+        """
+        Score every customer in ClickHouse and aggregate by RFM cell
+
+        Args:
+            thresholds: Precomputed thresholds, computed with get_thresholds if omitted
+
+        Returns:
+            DataFrame with one row per (r_score, f_score, m_score) cell
+        """
+        thresholds = thresholds if thresholds is not None else self.get_thresholds()
+        r_q, f_q, m_q = (
+            '[' + ', '.join(repr(float(v)) for v in thresholds[name]) + ']'
+            for name in ('recency', 'frequency', 'monetary')
+        )
+        query = f"""
+        SELECT
+            r_score,
+            f_score,
+            m_score,
+            {self._segment_sql()} as segment,
+            count() as customers,
+            avg(recency) as avg_recency,
+            avg(frequency) as avg_frequency,
+            avg(monetary) as avg_monetary,
+            sum(monetary) as total_monetary
+        FROM (
+            SELECT
+                recency,
+                frequency,
+                monetary,
+                {self.quantiles} - arrayCount(q -> recency > q, {r_q}) as r_score,
+                1 + arrayCount(q -> frequency > q, {f_q}) as f_score,
+                1 + arrayCount(q -> monetary > q, {m_q}) as m_score
+            FROM ({CUSTOMER_RFM_QUERY.format(where='')})
+        )
+        GROUP BY r_score, f_score, m_score, segment
+        ORDER BY r_score DESC, f_score DESC, m_score DESC
+        """
+        return pd.DataFrame(self.client.execute_columnar(query), copy=False)
+
+    def summarize_segments(self, score_summary: pd.DataFrame) -> pd.DataFrame:
+        """
+        Roll RFM cells up to named segments
+
+        Args:
+            score_summary: Output of get_score_summary
+
+        Returns:
+            DataFrame with one row per segment
+        """
+        df = score_summary.assign(
+            recency_weighted=score_summary['avg_recency'] * score_summary['customers'],
+            frequency_weighted=score_summary['avg_frequency'] * score_summary['customers']
+        )
+        segments = df.groupby('segment', as_index=False).agg(
+            customers=('customers', 'sum'),
+            recency_weighted=('recency_weighted', 'sum'),
+            frequency_weighted=('frequency_weighted', 'sum'),
+            total_monetary=('total_monetary', 'sum')
+        )
+        segments['avg_recency'] = segments.pop('recency_weighted') / segments['customers']
+        segments['avg_frequency'] = segments.pop('frequency_weighted') / segments['customers']
+        segments['avg_monetary'] = segments['total_monetary'] / segments['customers']
+        segments['share'] = segments['customers'] / segments['customers'].sum() * 100
+        return segments.sort_values('total_monetary', ascending=False, ignore_index=True)
+
+    def sample_customers(self, sample_size: int, total_customers: int,
+                         thresholds: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """
+        Fetch a deterministic hash-based sample of scored customers
+
+        The sample is filtered on cityHash64(customer_id) before aggregation,
+        so only the sampled customers' orders are grouped.
+
+        Args:
+            sample_size: Approximate number of customers to return
+            total_customers: Total number of customers, used to pick the sampling modulus
+            thresholds: Thresholds used to score the sample
+
+        Returns:
+            DataFrame with per-customer RFM values, scores and segment
+        """
+        modulus = max(1, total_customers // max(1, sample_size))
+        where = f"WHERE cityHash64(customer_id) % {modulus} = 0" if modulus > 1 else ""
+        query = f"{CUSTOMER_RFM_QUERY.format(where=where)} LIMIT {int(sample_size)}"
+        df = pd.DataFrame(self.client.execute_columnar(query), copy=False)
+        return self.score(df, thresholds)
+
+    def score(self, df: pd.DataFrame, thresholds: Optional[Dict[str, np.ndarray]] = None) -> pd.DataFrame:
+        """
+        Score customers with vectorized NumPy
+
+        Args:
+            df: DataFrame with 'recency', 'frequency' and 'monetary' columns
+            thresholds: Thresholds to score against, computed from df if omitted
+
+        Returns:
+            Copy of df with r_score, f_score, m_score and segment columns
+        """
+        if thresholds is None:
+            thresholds = {
+                name: np.quantile(df[name].to_numpy(dtype=np.float64), self._levels) if len(df) else np.array([])
+                for name in ('recency', 'frequency', 'monetary')
+            }
+
+        def bucket(name: str) -> np.ndarray:
+            # Number of thresholds strictly below each value, as arrayCount(q -> x > q) in SQL
+            return np.searchsorted(thresholds[name], df[name].to_numpy(dtype=np.float64), side='left')
+
+        r_score = self.quantiles - bucket('recency')
+        f_score = 1 + bucket('frequency')
+        m_score = 1 + bucket('monetary')
+
+        conditions = [
+            (r_score >= self._scale(min_r)) & (r_score <= self._scale(max_r))
+            & (f_score >= self._scale(min_f)) & (f_score <= self._scale(max_f))
+            for _, min_r, max_r, min_f, max_f in SEGMENT_RULES
+        ]
+        segments = np.select(conditions, [rule[0] for rule in SEGMENT_RULES], default=DEFAULT_SEGMENT)
+
+        return df.assign(r_score=r_score, f_score=f_score, m_score=m_score, segment=segments)
+
+    @staticmethod
+    def recency_days(last_order: np.ndarray, now: Optional[np.datetime64] = None) -> np.ndarray:
+        """
+        Vectorized recency in whole days
+
+        Args:
+            last_order: Array of last order timestamps
+            now: Reference time, defaults to the current time
+
+        Returns:
+            Integer array of days since the last order
+        """
+        now = now if now is not None else np.datetime64('now')
+        return (now - np.asarray(last_order, dtype='datetime64[s]')) // np.timedelta64(1, 'D')
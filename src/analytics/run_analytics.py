@@ -1,4 +1,5 @@
 import os
+import argparse
 import logging
 from datetime import datetime
 import sys
@@ -11,6 +12,7 @@ if src_path not in sys.path:
 
 from src.database.clickhouse_client import ClickHouseClient
 from src.analytics.shopify_analytics import ShopifyAnalytics
+from src.export import ColumnarExporter
 
 # Configure logging
 logging.basicConfig(
@@ -27,12 +29,20 @@ def setup_output_directory():
     return output_dir
 
 def save_visualization(fig, filename, output_dir):
-    """Save visualization to HTML file"""
+    """Save visualization to HTML file, loading plotly.js from the CDN to keep files small"""
     output_path = os.path.join(output_dir, filename)
-    fig.write_html(output_path)
+    fig.write_html(output_path, include_plotlyjs='cdn')
     logger.info(f"Saved visualization to {output_path}")
 
-def main():
+def main(save_figures: bool = True, file_format: str = 'parquet', snapshot_tables: bool = False):
+    """
+    Generate the analytics report
+    
+    Args:
+        save_figures: Build and save figures; when False, figures are never built
+        file_format: Format of the exported metric data, 'parquet' or 'arrow'
+        snapshot_tables: Also export full snapshots of the orders and order_items tables
+    """
     try:
         # Initialize ClickHouse client
         client = ClickHouseClient()
@@ -43,6 +53,7 @@ def main():
         # Create output directory
         output_dir = setup_output_directory()
         logger.info(f"Created output directory: {output_dir}")
+        exporter = ColumnarExporter(output_dir, file_format=file_format)
         
         # Generate analytics report
         report = analytics.generate_analytics_report()
@@ -50,7 +61,8 @@ def main():
         # Save visualizations and print summary statistics
         for metric_name, (df, fig) in report.items():
             # Save visualization
-            save_visualization(fig, f"{metric_name}.html", output_dir)
+            if save_figures:
+                save_visualization(fig, f"{metric_name}.html", output_dir)
             
             # Print summary statistics
             logger.info(f"\n{metric_name.upper()} Summary:")
@@ -59,10 +71,12 @@ def main():
             logger.info("\nSummary statistics:")
             logger.info(df.describe())
             
-            # Save data to CSV
-            csv_path = os.path.join(output_dir, f"{metric_name}.csv")
-            df.to_csv(csv_path, index=False)
-            logger.info(f"Saved data to {csv_path}")
+            # Save data
+            exporter.export_dataframe(metric_name, df)
+        
+        if snapshot_tables:
+            for table in ('orders', 'order_items'):
+                exporter.export_table(client, table)
         
         logger.info(f"\nAnalytics report generated successfully in {output_dir}")
         
@@ -71,4 +85,11 @@ def main():
         raise
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate the Shopify analytics report")
+    parser.add_argument('--no-figures', action='store_true', help="Skip building and saving figures")
+    parser.add_argument('--format', choices=['parquet', 'arrow'], default='parquet',
+                        help="Format of the exported data")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="Also export snapshots of the orders and order_items tables")
+    args = parser.parse_args()
+    main(save_figures=not args.no_figures, file_format=args.format, snapshot_tables=args.snapshot)
@@ -2,29 +2,81 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from typing import Dict, Tuple
+from typing import Callable, Dict, Iterator, Optional, Tuple
 import logging
 
+from src.analytics.rfm import RFMAnalyzer
+from src.analytics.plotting import LazyFigure, scatter_render_mode, time_series_trace
+from src.analytics.cohorts import CohortAnalyzer
+from src.analytics.base.approximation import ApproximateQueryMode, ExactQueryMode
+
 logger = logging.getLogger(__name__)
 
 class ShopifyAnalytics:
-    def __init__(self, clickhouse_client):
-        """Initialize analytics with ClickHouse client"""
+    def __init__(self, clickhouse_client, approximate: bool = False, sample_ratio: float = 0.1):
+        """
+        Initialize analytics with ClickHouse client
+        
+        Args:
+            clickhouse_client: ClickHouse client instance
+            approximate: Use sampling and sketch aggregates, and report error bounds
+            sample_ratio: Fraction of orders to read in approximate mode
+        """
         self.client = clickhouse_client
+        self.mode = ApproximateQueryMode(clickhouse_client, sample_ratio) if approximate else ExactQueryMode()
+        self.rfm = RFMAnalyzer(clickhouse_client)
+        self.cohorts = CohortAnalyzer(clickhouse_client)
 
     def _execute_query(self, query: str) -> pd.DataFrame:
         """Execute query and return results as DataFrame"""
         try:
-            result = self.client.execute_query(query)
-            # Get column names from the query
-            column_names = [col.split(' as ')[-1].strip() for col in query.split('SELECT')[1].split('FROM')[0].split(',')]
-            column_names = [col.split()[-1] for col in column_names]  # Handle cases with 'as'
-            return pd.DataFrame(result, columns=column_names)
+            # Column names and types come from the driver's metadata
+            return pd.DataFrame(self.client.execute_columnar(query), copy=False)
         except Exception as e:
             logger.error(f"Error executing query: {str(e)}")
             raise
 
-    def get_sales_over_time(self, days: int = 30) -> Tuple[pd.DataFrame, go.Figure]:
+    def _stream_query(self, query: str,
+                      transform: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Execute a large query and yield its result block by block
+
+        Only one block is held at a time, so callers that reduce each block
+        keep memory bounded by the block size instead of the result size.
+
+        Args:
+            query: SQL query to execute
+            transform: Optional function applied to each block before it is yielded
+        """
+        try:
+            for block in self.client.stream_columnar(query):
+                frame = pd.DataFrame(block, copy=False)
+                yield transform(frame) if transform else frame
+        except Exception as e:
+            logger.error(f"Error executing query: {str(e)}")
+            raise
+
+    def _apply_estimates(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Scale sampled daily totals and add error bound columns for the business KPIs"""
+        medians = [self.mode.median(band) for band in df['median_band']]
+        estimates = {
+            'daily_revenue': [self.mode.sum(v, sq, 'orders') for v, sq in zip(df['daily_revenue'], df['daily_revenue_squares'])],
+            'total_discounts': [self.mode.sum(v, sq, 'orders') for v, sq in zip(df['total_discounts'], df['total_discounts_squares'])],
+            'unique_customers': [self.mode.distinct_count(v, 'orders') for v in df['unique_customers']],
+            'total_orders': [self.mode.count(v, 'orders') for v in df['total_orders']],
+            'median_order_value': medians
+        }
+        df = df.drop(columns=['median_band', 'daily_revenue_squares', 'total_discounts_squares'])
+        df['median_order_value'] = [estimate.value for estimate in medians]
+        if self.mode.approximate:
+            for column, values in estimates.items():
+                df[column] = [estimate.value for estimate in values]
+                df[f'{column}_error'] = [estimate.error for estimate in values]
+            # Scaled orders over unsampled customers, instead of the sample's own ratio
+            df['orders_per_customer'] = df['total_orders'] / df['unique_customers']
+        return df
+
+    def get_sales_over_time(self, days: int = 30) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze sales trends over time"""
         query = f"""
         SELECT 
@@ -41,31 +93,33 @@ class ShopifyAnalytics:
         df = self._execute_query(query)
         logger.info(f"DataFrame columns: {df.columns.tolist()}")
         
-        # Create visualization
-        fig = make_subplots(specs=[[{"secondary_y": True}]])
-        
-        fig.add_trace(
-            go.Scatter(x=df['date'], y=df['total_sales'], name="Total Sales"),
-            secondary_y=False
-        )
-        
-        fig.add_trace(
-            go.Scatter(x=df['date'], y=df['order_count'], name="Order Count"),
-            secondary_y=True
-        )
-        
-        fig.update_layout(
-            title="Sales and Order Trends Over Time",
-            xaxis_title="Date",
-            hovermode="x unified"
-        )
-        
-        fig.update_yaxes(title_text="Total Sales ($)", secondary_y=False)
-        fig.update_yaxes(title_text="Order Count", secondary_y=True)
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            fig = make_subplots(specs=[[{"secondary_y": True}]])
+            
+            fig.add_trace(
+                time_series_trace(x=df['date'], y=df['total_sales'], name="Total Sales"),
+                secondary_y=False
+            )
+            
+            fig.add_trace(
+                time_series_trace(x=df['date'], y=df['order_count'], name="Order Count"),
+                secondary_y=True
+            )
+            
+            fig.update_layout(
+                title="Sales and Order Trends Over Time",
+                xaxis_title="Date",
+                hovermode="x unified"
+            )
+            
+            fig.update_yaxes(title_text="Total Sales ($)", secondary_y=False)
+            fig.update_yaxes(title_text="Order Count", secondary_y=True)
+            return fig
         
-        return df, fig
+        return df, LazyFigure(build_figure)
 
-    def get_product_performance(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_product_performance(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze product performance metrics"""
         query = """
         SELECT 
@@ -82,58 +136,71 @@ class ShopifyAnalytics:
         
         df = self._execute_query(query)
         
-        # Create visualization
-        fig = px.bar(
-            df,
-            x='product_name',
-            y='total_revenue',
-            title="Top 10 Products by Revenue",
-            labels={'total_revenue': 'Total Revenue ($)', 'product_name': 'Product'},
-            color='units_sold',
-            color_continuous_scale='Viridis'
-        )
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            fig = px.bar(
+                df,
+                x='product_name',
+                y='total_revenue',
+                title="Top 10 Products by Revenue",
+                labels={'total_revenue': 'Total Revenue ($)', 'product_name': 'Product'},
+                color='units_sold',
+                color_continuous_scale='Viridis'
+            )
+            return fig
         
-        return df, fig
+        return df, LazyFigure(build_figure)
 
-    def get_customer_segments(self) -> Tuple[pd.DataFrame, go.Figure]:
-        """Analyze customer segments and their behavior"""
-        query = """
-        SELECT 
-            customer_id,
-            count() as order_count,
-            sum(total_price) as total_spent,
-            avg(total_price) as average_order_value,
-            min(created_at) as first_order,
-            max(created_at) as last_order
-        FROM orders
-        GROUP BY customer_id
+    def get_customer_segments(self, sample_size: int = 0) -> Tuple[pd.DataFrame, LazyFigure]:
         """
+        Analyze customer segments using RFM scoring
+
+        Scoring runs in ClickHouse and only segment-level aggregates are returned.
+
+        Args:
+            sample_size: Number of sampled customers to plot as a point cloud, 0 to disable
+        """
+        thresholds = self.rfm.get_thresholds()
+        score_summary = self.rfm.get_score_summary(thresholds)
+        df = self.rfm.summarize_segments(score_summary)
         
-        df = self._execute_query(query)
-        
-        # Calculate RFM metrics
-        df['last_order'] = pd.to_datetime(df['last_order'])
-        df['recency'] = df['last_order'].apply(lambda x: (pd.Timestamp.now() - x).days)
-        df['frequency'] = df['order_count']
-        df['monetary'] = df['total_spent']
-        
-        # Create visualization
-        fig = px.scatter_3d(
-            df,
-            x='recency',
-            y='frequency',
-            z='monetary',
-            title="Customer Segments (RFM Analysis)",
-            labels={
-                'recency': 'Recency (days)',
-                'frequency': 'Frequency (orders)',
-                'monetary': 'Monetary Value ($)'
-            }
-        )
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            if sample_size > 0:
+                sample = self.rfm.sample_customers(sample_size, int(df['customers'].sum()), thresholds)
+                # 3D scatters are always drawn with WebGL
+                fig = px.scatter_3d(
+                    sample,
+                    x='recency',
+                    y='frequency',
+                    z='monetary',
+                    color='segment',
+                    title=f"Customer Segments (RFM Analysis, {len(sample)} sampled customers)",
+                    labels={
+                        'recency': 'Recency (days)',
+                        'frequency': 'Frequency (orders)',
+                        'monetary': 'Monetary Value ($)'
+                    }
+                )
+            else:
+                fig = px.bar(
+                    df,
+                    x='segment',
+                    y='customers',
+                    color='avg_monetary',
+                    title="Customer Segments (RFM Analysis)",
+                    labels={
+                        'segment': 'Segment',
+                        'customers': 'Customers',
+                        'avg_monetary': 'Avg Monetary Value ($)'
+                    },
+                    color_continuous_scale='Viridis'
+                )
+            return fig
         
-        return df, fig
+        return df, LazyFigure(build_figure)
 
-    def get_payment_analytics(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_payment_analytics(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze payment and financial metrics"""
         query = """
         SELECT 
@@ -148,32 +215,34 @@ class ShopifyAnalytics:
         
         df = self._execute_query(query)
         
-        # Create visualization
-        fig = make_subplots(rows=1, cols=2, specs=[[{"type": "pie"}, {"type": "bar"}]])
-        
-        fig.add_trace(
-            go.Pie(
-                labels=df['financial_status'],
-                values=df['order_count'],
-                name="Order Distribution"
-            ),
-            row=1, col=1
-        )
-        
-        fig.add_trace(
-            go.Bar(
-                x=df['financial_status'],
-                y=df['total_revenue'],
-                name="Revenue by Status"
-            ),
-            row=1, col=2
-        )
-        
-        fig.update_layout(title_text="Payment Status Analysis")
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            fig = make_subplots(rows=1, cols=2, specs=[[{"type": "pie"}, {"type": "bar"}]])
+            
+            fig.add_trace(
+                go.Pie(
+                    labels=df['financial_status'],
+                    values=df['order_count'],
+                    name="Order Distribution"
+                ),
+                row=1, col=1
+            )
+            
+            fig.add_trace(
+                go.Bar(
+                    x=df['financial_status'],
+                    y=df['total_revenue'],
+                    name="Revenue by Status"
+                ),
+                row=1, col=2
+            )
+            
+            fig.update_layout(title_text="Payment Status Analysis")
+            return fig
         
-        return df, fig
+        return df, LazyFigure(build_figure)
 
-    def get_geographic_analysis(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_geographic_analysis(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze sales by geographic location"""
         query = """
         SELECT 
@@ -187,20 +256,22 @@ class ShopifyAnalytics:
         
         df = self._execute_query(query)
         
-        # Create visualization
-        fig = px.choropleth(
-            df,
-            locations='country',
-            locationmode='country names',
-            color='total_revenue',
-            hover_name='country',
-            color_continuous_scale='Viridis',
-            title="Sales by Country"
-        )
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            fig = px.choropleth(
+                df,
+                locations='country',
+                locationmode='country names',
+                color='total_revenue',
+                hover_name='country',
+                color_continuous_scale='Viridis',
+                title="Sales by Country"
+            )
+            return fig
         
-        return df, fig
+        return df, LazyFigure(build_figure)
 
-    def get_time_based_metrics(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_time_based_metrics(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze time-based metrics"""
         query = """
         SELECT 
@@ -215,23 +286,25 @@ class ShopifyAnalytics:
         
         df = self._execute_query(query)
         
-        # Create visualization
-        fig = px.density_heatmap(
-            df,
-            x='hour',
-            y='day_of_week',
-            z='order_count',
-            title="Order Activity Heatmap",
-            labels={
-                'hour': 'Hour of Day',
-                'day_of_week': 'Day of Week',
-                'order_count': 'Number of Orders'
-            }
-        )
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            fig = px.density_heatmap(
+                df,
+                x='hour',
+                y='day_of_week',
+                z='order_count',
+                title="Order Activity Heatmap",
+                labels={
+                    'hour': 'Hour of Day',
+                    'day_of_week': 'Day of Week',
+                    'order_count': 'Number of Orders'
+                }
+            )
+            return fig
         
-        return df, fig
+        return df, LazyFigure(build_figure)
 
-    def get_discount_analysis(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_discount_analysis(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze discount usage and impact"""
         query = '''
         SELECT 
@@ -244,13 +317,15 @@ class ShopifyAnalytics:
         
         df = self._execute_query(query)
         
-        # Create visualization
-        fig = px.bar(
-            x=['Orders with Discounts'],
-            y=[df['order_count'].iloc[0]],
-            title='Number of Orders with Discounts',
-            labels={'x': '', 'y': 'Number of Orders'}
-        )
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            fig = px.bar(
+                x=['Orders with Discounts'],
+                y=[df['order_count'].iloc[0]],
+                title='Number of Orders with Discounts',
+                labels={'x': '', 'y': 'Number of Orders'}
+            )
+            return fig
         
         # Log summary statistics
         logger.info(f"Discount Analysis:")
@@ -258,9 +333,9 @@ class ShopifyAnalytics:
         logger.info(f"Total discount amount: ${df['total_discount_amount'].iloc[0]:.2f}")
         logger.info(f"Average discount per order: ${df['average_discount'].iloc[0]:.2f}")
         
-        return df, fig
+        return df, LazyFigure(build_figure)
 
-    def get_product_category_analysis(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_product_category_analysis(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze product categories and their performance"""
         query = """
         SELECT 
@@ -275,19 +350,21 @@ class ShopifyAnalytics:
         
         df = self._execute_query(query)
         
-        # Create visualization
-        fig = px.treemap(
-            df,
-            path=['product_name'],
-            values='total_revenue',
-            color='order_count',
-            title="Product Category Performance",
-            color_continuous_scale='Viridis'
-        )
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            fig = px.treemap(
+                df,
+                path=['product_name'],
+                values='total_revenue',
+                color='order_count',
+                title="Product Category Performance",
+                color_continuous_scale='Viridis'
+            )
+            return fig
         
-        return df, fig
+        return df, LazyFigure(build_figure)
 
-    def get_customer_lifetime_value(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_customer_lifetime_value(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Calculate and analyze customer lifetime value"""
         query = """
         SELECT 
@@ -300,26 +377,67 @@ class ShopifyAnalytics:
         GROUP BY customer_id
         """
         
-        df = self._execute_query(query)
+        def add_clv(block: pd.DataFrame) -> pd.DataFrame:
+            block['customer_age'] = (block['last_order'] - block['first_order']).dt.days
+            block['clv'] = block['total_spent'] / (block['customer_age'] / 365.0)  # Annual CLV
+            return block
+
+        # One row per customer; streamed blocks hold typed columns instead of every row as a tuple
+        df = pd.concat(list(self._stream_query(query, add_clv)), ignore_index=True)
         
-        # Calculate CLV
-        df['customer_age'] = (pd.to_datetime(df['last_order']) - pd.to_datetime(df['first_order'])).dt.days
-        # Convert decimal to float before calculation
-        df['total_spent'] = df['total_spent'].astype(float)
-        df['clv'] = df['total_spent'] / (df['customer_age'] / 365.0)  # Annual CLV
-        
-        # Create visualization
-        fig = px.histogram(
-            df,
-            x='clv',
-            nbins=50,
-            title="Customer Lifetime Value Distribution",
-            labels={'clv': 'Annual CLV ($)'}
+        # Binned in ClickHouse, and only once the figure is used, so it holds one bar per bin
+        return df, LazyFigure(lambda: self.get_customer_lifetime_value_histogram()[1].build())
+
+    def get_customer_lifetime_value_histogram(self, nbins: int = 50) -> Tuple[pd.DataFrame, LazyFigure]:
+        """
+        Distribution of annual customer lifetime value, binned in a single ClickHouse query
+
+        Only the bins leave the server, so memory does not grow with the
+        number of customers. Bins come from ClickHouse's adaptive histogram,
+        so their widths follow the data and their customer counts are
+        approximate. Customers whose first and last orders fall within a day
+        have no annual CLV and are left out, as get_customer_lifetime_value
+        makes their clv infinite.
+
+        Args:
+            nbins: Maximum number of bins
+
+        Returns:
+            DataFrame with clv_bin_start, clv_bin_end and customers columns
+        """
+        query = f"""
+        SELECT
+            bin.1 as clv_bin_start,
+            bin.2 as clv_bin_end,
+            bin.3 as customers
+        FROM (
+            SELECT arrayJoin(histogram({int(nbins)})(clv)) as bin
+            FROM (
+                -- Same formula as get_customer_lifetime_value: whole days between first and last order, annualized
+                SELECT toFloat64(sum(total_price)) / (intDiv(dateDiff('second', min(created_at), max(created_at)), 86400) / 365.0) as clv
+                FROM orders
+                GROUP BY customer_id
+            )
+            WHERE isFinite(clv)
         )
-        
-        return df, fig
+        ORDER BY clv_bin_start
+        """
+        df = self._execute_query(query)
+
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            fig = go.Figure(go.Bar(
+                x=(df['clv_bin_start'] + df['clv_bin_end']) / 2,
+                y=df['customers'],
+                width=df['clv_bin_end'] - df['clv_bin_start']
+            ))
+            fig.update_layout(title="Customer Lifetime Value Distribution", xaxis_title='Annual CLV ($)',
+                              yaxis_title='Customers', bargap=0)
+            return fig
 
-    def get_inventory_turnover(self) -> Tuple[pd.DataFrame, go.Figure]:
+        return df, LazyFigure(build_figure)
+
+    def get_inventory_turnover(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze inventory turnover rates"""
         query = """
         SELECT 
@@ -333,32 +451,32 @@ class ShopifyAnalytics:
         
         df = self._execute_query(query)
         
-        # Convert total_revenue to float
-        df['total_revenue'] = df['total_revenue'].astype(float)
-        
         # Calculate turnover rate
         df['turnover_rate'] = df['total_quantity'] / df['order_count']
         
-        # Create visualization
-        fig = px.scatter(
-            df,
-            x='total_quantity',
-            y='turnover_rate',
-            size='total_revenue',
-            color='order_count',
-            hover_name='product_name',
-            title="Inventory Turnover Analysis",
-            labels={
-                'total_quantity': 'Total Quantity Sold',
-                'turnover_rate': 'Turnover Rate',
-                'total_revenue': 'Total Revenue',
-                'order_count': 'Number of Orders'
-            }
-        )
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            fig = px.scatter(
+                df,
+                x='total_quantity',
+                y='turnover_rate',
+                size='total_revenue',
+                color='order_count',
+                hover_name='product_name',
+                render_mode=scatter_render_mode(len(df)),
+                title="Inventory Turnover Analysis",
+                labels={
+                    'total_quantity': 'Total Quantity Sold',
+                    'turnover_rate': 'Turnover Rate',
+                    'total_revenue': 'Total Revenue',
+                    'order_count': 'Number of Orders'
+                }
+            )
+            return fig
         
-        return df, fig
+        return df, LazyFigure(build_figure)
 
-    def get_seasonal_trends(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_seasonal_trends(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze seasonal trends in sales"""
         query = """
         SELECT 
@@ -373,23 +491,25 @@ class ShopifyAnalytics:
         
         df = self._execute_query(query)
         
-        # Create visualization
-        fig = px.line(
-            df,
-            x='month',
-            y='total_revenue',
-            color='year',
-            title="Seasonal Sales Trends",
-            labels={
-                'month': 'Month',
-                'total_revenue': 'Total Revenue ($)',
-                'year': 'Year'
-            }
-        )
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            fig = px.line(
+                df,
+                x='month',
+                y='total_revenue',
+                color='year',
+                title="Seasonal Sales Trends",
+                labels={
+                    'month': 'Month',
+                    'total_revenue': 'Total Revenue ($)',
+                    'year': 'Year'
+                }
+            )
+            return fig
         
-        return df, fig
+        return df, LazyFigure(build_figure)
 
-    def get_order_aging_analysis(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_order_aging_analysis(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Simple analysis of orders by their status"""
         query = """
         SELECT 
@@ -405,55 +525,53 @@ class ShopifyAnalytics:
         
         try:
             # Execute query and get results
-            result = self.client.execute_query(query)
-            
-            # Create DataFrame with explicit column names
-            df = pd.DataFrame(result, columns=[
-                'financial_status', 'fulfillment_status', 'order_count', 'avg_order_time'
-            ])
+            df = self._execute_query(query)
             
             # Debug logging to check column names
             logger.info(f"Order Status Analysis DataFrame columns: {df.columns.tolist()}")
             
-            # Create a simple visualization with proper subplot types for pie charts
-            fig = make_subplots(
-                rows=1, cols=2,
-                specs=[[{"type": "pie"}, {"type": "pie"}]],
-                subplot_titles=(
-                    "Orders by Financial Status",
-                    "Orders by Fulfillment Status"
-                )
-            )
-            
-            # Financial Status Pie Chart
             financial_status_counts = df.groupby('financial_status')['order_count'].sum()
-            fig.add_trace(
-                go.Pie(
-                    labels=financial_status_counts.index,
-                    values=financial_status_counts.values,
-                    name="Financial Status",
-                    textinfo='label+value+percent'
-                ),
-                row=1, col=1
-            )
-            
-            # Fulfillment Status Pie Chart
             fulfillment_status_counts = df.groupby('fulfillment_status')['order_count'].sum()
-            fig.add_trace(
-                go.Pie(
-                    labels=fulfillment_status_counts.index,
-                    values=fulfillment_status_counts.values,
-                    name="Fulfillment Status",
-                    textinfo='label+value+percent'
-                ),
-                row=1, col=2
-            )
             
-            fig.update_layout(
-                title_text="Order Status Distribution",
-                height=600,
-                showlegend=True
-            )
+            # Create visualization lazily, only when the figure is used
+            def build_figure() -> go.Figure:
+                fig = make_subplots(
+                    rows=1, cols=2,
+                    specs=[[{"type": "pie"}, {"type": "pie"}]],
+                    subplot_titles=(
+                        "Orders by Financial Status",
+                        "Orders by Fulfillment Status"
+                    )
+                )
+                
+                # Financial Status Pie Chart
+                fig.add_trace(
+                    go.Pie(
+                        labels=financial_status_counts.index,
+                        values=financial_status_counts.values,
+                        name="Financial Status",
+                        textinfo='label+value+percent'
+                    ),
+                    row=1, col=1
+                )
+                
+                # Fulfillment Status Pie Chart
+                fig.add_trace(
+                    go.Pie(
+                        labels=fulfillment_status_counts.index,
+                        values=fulfillment_status_counts.values,
+                        name="Fulfillment Status",
+                        textinfo='label+value+percent'
+                    ),
+                    row=1, col=2
+                )
+                
+                fig.update_layout(
+                    title_text="Order Status Distribution",
+                    height=600,
+                    showlegend=True
+                )
+                return fig
             
             # Log simple insights
             logger.info("\nOrder Status Analysis:")
@@ -467,14 +585,14 @@ class ShopifyAnalytics:
             for status, count in fulfillment_status_counts.items():
                 logger.info(f"- {status}: {count} orders")
             
-            return df, fig
+            return df, LazyFigure(build_figure)
             
         except Exception as e:
             logger.error(f"Error in order status analysis: {str(e)}")
             logger.error(f"DataFrame columns: {df.columns.tolist() if 'df' in locals() else 'No DataFrame'}")
             raise
 
-    def get_order_aging_trends(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_order_aging_trends(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze order aging trends over time"""
         query = """
         WITH daily_aging AS (
@@ -503,76 +621,72 @@ class ShopifyAnalytics:
         
         try:
             # Execute query and get results
-            result = self.client.execute_query(query)
-            
-            # Create DataFrame with explicit column names
-            df = pd.DataFrame(result, columns=[
-                'date', 'financial_status', 'fulfillment_status', 'order_count',
-                'processing_time_avg', 'fulfillment_time_avg', 'total_age_avg'
-            ])
+            df = self._execute_query(query)
             
             # Debug logging to check column names
             logger.info(f"Order Aging Trends DataFrame columns: {df.columns.tolist()}")
             
-            # Create visualization
-            fig = make_subplots(
-                rows=3, cols=1,
-                subplot_titles=(
-                    "Processing Time Trends",
-                    "Fulfillment Time Trends",
-                    "Total Order Age Trends"
+            # Create visualization lazily, only when the figure is used
+            def build_figure() -> go.Figure:
+                fig = make_subplots(
+                    rows=3, cols=1,
+                    subplot_titles=(
+                        "Processing Time Trends",
+                        "Fulfillment Time Trends",
+                        "Total Order Age Trends"
+                    )
                 )
-            )
-            
-            # Plot processing time trends
-            for status in df['financial_status'].unique():
-                status_data = df[df['financial_status'] == status]
-                fig.add_trace(
-                    go.Scatter(
-                        x=status_data['date'],
-                        y=status_data['processing_time_avg'],
-                        name=f"Processing - {status}",
-                        mode='lines+markers'
-                    ),
-                    row=1, col=1
+                
+                # Plot processing time trends
+                for status in df['financial_status'].unique():
+                    status_data = df[df['financial_status'] == status]
+                    fig.add_trace(
+                        time_series_trace(
+                            x=status_data['date'],
+                            y=status_data['processing_time_avg'],
+                            name=f"Processing - {status}",
+                            mode='lines+markers'
+                        ),
+                        row=1, col=1
+                    )
+                
+                # Plot fulfillment time trends
+                for status in df['fulfillment_status'].unique():
+                    status_data = df[df['fulfillment_status'] == status]
+                    fig.add_trace(
+                        time_series_trace(
+                            x=status_data['date'],
+                            y=status_data['fulfillment_time_avg'],
+                            name=f"Fulfillment - {status}",
+                            mode='lines+markers'
+                        ),
+                        row=2, col=1
+                    )
+                
+                # Plot total order age trends
+                for status in df['financial_status'].unique():
+                    status_data = df[df['financial_status'] == status]
+                    fig.add_trace(
+                        time_series_trace(
+                            x=status_data['date'],
+                            y=status_data['total_age_avg'],
+                            name=f"Total Age - {status}",
+                            mode='lines+markers'
+                        ),
+                        row=3, col=1
+                    )
+                
+                fig.update_layout(
+                    title_text="Order Aging Trends Over Time",
+                    height=1200,
+                    showlegend=True
                 )
-            
-            # Plot fulfillment time trends
-            for status in df['fulfillment_status'].unique():
-                status_data = df[df['fulfillment_status'] == status]
-                fig.add_trace(
-                    go.Scatter(
-                        x=status_data['date'],
-                        y=status_data['fulfillment_time_avg'],
-                        name=f"Fulfillment - {status}",
-                        mode='lines+markers'
-                    ),
-                    row=2, col=1
-                )
-            
-            # Plot total order age trends
-            for status in df['financial_status'].unique():
-                status_data = df[df['financial_status'] == status]
-                fig.add_trace(
-                    go.Scatter(
-                        x=status_data['date'],
-                        y=status_data['total_age_avg'],
-                        name=f"Total Age - {status}",
-                        mode='lines+markers'
-                    ),
-                    row=3, col=1
-                )
-            
-            fig.update_layout(
-                title_text="Order Aging Trends Over Time",
-                height=1200,
-                showlegend=True
-            )
-            
-            # Update y-axis labels
-            fig.update_yaxes(title_text="Hours", row=1, col=1)
-            fig.update_yaxes(title_text="Hours", row=2, col=1)
-            fig.update_yaxes(title_text="Hours", row=3, col=1)
+                
+                # Update y-axis labels
+                fig.update_yaxes(title_text="Hours", row=1, col=1)
+                fig.update_yaxes(title_text="Hours", row=2, col=1)
+                fig.update_yaxes(title_text="Hours", row=3, col=1)
+                return fig
             
             # Log summary statistics
             logger.info("Order Aging Trends Summary:")
@@ -582,16 +696,21 @@ class ShopifyAnalytics:
             logger.info(f"Average fulfillment time: {df['fulfillment_time_avg'].mean():.2f} hours")
             logger.info(f"Average total order age: {df['total_age_avg'].mean():.2f} hours")
             
-            return df, fig
+            return df, LazyFigure(build_figure)
             
         except Exception as e:
             logger.error(f"Error in order aging trends: {str(e)}")
             logger.error(f"DataFrame columns: {df.columns.tolist() if 'df' in locals() else 'No DataFrame'}")
             raise
 
-    def get_business_performance_metrics(self) -> Tuple[pd.DataFrame, go.Figure]:
-        """Analyze key business performance metrics and KPIs"""
-        query = """
+    def get_business_performance_metrics(self) -> Tuple[pd.DataFrame, LazyFigure]:
+        """
+        Analyze key business performance metrics and KPIs
+
+        In approximate mode the daily totals are scaled from a sample and each
+        estimated column gets a matching '<column>_error' 95% half-width column.
+        """
+        query = f"""
         WITH order_metrics AS (
             SELECT 
                 toDate(created_at) as date,
@@ -607,7 +726,7 @@ class ShopifyAnalytics:
                 fulfillment_status,
                 -- Customer metrics
                 customer_id
-            FROM orders
+            FROM orders {self.mode.sample_clause('orders')}
             WHERE created_at >= now() - INTERVAL 90 DAY
         )
         SELECT 
@@ -618,15 +737,19 @@ class ShopifyAnalytics:
             avg(order_value) as average_order_value,
             sum(discount_amount) / sum(order_value) * 100 as discount_rate,
             -- Conversion metrics
-            count(DISTINCT customer_id) as unique_customers,
+            {self.mode.distinct('customer_id')} as unique_customers,
             count() as total_orders,
-            count() / count(DISTINCT customer_id) as orders_per_customer,
+            count() / {self.mode.distinct('customer_id')} as orders_per_customer,
+            {self.mode.median_band('order_value')} as median_band,
             -- Fulfillment metrics
             avg(processing_time) as avg_processing_time,
             avg(fulfillment_time) as avg_fulfillment_time,
             -- Status distribution
             countIf(financial_status = 'paid') / count() * 100 as paid_order_rate,
-            countIf(fulfillment_status = 'fulfilled') / count() * 100 as fulfillment_rate
+            countIf(fulfillment_status = 'fulfilled') / count() * 100 as fulfillment_rate,
+            -- Inputs for sampling error bounds
+            sum(toFloat64(order_value) * toFloat64(order_value)) as daily_revenue_squares,
+            sum(toFloat64(discount_amount) * toFloat64(discount_amount)) as total_discounts_squares
         FROM order_metrics
         GROUP BY date
         ORDER BY date
@@ -634,160 +757,159 @@ class ShopifyAnalytics:
         
         try:
             # Execute query and get results
-            result = self.client.execute_query(query)
-            
-            # Create DataFrame with explicit column names
-            df = pd.DataFrame(result, columns=[
-                'date', 'daily_revenue', 'total_discounts', 'average_order_value',
-                'discount_rate', 'unique_customers', 'total_orders', 'orders_per_customer',
-                'avg_processing_time', 'avg_fulfillment_time', 'paid_order_rate',
-                'fulfillment_rate'
-            ])
+            df = self._execute_query(query)
+            customers = self.mode.unsampled_distinct('customer_id', 'orders', group_by='toDate(created_at)',
+                                                     where='created_at >= now() - INTERVAL 90 DAY')
+            if customers is not None:
+                df['unique_customers'] = df['date'].dt.date.map(customers).fillna(0)
+            df = self._apply_estimates(df)
             
             # Debug logging to check column names
             logger.info(f"Business Performance DataFrame columns: {df.columns.tolist()}")
             
-            # Create visualization
-            fig = make_subplots(
-                rows=3, cols=2,
-                subplot_titles=(
-                    "Daily Revenue & Discounts",
-                    "Average Order Value Trend",
-                    "Customer Metrics",
-                    "Fulfillment Performance",
-                    "Order Status Distribution",
-                    "Revenue Metrics"
+            # Create visualization lazily, only when the figure is used
+            def build_figure() -> go.Figure:
+                fig = make_subplots(
+                    rows=3, cols=2,
+                    subplot_titles=(
+                        "Daily Revenue & Discounts",
+                        "Average Order Value Trend",
+                        "Customer Metrics",
+                        "Fulfillment Performance",
+                        "Order Status Distribution",
+                        "Revenue Metrics"
+                    )
                 )
-            )
-            
-            # Revenue and Discounts
-            fig.add_trace(
-                go.Bar(
-                    x=df['date'],
-                    y=df['daily_revenue'],
-                    name="Daily Revenue",
-                    marker_color='rgb(55, 83, 109)'
-                ),
-                row=1, col=1
-            )
-            
-            fig.add_trace(
-                go.Bar(
-                    x=df['date'],
-                    y=df['total_discounts'],
-                    name="Discounts",
-                    marker_color='rgb(26, 118, 255)'
-                ),
-                row=1, col=1
-            )
-            
-            # Average Order Value
-            fig.add_trace(
-                go.Scatter(
-                    x=df['date'],
-                    y=df['average_order_value'],
-                    name="AOV",
-                    mode='lines+markers',
-                    line=dict(color='rgb(49, 130, 189)')
-                ),
-                row=1, col=2
-            )
-            
-            # Customer Metrics
-            fig.add_trace(
-                go.Scatter(
-                    x=df['date'],
-                    y=df['unique_customers'],
-                    name="Unique Customers",
-                    mode='lines+markers',
-                    line=dict(color='rgb(49, 130, 189)')
-                ),
-                row=2, col=1
-            )
-            
-            fig.add_trace(
-                go.Scatter(
-                    x=df['date'],
-                    y=df['orders_per_customer'],
-                    name="Orders per Customer",
-                    mode='lines+markers',
-                    line=dict(color='rgb(255, 65, 54)')
-                ),
-                row=2, col=1
-            )
-            
-            # Fulfillment Performance
-            fig.add_trace(
-                go.Scatter(
-                    x=df['date'],
-                    y=df['avg_processing_time'],
-                    name="Processing Time",
-                    mode='lines+markers',
-                    line=dict(color='rgb(49, 130, 189)')
-                ),
-                row=2, col=2
-            )
-            
-            fig.add_trace(
-                go.Scatter(
-                    x=df['date'],
-                    y=df['avg_fulfillment_time'],
-                    name="Fulfillment Time",
-                    mode='lines+markers',
-                    line=dict(color='rgb(255, 65, 54)')
-                ),
-                row=2, col=2
-            )
-            
-            # Status Distribution
-            fig.add_trace(
-                go.Scatter(
-                    x=df['date'],
-                    y=df['paid_order_rate'],
-                    name="Paid Order Rate",
-                    mode='lines+markers',
-                    line=dict(color='rgb(49, 130, 189)')
-                ),
-                row=3, col=1
-            )
-            
-            fig.add_trace(
-                go.Scatter(
-                    x=df['date'],
-                    y=df['fulfillment_rate'],
-                    name="Fulfillment Rate",
-                    mode='lines+markers',
-                    line=dict(color='rgb(255, 65, 54)')
-                ),
-                row=3, col=1
-            )
-            
-            # Revenue Metrics
-            fig.add_trace(
-                go.Scatter(
-                    x=df['date'],
-                    y=df['discount_rate'],
-                    name="Discount Rate",
-                    mode='lines+markers',
-                    line=dict(color='rgb(49, 130, 189)')
-                ),
-                row=3, col=2
-            )
-            
-            fig.update_layout(
-                title_text="Business Performance Dashboard",
-                height=1200,
-                showlegend=True,
-                barmode='group'
-            )
-            
-            # Update y-axis labels
-            fig.update_yaxes(title_text="Amount ($)", row=1, col=1)
-            fig.update_yaxes(title_text="Amount ($)", row=1, col=2)
-            fig.update_yaxes(title_text="Count", row=2, col=1)
-            fig.update_yaxes(title_text="Hours", row=2, col=2)
-            fig.update_yaxes(title_text="Percentage (%)", row=3, col=1)
-            fig.update_yaxes(title_text="Percentage (%)", row=3, col=2)
+                
+                # Revenue and Discounts
+                fig.add_trace(
+                    go.Bar(
+                        x=df['date'],
+                        y=df['daily_revenue'],
+                        name="Daily Revenue",
+                        marker_color='rgb(55, 83, 109)'
+                    ),
+                    row=1, col=1
+                )
+                
+                fig.add_trace(
+                    go.Bar(
+                        x=df['date'],
+                        y=df['total_discounts'],
+                        name="Discounts",
+                        marker_color='rgb(26, 118, 255)'
+                    ),
+                    row=1, col=1
+                )
+                
+                # Average Order Value
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['date'],
+                        y=df['average_order_value'],
+                        name="AOV",
+                        mode='lines+markers',
+                        line=dict(color='rgb(49, 130, 189)')
+                    ),
+                    row=1, col=2
+                )
+                
+                # Customer Metrics
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['date'],
+                        y=df['unique_customers'],
+                        name="Unique Customers",
+                        mode='lines+markers',
+                        line=dict(color='rgb(49, 130, 189)')
+                    ),
+                    row=2, col=1
+                )
+                
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['date'],
+                        y=df['orders_per_customer'],
+                        name="Orders per Customer",
+                        mode='lines+markers',
+                        line=dict(color='rgb(255, 65, 54)')
+                    ),
+                    row=2, col=1
+                )
+                
+                # Fulfillment Performance
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['date'],
+                        y=df['avg_processing_time'],
+                        name="Processing Time",
+                        mode='lines+markers',
+                        line=dict(color='rgb(49, 130, 189)')
+                    ),
+                    row=2, col=2
+                )
+                
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['date'],
+                        y=df['avg_fulfillment_time'],
+                        name="Fulfillment Time",
+                        mode='lines+markers',
+                        line=dict(color='rgb(255, 65, 54)')
+                    ),
+                    row=2, col=2
+                )
+                
+                # Status Distribution
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['date'],
+                        y=df['paid_order_rate'],
+                        name="Paid Order Rate",
+                        mode='lines+markers',
+                        line=dict(color='rgb(49, 130, 189)')
+                    ),
+                    row=3, col=1
+                )
+                
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['date'],
+                        y=df['fulfillment_rate'],
+                        name="Fulfillment Rate",
+                        mode='lines+markers',
+                        line=dict(color='rgb(255, 65, 54)')
+                    ),
+                    row=3, col=1
+                )
+                
+                # Revenue Metrics
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['date'],
+                        y=df['discount_rate'],
+                        name="Discount Rate",
+                        mode='lines+markers',
+                        line=dict(color='rgb(49, 130, 189)')
+                    ),
+                    row=3, col=2
+                )
+                
+                fig.update_layout(
+                    title_text="Business Performance Dashboard",
+                    height=1200,
+                    showlegend=True,
+                    barmode='group'
+                )
+                
+                # Update y-axis labels
+                fig.update_yaxes(title_text="Amount ($)", row=1, col=1)
+                fig.update_yaxes(title_text="Amount ($)", row=1, col=2)
+                fig.update_yaxes(title_text="Count", row=2, col=1)
+                fig.update_yaxes(title_text="Hours", row=2, col=2)
+                fig.update_yaxes(title_text="Percentage (%)", row=3, col=1)
+                fig.update_yaxes(title_text="Percentage (%)", row=3, col=2)
+                return fig
             
             # Log key insights
             logger.info("Business Performance Insights:")
@@ -797,140 +919,104 @@ class ShopifyAnalytics:
             logger.info(f"Average Paid Order Rate: {df['paid_order_rate'].mean():.2f}%")
             logger.info(f"Average Fulfillment Rate: {df['fulfillment_rate'].mean():.2f}%")
             
-            return df, fig
+            return df, LazyFigure(build_figure)
             
         except Exception as e:
             logger.error(f"Error in business performance metrics: {str(e)}")
             logger.error(f"DataFrame columns: {df.columns.tolist() if 'df' in locals() else 'No DataFrame'}")
             raise
 
-    def get_customer_retention_metrics(self) -> Tuple[pd.DataFrame, go.Figure]:
+    def get_customer_retention_metrics(self) -> Tuple[pd.DataFrame, LazyFigure]:
         """Analyze customer retention and loyalty metrics"""
-        query = """
-        WITH customer_orders AS (
-            SELECT 
-                customer_id,
-                toDate(created_at) as order_date,
-                total_price as order_value,
-                row_number() OVER (PARTITION BY customer_id ORDER BY created_at) as order_number
-            FROM orders
-            WHERE created_at >= now() - INTERVAL 365 DAY
-        ),
-        retention_metrics AS (
-            SELECT 
-                order_date,
-                count(DISTINCT customer_id) as total_customers,
-                count(DISTINCT CASE WHEN order_number = 1 THEN customer_id END) as new_customers,
-                count(DISTINCT CASE WHEN order_number > 1 THEN customer_id END) as returning_customers,
-                avg(CASE WHEN order_number > 1 THEN order_value END) as returning_customer_value
-            FROM customer_orders
-            GROUP BY order_date
-        )
-        SELECT 
-            order_date,
-            total_customers,
-            new_customers,
-            returning_customers,
-            returning_customer_value,
-            (returning_customers / total_customers) * 100 as retention_rate,
-            (new_customers / total_customers) * 100 as new_customer_rate
-        FROM retention_metrics
-        ORDER BY order_date
-        """
-        
         try:
-            # Execute query and get results
-            result = self.client.execute_query(query)
-            
-            # Create DataFrame with explicit column names
-            df = pd.DataFrame(result, columns=[
-                'order_date', 'total_customers', 'new_customers', 'returning_customers',
-                'returning_customer_value', 'retention_rate', 'new_customer_rate'
-            ])
+            # Single GROUP BY customer_id pass, no window functions or joins
+            df = self.cohorts.get_daily_retention(days=365)
             
             # Debug logging to check column names
             logger.info(f"Customer Retention DataFrame columns: {df.columns.tolist()}")
             
-            # Create visualization
-            fig = make_subplots(
-                rows=2, cols=2,
-                subplot_titles=(
-                    "Customer Acquisition vs Retention",
-                    "Customer Retention Rate",
-                    "Returning Customer Value",
-                    "Customer Growth"
+            # Create visualization lazily, only when the figure is used
+            def build_figure() -> go.Figure:
+                fig = make_subplots(
+                    rows=2, cols=2,
+                    subplot_titles=(
+                        "Customer Acquisition vs Retention",
+                        "Customer Retention Rate",
+                        "Returning Customer Value",
+                        "Customer Growth"
+                    )
                 )
-            )
-            
-            # Customer Acquisition vs Retention
-            fig.add_trace(
-                go.Bar(
-                    x=df['order_date'],
-                    y=df['new_customers'],
-                    name="New Customers",
-                    marker_color='rgb(55, 83, 109)'
-                ),
-                row=1, col=1
-            )
-            
-            fig.add_trace(
-                go.Bar(
-                    x=df['order_date'],
-                    y=df['returning_customers'],
-                    name="Returning Customers",
-                    marker_color='rgb(26, 118, 255)'
-                ),
-                row=1, col=1
-            )
-            
-            # Retention Rate
-            fig.add_trace(
-                go.Scatter(
-                    x=df['order_date'],
-                    y=df['retention_rate'],
-                    name="Retention Rate",
-                    mode='lines+markers',
-                    line=dict(color='rgb(49, 130, 189)')
-                ),
-                row=1, col=2
-            )
-            
-            # Returning Customer Value
-            fig.add_trace(
-                go.Scatter(
-                    x=df['order_date'],
-                    y=df['returning_customer_value'],
-                    name="Returning Customer Value",
-                    mode='lines+markers',
-                    line=dict(color='rgb(255, 65, 54)')
-                ),
-                row=2, col=1
-            )
-            
-            # Customer Growth
-            fig.add_trace(
-                go.Scatter(
-                    x=df['order_date'],
-                    y=df['total_customers'],
-                    name="Total Customers",
-                    mode='lines+markers',
-                    line=dict(color='rgb(49, 130, 189)')
-                ),
-                row=2, col=2
-            )
-            
-            fig.update_layout(
-                title_text="Customer Retention Analysis",
-                height=800,
-                showlegend=True,
-                barmode='group'
-            )
-            
-            # Update y-axis labels
-            fig.update_yaxes(title_text="Number of Customers", row=1, col=1)
-            fig.update_yaxes(title_text="Percentage (%)", row=1, col=2)
-            fig.update_yaxes(title_text="Average Order Value ($)", row=2, col=1)
-            fig.update_yaxes(title_text="Total Customers", row=2, col=2)
+                
+                # Customer Acquisition vs Retention
+                fig.add_trace(
+                    go.Bar(
+                        x=df['order_date'],
+                        y=df['new_customers'],
+                        name="New Customers",
+                        marker_color='rgb(55, 83, 109)'
+                    ),
+                    row=1, col=1
+                )
+                
+                fig.add_trace(
+                    go.Bar(
+                        x=df['order_date'],
+                        y=df['returning_customers'],
+                        name="Returning Customers",
+                        marker_color='rgb(26, 118, 255)'
+                    ),
+                    row=1, col=1
+                )
+                
+                # Retention Rate
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['order_date'],
+                        y=df['retention_rate'],
+                        name="Retention Rate",
+                        mode='lines+markers',
+                        line=dict(color='rgb(49, 130, 189)')
+                    ),
+                    row=1, col=2
+                )
+                
+                # Returning Customer Value
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['order_date'],
+                        y=df['returning_customer_value'],
+                        name="Returning Customer Value",
+                        mode='lines+markers',
+                        line=dict(color='rgb(255, 65, 54)')
+                    ),
+                    row=2, col=1
+                )
+                
+                # Customer Growth
+                fig.add_trace(
+                    time_series_trace(
+                        x=df['order_date'],
+                        y=df['total_customers'],
+                        name="Total Customers",
+                        mode='lines+markers',
+                        line=dict(color='rgb(49, 130, 189)')
+                    ),
+                    row=2, col=2
+                )
+                
+                fig.update_layout(
+                    title_text="Customer Retention Analysis",
+                    height=800,
+                    showlegend=True,
+                    barmode='group'
+                )
+                
+                # Update y-axis labels
+                fig.update_yaxes(title_text="Number of Customers", row=1, col=1)
+                fig.update_yaxes(title_text="Percentage (%)", row=1, col=2)
+                fig.update_yaxes(title_text="Average Order Value ($)", row=2, col=1)
+                fig.update_yaxes(title_text="Total Customers", row=2, col=2)
+                return fig
             
             # Log key insights
             logger.info("Customer Retention Insights:")
@@ -938,14 +1024,36 @@ class ShopifyAnalytics:
             logger.info(f"Average New Customer Rate: {df['new_customer_rate'].mean():.2f}%")
             logger.info(f"Average Returning Customer Value: ${df['returning_customer_value'].mean():.2f}")
             
-            return df, fig
+            return df, LazyFigure(build_figure)
             
         except Exception as e:
             logger.error(f"Error in customer retention metrics: {str(e)}")
             logger.error(f"DataFrame columns: {df.columns.tolist() if 'df' in locals() else 'No DataFrame'}")
             raise
 
-    def generate_analytics_report(self) -> Dict[str, Tuple[pd.DataFrame, go.Figure]]:
+    def get_cohort_analysis(self, max_months: int = 12) -> Tuple[pd.DataFrame, LazyFigure]:
+        """Analyze monthly cohort retention by months since first order"""
+        df = self.cohorts.get_cohort_matrix(max_months=max_months)
+        
+        # Create visualization lazily, only when the figure is used
+        def build_figure() -> go.Figure:
+            matrix = df.pivot(index='cohort_month', columns='months_since_first_order', values='retention_rate')
+            fig = px.imshow(
+                matrix,
+                labels={
+                    'x': 'Months Since First Order',
+                    'y': 'Cohort (First Order Month)',
+                    'color': 'Retention (%)'
+                },
+                color_continuous_scale='Blues',
+                aspect='auto',
+                title="Monthly Cohort Retention"
+            )
+            return fig
+        
+        return df, LazyFigure(build_figure)
+
+    def generate_analytics_report(self) -> Dict[str, Tuple[pd.DataFrame, LazyFigure]]:
         """Generate a comprehensive analytics report"""
         return {
             'sales_over_time': self.get_sales_over_time(),
@@ -962,5 +1070,6 @@ class ShopifyAnalytics:
             'order_aging_analysis': self.get_order_aging_analysis(),
             'order_aging_trends': self.get_order_aging_trends(),
             'business_performance': self.get_business_performance_metrics(),
-            'customer_retention': self.get_customer_retention_metrics()
+            'customer_retention': self.get_customer_retention_metrics(),
+            'cohort_analysis': self.get_cohort_analysis()
         }
\ No newline at end of file
@@ -1,10 +1,86 @@
 import os
-from typing import List, Dict, Any
+import re
+import uuid
+from itertools import islice
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Set, Tuple
+import numpy as np
 from clickhouse_driver import Client
 from dotenv import load_dotenv
+from src.models.records import Record
+from src.monitoring.metrics import get_registry
+from src.monitoring.profiling import profile_hook
 
 load_dotenv()
 
+INSERT_METRICS = get_registry().stage('insert_data')
+BULK_LOAD_METRICS = get_registry().stage('bulk_load')
+BULK_LOAD_PARTITIONS = get_registry().counter('bulk_load_partitions', 'Partitions attached or replaced by bulk loads')
+
+# Suffix of the staging table a bulk load into a table writes to
+STAGING_SUFFIX = '_staging'
+
+# NumPy dtypes for ClickHouse numeric types that map one-to-one
+_NUMERIC_DTYPES = {
+    'UInt8': np.uint8, 'UInt16': np.uint16, 'UInt32': np.uint32, 'UInt64': np.uint64,
+    'Int8': np.int8, 'Int16': np.int16, 'Int32': np.int32, 'Int64': np.int64,
+    'Float32': np.float32, 'Float64': np.float64, 'Bool': np.bool_
+}
+
+_DECIMAL_SCALE = re.compile(r'^Decimal(?:32|64|128|256)?\((?:\d+\s*,\s*)?(\d+)\)$')
+
+
+def unwrap_type(column_type: str) -> Tuple[str, bool]:
+    """Strip LowCardinality/Nullable wrappers, returning the inner type and nullability"""
+    nullable = False
+    while True:
+        if column_type.startswith('LowCardinality(') and column_type.endswith(')'):
+            column_type = column_type[len('LowCardinality('):-1]
+        elif column_type.startswith('Nullable(') and column_type.endswith(')'):
+            column_type = column_type[len('Nullable('):-1]
+            nullable = True
+        else:
+            return column_type, nullable
+
+
+def column_to_numpy(values: Sequence[Any], column_type: str, decimal_mode: str = 'float') -> np.ndarray:
+    """
+    Convert one column returned by the driver into a typed NumPy array
+    
+    Args:
+        values: Column values as returned by the driver in columnar mode
+        column_type: ClickHouse type name from the column metadata
+        decimal_mode: 'float' to return Decimal columns as float64, 'scaled' to
+            return them as int64 holding the value multiplied by 10**scale
+        
+    Returns:
+        NumPy array with a dtype matching the ClickHouse type
+    """
+    inner_type, nullable = unwrap_type(column_type)
+    count = len(values)
+
+    if inner_type in _NUMERIC_DTYPES:
+        if nullable:
+            return np.fromiter((np.nan if v is None else v for v in values), dtype=np.float64, count=count)
+        return np.fromiter(values, dtype=_NUMERIC_DTYPES[inner_type], count=count)
+
+    decimal_match = _DECIMAL_SCALE.match(inner_type)
+    if decimal_match:
+        if decimal_mode == 'scaled' and not nullable:
+            scale = int(decimal_match.group(1))
+            return np.fromiter((int(v.scaleb(scale)) for v in values), dtype=np.int64, count=count)
+        return np.fromiter((np.nan if v is None else float(v) for v in values), dtype=np.float64, count=count)
+
+    if inner_type == 'Date' or inner_type == 'Date32':
+        return np.array(values, dtype='datetime64[D]')
+
+    if inner_type.startswith('DateTime'):
+        # Strip any timezone so NumPy does not warn about aware datetimes
+        return np.array([None if v is None else v.replace(tzinfo=None) for v in values], dtype='datetime64[s]')
+
+    # fromiter keeps Array/Tuple values as single objects instead of adding a dimension
+    return np.fromiter(values, dtype=object, count=count)
+
+
 class ClickHouseClient:
     def __init__(self):
         self.client = Client(
@@ -14,11 +90,29 @@ class ClickHouseClient:
             password=os.getenv('CLICKHOUSE_PASSWORD', ''),
             database=os.getenv('CLICKHOUSE_DATABASE', 'default')
         )
+        self.reset_query_stats()
         self._create_tables()
 
+    def reset_query_stats(self) -> None:
+        """Reset the cumulative statistics of executed queries"""
+        self.query_stats = {'queries': 0, 'read_rows': 0, 'read_bytes': 0, 'result_rows': 0, 'elapsed': 0.0}
+
+    def _record_query_stats(self) -> None:
+        """Add the server-reported progress and profile info of the last query to the cumulative statistics"""
+        last_query = getattr(self.client, 'last_query', None)
+        if last_query is None:
+            return
+        self.query_stats['queries'] += 1
+        self.query_stats['read_rows'] += last_query.progress.rows
+        self.query_stats['read_bytes'] += last_query.progress.bytes
+        self.query_stats['result_rows'] += last_query.profile_info.rows
+        self.query_stats['elapsed'] += last_query.elapsed
+
     def _create_tables(self):
         """Create necessary tables if they don't exist"""
-        # Orders table
+        # Orders table. ReplacingMergeTree replaces rows with equal sorting keys, and
+        # the sampling hash derives from id alone, so orders are still replaced by id.
+        # The sorting key leads with the hash, so id lookups use the bloom filter.
         self.client.execute('''
             CREATE TABLE IF NOT EXISTS orders (
                 id UInt64,
@@ -46,13 +140,16 @@ class ClickHouseClient:
                 shipping_address_province String,
                 shipping_address_country String,
                 note String,
-                tags String
+                tags String,
+                INDEX id_bloom id TYPE bloom_filter GRANULARITY 4
             ) ENGINE = ReplacingMergeTree()
-            ORDER BY (id, created_at)
-            PRIMARY KEY id
+            PARTITION BY toYYYYMM(created_at)
+            ORDER BY (intHash32(id), id, created_at)
+            SAMPLE BY intHash32(id)
         ''')
 
-        # Order items table
+        # Order items table, partitioned by the month of their order like orders,
+        # so bulk loads swap the items of a month together with its orders
         self.client.execute('''
             CREATE TABLE IF NOT EXISTS order_items (
                 id UInt64,
@@ -64,19 +161,24 @@ class ClickHouseClient:
                 title String,
                 variant_id UInt64,
                 product_id UInt64,
-                total_discount Decimal(10,2)
+                total_discount Decimal(10,2),
+                order_created_at DateTime
             ) ENGINE = ReplacingMergeTree()
+            PARTITION BY toYYYYMM(order_created_at)
             ORDER BY (id, order_id)
             PRIMARY KEY (id, order_id)
         ''')
+        # Tables created before order_created_at was added keep no partition key
+        self.client.execute('ALTER TABLE order_items ADD COLUMN IF NOT EXISTS order_created_at DateTime')
 
+    @profile_hook('insert_data')
     def insert_data(self, table_name: str, data: List[Dict[str, Any]], batch_size: int = 1000) -> None:
         """
         Generic method to insert data into any table with duplicate handling
         
         Args:
             table_name: Name of the table to insert into
-            data: List of dictionaries containing the data to insert
+            data: List of dictionaries or records containing the data to insert
             batch_size: Number of records to insert in each batch
         """
         if not data:
@@ -91,10 +193,15 @@ class ClickHouseClient:
         # Process data in batches
         for i in range(0, len(data), batch_size):
             batch = data[i:i + batch_size]
-            values = [[record[col] for col in columns] for record in batch]
+            if isinstance(batch[0], Record):
+                # Records already hold their values in column order
+                values = [record.values() for record in batch]
+            else:
+                values = [[record[col] for col in columns] for record in batch]
             
             try:
-                self.client.execute(query, values)
+                with INSERT_METRICS.measure(rows_in=len(values)) as measurement:
+                    measurement.rows_out = self.client.execute(query, values)
             except Exception as e:
                 print(f"Error inserting batch {i//batch_size + 1}: {str(e)}")
                 raise
@@ -110,6 +217,159 @@ class ClickHouseClient:
             print(f"Error during merge operation: {str(e)}")
             # Don't raise the error as merge is not critical
 
+    def _partition_ids(self, table_name: str) -> List[str]:
+        """IDs of the partitions of a table that hold active parts"""
+        rows = self.client.execute(
+            'SELECT DISTINCT partition_id FROM system.parts '
+            'WHERE database = currentDatabase() AND table = %(table)s AND active ORDER BY partition_id',
+            {'table': table_name}
+        )
+        return [partition_id for partition_id, in rows]
+
+    def _is_partitioned(self, table_name: str) -> bool:
+        rows = self.client.execute(
+            'SELECT partition_key FROM system.tables WHERE database = currentDatabase() AND name = %(table)s',
+            {'table': table_name}
+        )
+        return bool(rows and rows[0][0])
+
+    def _stage(self, table_name: str, data: List[Dict[str, Any]], batch_size: int) -> str:
+        """
+        Insert rows into a new, uniquely named empty copy of a table
+        
+        The copy is deduplicated and sorted by OPTIMIZE FINAL, which merges
+        the staging table only, as nothing else reads it.
+        
+        Returns:
+            Name of the staging table; the caller drops it
+        """
+        staging_table = f'{table_name}{STAGING_SUFFIX}_{uuid.uuid4().hex}'
+        self.client.execute(f'CREATE TABLE {staging_table} AS {table_name}')
+        try:
+            self.insert_data(staging_table, data, batch_size)
+        except Exception:
+            self._drop_staging(staging_table)
+            raise
+        return staging_table
+
+    def _drop_staging(self, staging_table: str) -> None:
+        self.client.execute(f'DROP TABLE IF EXISTS {staging_table}')
+
+    def _move_partition(self, table_name: str, staging_table: str, operation: str, partition_id: str) -> None:
+        """ATTACH or REPLACE one partition of a staging table into a table, in one atomic step"""
+        self.client.execute(
+            f"ALTER TABLE {table_name} {operation} PARTITION ID '{partition_id}' FROM {staging_table}"
+        )
+
+    def _move_partitions(self, table_name: str, staging_table: str, operation: str) -> List[str]:
+        """ATTACH or REPLACE each partition of a staging table into a table"""
+        partition_ids = self._partition_ids(staging_table)
+        for partition_id in partition_ids:
+            self._move_partition(table_name, staging_table, operation, partition_id)
+        BULK_LOAD_PARTITIONS.inc(len(partition_ids))
+        return partition_ids
+
+    def bulk_insert(self, table_name: str, data: List[Dict[str, Any]], batch_size: int = 100000) -> List[str]:
+        """
+        Load a large batch through a staging table, attaching its partitions to the table at once
+        
+        Rows are inserted into an empty copy of the table, deduplicated and
+        sorted there, and the resulting partitions are then attached to the
+        table, each in a single atomic step. Live inserts and queries on the
+        table never see a partial load, and the table itself is not merged.
+        Rows already in the table are not replaced until a background merge,
+        so callers should leave them out.
+        
+        Args:
+            table_name: Name of the table to load into
+            data: List of dictionaries or records containing the data to insert
+            batch_size: Number of records to insert into the staging table in each batch
+            
+        Returns:
+            IDs of the partitions attached
+        """
+        if not data:
+            return []
+
+        with BULK_LOAD_METRICS.measure(rows_in=len(data)) as measurement:
+            staging_table = self._stage(table_name, data, batch_size)
+            try:
+                partition_ids = self._move_partitions(table_name, staging_table, 'ATTACH')
+            finally:
+                self._drop_staging(staging_table)
+            measurement.rows_out = len(data)
+        return partition_ids
+
+    def bulk_insert_orders(self, orders: List[Dict[str, Any]], batch_size: int = 100000) -> List[str]:
+        """Bulk load orders through a staging table, see bulk_insert"""
+        return self.bulk_insert('orders', orders, batch_size)
+
+    def bulk_insert_order_items(self, line_items: List[Dict[str, Any]], batch_size: int = 100000) -> List[str]:
+        """Bulk load line items through a staging table, see bulk_insert"""
+        return self.bulk_insert('order_items', line_items, batch_size)
+
+    def bulk_replace_orders(self, orders: List[Dict[str, Any]], line_items: List[Dict[str, Any]],
+                            batch_size: int = 100000) -> List[int]:
+        """
+        Replace the monthly order partitions a backfill covers, and the items of those months
+        
+        Orders and items are staged, and each month's order partition and
+        then its item partition replace those of the live tables, each in one
+        atomic step. Orders of those months missing from the backfill are
+        dropped with their items. A failed load leaves every month either
+        untouched or holding the backfilled orders, whose items are swapped
+        next, and never deletes live rows outside a swap.
+        
+        Args:
+            orders: Order rows, covering whole months
+            line_items: Item rows of those orders
+            batch_size: Number of records to insert into the staging tables in each batch
+            
+        Returns:
+            IDs of the live orders dropped because the backfill did not contain them
+        """
+        if not orders:
+            return []
+        for table_name in ('orders', 'order_items'):
+            if not self._is_partitioned(table_name):
+                raise ValueError(f"Cannot replace partitions of {table_name}, which has no partition key")
+
+        with BULK_LOAD_METRICS.measure(rows_in=len(orders) + len(line_items)) as measurement:
+            orders_staging = self._stage('orders', orders, batch_size)
+            try:
+                items_staging = self._stage('order_items', line_items, batch_size)
+            except Exception:
+                self._drop_staging(orders_staging)
+                raise
+            try:
+                partition_ids = self._partition_ids(orders_staging)
+                dropped = [order_id for order_id, in self.client.execute(
+                    f'SELECT DISTINCT id FROM orders WHERE _partition_id IN %(partitions)s '
+                    f'AND id NOT IN (SELECT id FROM {orders_staging})',
+                    {'partitions': tuple(partition_ids)}
+                )]
+                # A month without staged items still replaces its live items, with none
+                for partition_id in partition_ids:
+                    self._move_partition('orders', orders_staging, 'REPLACE', partition_id)
+                    self._move_partition('order_items', items_staging, 'REPLACE', partition_id)
+                BULK_LOAD_PARTITIONS.inc(2 * len(partition_ids))
+            finally:
+                self._drop_staging(orders_staging)
+                self._drop_staging(items_staging)
+            measurement.rows_out = len(orders) + len(line_items)
+        return dropped
+
+    def loaded_order_ids(self, order_ids: Sequence[int], chunk_size: int = 100000) -> Set[int]:
+        """IDs among order_ids already in the orders table, looked up in chunks through the id bloom filter"""
+        loaded: Set[int] = set()
+        for i in range(0, len(order_ids), chunk_size):
+            rows = self.client.execute(
+                'SELECT DISTINCT id FROM orders WHERE id IN %(ids)s',
+                {'ids': tuple(order_ids[i:i + chunk_size])}
+            )
+            loaded.update(order_id for order_id, in rows)
+        return loaded
+
     def insert_orders(self, orders: List[Dict[str, Any]], batch_size: int = 1000) -> None:
         """Insert orders into the database with duplicate handling"""
         self.insert_data('orders', orders, batch_size)
@@ -118,6 +378,98 @@ class ClickHouseClient:
         """Insert line items into the database with duplicate handling"""
         self.insert_data('order_items', line_items, batch_size)
 
-    def execute_query(self, query: str) -> Any:
+    def execute_query(self, query: str, settings: Optional[Dict[str, Any]] = None) -> Any:
         """Execute a custom query"""
-        return self.client.execute(query) 
\ No newline at end of file
+        result = self.client.execute(query, settings=settings)
+        self._record_query_stats()
+        return result
+
+    def execute_columnar(self, query: str, decimal_mode: str = 'float',
+                         settings: Optional[Dict[str, Any]] = None) -> Dict[str, np.ndarray]:
+        """
+        Execute a query and return its result as typed NumPy columns
+        
+        Column names and types come from the driver's column metadata, so the
+        query text is never parsed.
+        
+        Args:
+            query: SQL query to execute
+            decimal_mode: How to convert Decimal columns, 'float' or 'scaled'
+            settings: Optional ClickHouse settings for this query
+            
+        Returns:
+            Dictionary mapping column names to NumPy arrays, in query order
+        """
+        columns, column_types = self.client.execute(
+            query, with_column_types=True, columnar=True, settings=settings
+        )
+        self._record_query_stats()
+        if not columns:
+            columns = [()] * len(column_types)
+
+        return {
+            name: column_to_numpy(values, column_type, decimal_mode)
+            for (name, column_type), values in zip(column_types, columns)
+        }
+
+    def execute_iter(self, query: str, chunk_size: int = 100000,
+                     settings: Optional[Dict[str, Any]] = None) -> Tuple[List[Tuple[str, str]], Iterator[List[tuple]]]:
+        """
+        Execute a query and stream its rows in chunks
+        
+        Rows are read from the server as they arrive, so at most one chunk
+        is held in memory at a time.
+        
+        Args:
+            query: SQL query to execute
+            chunk_size: Number of rows per yielded chunk
+            settings: Optional ClickHouse settings for this query
+            
+        Returns:
+            Tuple of (column names and types, iterator over lists of row tuples)
+        """
+        rows = self.client.execute_iter(
+            query, with_column_types=True,
+            settings=dict(settings or {}, max_block_size=chunk_size)
+        )
+        # The driver yields the column metadata ahead of the first row
+        column_types = next(rows, [])
+
+        def chunks() -> Iterator[List[tuple]]:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                yield chunk
+            self._record_query_stats()
+
+        return column_types, chunks()
+
+    def stream_columnar(self, query: str, block_size: int = 100000, decimal_mode: str = 'float',
+                        settings: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Execute a query and stream its result as blocks of typed NumPy columns
+        
+        Only one block of driver rows is alive at a time, so callers that reduce
+        or write each block keep memory bounded by block_size.
+        
+        Args:
+            query: SQL query to execute
+            block_size: Number of rows per block
+            decimal_mode: How to convert Decimal columns, 'float' or 'scaled'
+            settings: Optional ClickHouse settings for this query
+            
+        Yields:
+            Dictionaries mapping column names to NumPy arrays, in query order
+        """
+        column_types, chunks = self.execute_iter(query, chunk_size=block_size, settings=settings)
+        empty = True
+        for chunk in chunks:
+            empty = False
+            columns = list(zip(*chunk))
+            yield {
+                name: column_to_numpy(values, column_type, decimal_mode)
+                for (name, column_type), values in zip(column_types, columns)
+            }
+        if empty:
+            yield {name: column_to_numpy((), column_type, decimal_mode) for name, column_type in column_types}
@@ -0,0 +1,148 @@
+import calendar
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+import logging
+
+from ..database.clickhouse_client import ClickHouseClient
+from ..models.records import OrderItemRow, OrderRow
+from ..monitoring.metrics import get_registry
+
+logger = logging.getLogger(__name__)
+
+_registry = get_registry()
+DEDUP_SKIPPED = _registry.counter('dedup_skipped_orders', 'Orders skipped because the same or a newer version was loaded')
+DEDUP_SKIPPED_ITEMS = _registry.counter('dedup_skipped_order_items', 'Order items skipped with their orders')
+
+
+def _epoch_seconds(value: datetime) -> int:
+    """Whole seconds since the epoch, the precision of a ClickHouse DateTime; naive values are taken as UTC"""
+    if value.tzinfo is None:
+        return calendar.timegm(value.timetuple())
+    return int(value.timestamp())
+
+
+class OrderDedupIndex:
+    """
+    Index of the loaded version of every order.
+
+    Maps each order ID to the updated_at of the version last loaded, so
+    rows whose order was already loaded with the same or a later updated_at
+    can be dropped before they are sent. ReplacingMergeTree keeps the last
+    inserted row, so skipping stale versions also stops a re-delivered old
+    export from replacing newer data.
+
+    The index is an exact in-memory hash map, about 100 bytes per order,
+    and is rebuilt from the orders table on startup.
+    """
+
+    def __init__(self):
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        _registry.gauge('dedup_index_orders', self.__len__, 'Orders in the deduplication index')
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._versions
+
+    @classmethod
+    def from_table(cls, db_client: ClickHouseClient, table: str = 'orders', chunk_size: int = 100000) -> 'OrderDedupIndex':
+        """
+        Build the index from the latest version of each order in a table
+
+        Rows are streamed, so only one chunk is held besides the index.
+
+        Args:
+            db_client: ClickHouse client
+            table: Orders table
+            chunk_size: Rows per streamed chunk
+        """
+        index = cls()
+        _, chunks = db_client.execute_iter(
+            f'SELECT id, toUnixTimestamp(max(updated_at)) FROM {table} GROUP BY id', chunk_size=chunk_size
+        )
+        for chunk in chunks:
+            index._versions.update(chunk)
+        logger.info(f"Rebuilt order deduplication index with {len(index)} orders from {table}")
+        return index
+
+    def filter(self, orders: Iterable[OrderRow], order_items: Iterable[OrderItemRow]) -> Tuple[List[OrderRow], List[OrderItemRow]]:
+        """
+        Drop orders whose loaded version is as recent, and their items
+
+        Within a batch, only the newest version of each order and the last
+        copy of each item are kept.
+
+        Args:
+            orders: Transformed order rows
+            order_items: Transformed order item rows
+
+        Returns:
+            Tuple of (new or changed orders, their items)
+        """
+        with self._lock:
+            return _newest_versions(orders, order_items, self._versions)
+
+    def add(self, orders: Iterable[OrderRow]) -> None:
+        """Record orders as loaded"""
+        with self._lock:
+            versions = self._versions
+            for order in orders:
+                version = _epoch_seconds(order.updated_at)
+                if versions.get(order.id, -1) < version:
+                    versions[order.id] = version
+
+    def replace(self, orders: Iterable[OrderRow], dropped_ids: Iterable[int] = ()) -> None:
+        """
+        Record orders as loaded in place of whatever version was loaded, and forget dropped orders
+
+        For partition replacing backfills, after which the table holds exactly
+        the backfilled versions, older or not.
+        """
+        with self._lock:
+            versions = self._versions
+            for order_id in dropped_ids:
+                versions.pop(order_id, None)
+            for order in orders:
+                versions[order.id] = _epoch_seconds(order.updated_at)
+
+
+def dedupe_batch(orders: Iterable[OrderRow], order_items: Iterable[OrderItemRow]) -> Tuple[List[OrderRow], List[OrderItemRow]]:
+    """Keep the newest version of each order in a batch, the items of those versions, and one copy of each item"""
+    return _newest_versions(orders, order_items, {})
+
+
+def _newest_versions(orders: Iterable[OrderRow], order_items: Iterable[OrderItemRow],
+                     versions: Dict[int, int]) -> Tuple[List[OrderRow], List[OrderItemRow]]:
+    """Drop orders not newer than their entry in versions or another copy in the batch, and their items"""
+    newest: Dict[int, Tuple[int, OrderRow]] = {}
+    skipped = 0
+    for order in orders:
+        version = _epoch_seconds(order.updated_at)
+        if versions.get(order.id, -1) >= version:
+            skipped += 1
+            continue
+        kept = newest.get(order.id)
+        if kept is not None:
+            skipped += 1
+            if kept[0] >= version:
+                continue
+        newest[order.id] = (version, order)
+
+    fresh_orders = [order for _, order in newest.values()]
+    # Items repeated with a repeated order replace each other, as they would in the table
+    fresh_items: Dict[Tuple[int, int], OrderItemRow] = {}
+    total_items = 0
+    for item in order_items:
+        total_items += 1
+        if item.order_id in newest:
+            fresh_items[item.id, item.order_id] = item
+    skipped_items = total_items - len(fresh_items)
+
+    if skipped:
+        DEDUP_SKIPPED.inc(skipped)
+        DEDUP_SKIPPED_ITEMS.inc(skipped_items)
+        logger.info(f"Skipped {skipped} already loaded or repeated orders and {skipped_items} of their items")
+    return fresh_orders, list(fresh_items.values())
@@ -1,12 +1,35 @@
 import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Optional, Set, Tuple
 from datetime import datetime
 import logging
 from ..models.order import Address, Customer, Order, LineItem
+from ..models.records import OrderRecord
+from ..monitoring.metrics import get_registry
+from ..monitoring.profiling import profile_hook
+from .watermarks import as_utc
+from ..utils.order_files import (
+    ORDER_FILE_PATTERNS, byte_ranges, detect_codec, is_ndjson, iter_ndjson, iter_orders, load_document
+)
 
 logger = logging.getLogger(__name__)
 
+EXTRACT_METRICS = get_registry().stage('extract_file')
+UNCHANGED_ORDERS = get_registry().counter('extract_unchanged_orders', 'Orders skipped as last updated before the high-water mark')
+
+# NDJSON files smaller than this are parsed in-process even when workers are available
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+
+
+def _extract_ndjson_range(file_path: str, start: int, end: int,
+                          updated_after: Optional[datetime] = None) -> List[OrderRecord]:
+    """Extract the orders of one byte range of an NDJSON file in a worker process"""
+    extractor = ShopifyDataExtractor(str(Path(file_path).parent))
+    return extractor._extract_order_dicts(extractor.read_ndjson(Path(file_path), start, end), file_path, updated_after)
+
+
 class ShopifyDataExtractor:
     """Extracts data from Shopify JSON files in a directory"""
     
@@ -22,19 +45,27 @@ class ShopifyDataExtractor:
             raise ValueError(f"Directory {data_directory} does not exist")
         if not self.data_directory.is_dir():
             raise ValueError(f"{data_directory} is not a directory")
+        # (path, size, mtime) of files already extracted, shared by the startup run and file events
+        self._extracted_files: Set[Tuple[str, int, int]] = set()
+        self._extracted_lock = threading.Lock()
 
-    def _get_json_files(self, file_pattern: str = "*.json") -> List[Path]:
+    def _get_json_files(self, file_pattern: Optional[str] = None) -> List[Path]:
         """
-        Get all JSON files in the data directory
+        Get all order files in the data directory
         
+        Args:
+            file_pattern: Glob pattern, .json and .ndjson files, plain or compressed, if None
+            
         Returns:
-            List of Path objects for JSON files
+            List of Path objects for order files
         """
-        return list(self.data_directory.glob(file_pattern))
+        patterns = ORDER_FILE_PATTERNS if file_pattern is None else (file_pattern,)
+        return [path for pattern in patterns for path in self.data_directory.glob(pattern)]
 
     def _read_json_file(self, file_path: Path) -> Dict[str, Any]:
         """
-        Read and parse a JSON file
+        Read and parse a JSON file with the fastest installed JSON backend,
+        memory-mapped or decompressing gzip or zstd on the fly
         
         Args:
             file_path: Path to the JSON file
@@ -43,8 +74,7 @@ class ShopifyDataExtractor:
             Parsed JSON data
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return load_document(file_path)
         except json.JSONDecodeError as e:
             logger.error(f"Error parsing JSON file {file_path}: {str(e)}")
             raise
@@ -52,6 +82,22 @@ class ShopifyDataExtractor:
             logger.error(f"Error reading file {file_path}: {str(e)}")
             raise
 
+    def read_ndjson(self, file_path: Path, start: int = 0, end: Optional[int] = None) -> Iterable[Dict[str, Any]]:
+        """
+        Read the orders of an NDJSON file, one per line
+        
+        Invalid lines are logged and skipped, like invalid orders.
+        
+        Args:
+            file_path: Path to the NDJSON file
+            start: First byte of the range to read
+            end: End of the range (exclusive), the end of the file if None
+            
+        Returns:
+            Iterator over raw order data
+        """
+        return iter_ndjson(file_path, start, end, skip_invalid=True)
+
     def _parse_datetime(self, dt_str: str) -> datetime:
         """
         Parse datetime string from Shopify format
@@ -68,6 +114,7 @@ class ShopifyDataExtractor:
             logger.error(f"Error parsing datetime {dt_str}: {str(e)}")
             raise
 
+    @profile_hook('extract_order')
     def extract_order(self, order_data: Dict[str, Any]) -> Order:
         """
         Extract and validate a single order
@@ -107,37 +154,155 @@ class ShopifyDataExtractor:
             logger.error(f"Error extracting order {order_data.get('id')}: {str(e)}")
             raise
 
-    def extract_orders(self, file_pattern: str = "*.json") -> List[Order]:
+    def extract_record(self, order_data: Dict[str, Any]) -> OrderRecord:
+        """
+        Validate a single order and convert it to a compact record
+        
+        The pydantic model only lives for the duration of the call; records
+        are what the transformer and loader hold in flight.
+        
+        Args:
+            order_data: Raw order data from JSON
+            
+        Returns:
+            Validated order record
+        """
+        return OrderRecord.from_model(self.extract_order(order_data))
+
+    def _is_unchanged(self, order_data: Dict[str, Any], updated_after: datetime) -> bool:
+        """Whether a raw order was last updated before updated_after, judged before validation"""
+        updated_at = order_data.get('updated_at')
+        if not isinstance(updated_at, str):
+            return False
+        try:
+            # Orders at the mark itself may not have been loaded yet; re-delivered ones are dropped by the dedup index
+            return as_utc(datetime.fromisoformat(updated_at.replace('Z', '+00:00'))) < updated_after
+        except ValueError:
+            # Leave malformed values to validation
+            return False
+
+    def _extract_order_dicts(self, orders: Iterable[Dict[str, Any]], file_path: Any,
+                             updated_after: Optional[datetime] = None) -> List[OrderRecord]:
+        """Extract order records, logging and skipping the orders that fail validation"""
+        extracted = []
+        unchanged = 0
+        if updated_after is not None:
+            updated_after = as_utc(updated_after)
+        for order_data in orders:
+            if updated_after is not None and self._is_unchanged(order_data, updated_after):
+                unchanged += 1
+                continue
+            try:
+                extracted.append(self.extract_record(order_data))
+            except Exception as e:
+                logger.error(f"Error processing order in {file_path}: {str(e)}")
+        if unchanged:
+            UNCHANGED_ORDERS.inc(unchanged)
+            logger.info(f"Skipped {unchanged} orders in {file_path} last updated before {updated_after}")
+        return extracted
+
+    def extract_ndjson_file(self, file_path: Path, workers: int = 1,
+                            updated_after: Optional[datetime] = None) -> List[OrderRecord]:
+        """
+        Extract orders from an NDJSON file
+        
+        With more than one worker, uncompressed files of at least
+        PARALLEL_MIN_BYTES are split into byte ranges parsed in separate
+        processes; the orders come back in file order either way.
+        
+        Args:
+            file_path: Path to the NDJSON file
+            workers: Number of worker processes
+            updated_after: Skip orders last updated before this time, before validating them
+            
+        Returns:
+            List of extracted and validated order records
+        """
+        if workers <= 1 or file_path.stat().st_size < PARALLEL_MIN_BYTES or detect_codec(file_path):
+            return self._extract_order_dicts(self.read_ndjson(file_path), file_path, updated_after)
+
+        ranges = byte_ranges(file_path, workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_extract_ndjson_range, str(file_path), start, end, updated_after)
+                       for start, end in ranges]
+            return [order for future in futures for order in future.result()]
+
+    def _claim_file(self, file_path: Path) -> Optional[Tuple[str, int, int]]:
+        """Mark a file version as extracted, None if it already was"""
+        stat = file_path.stat()
+        key = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+        with self._extracted_lock:
+            if key in self._extracted_files:
+                return None
+            self._extracted_files.add(key)
+        return key
+
+    def extract_file(self, file_path: Path, workers: int = 1, updated_after: Optional[datetime] = None,
+                     skip_extracted: bool = True) -> List[OrderRecord]:
+        """
+        Parse and extract the orders of one order file in a single streaming pass
+        
+        Each version of a file, by path, size and modification time, is
+        extracted once per extractor, so a file seen by both the startup run
+        and the file watcher is not parsed twice.
+        
+        Args:
+            file_path: Path to the order file
+            workers: Processes to parse large NDJSON files with
+            updated_after: Skip orders last updated before this time, before validating them
+            skip_extracted: Return nothing for a file version already extracted; turn off for backfills
+            
+        Returns:
+            List of extracted and validated order records, empty if the file was already extracted
+        """
+        file_path = Path(file_path)
+        key = self._claim_file(file_path)
+        if key is None and skip_extracted:
+            logger.info(f"Skipping already extracted file: {file_path}")
+            return []
+
+        try:
+            logger.info(f"Processing file: {file_path}")
+            with EXTRACT_METRICS.measure(nbytes=file_path.stat().st_size) as measurement:
+                if is_ndjson(file_path):
+                    orders = self.extract_ndjson_file(file_path, workers, updated_after)
+                else:
+                    # Parse documents order by order straight from the mapped or decompressing file
+                    orders = self._extract_order_dicts(iter_orders(file_path), file_path, updated_after)
+                if not orders and updated_after is None:
+                    logger.warning(f"No orders found in {file_path}")
+                measurement.rows_in = measurement.rows_out = len(orders)
+            return orders
+        except Exception:
+            # Let a later event or run retry the file
+            if key is not None:
+                with self._extracted_lock:
+                    self._extracted_files.discard(key)
+            raise
+
+    def extract_orders(self, file_pattern: Optional[str] = None, workers: int = 1) -> List[OrderRecord]:
         """
-        Extract orders from all JSON files in the data directory
+        Extract orders from all order files in the data directory
+        
+        Files this extractor has already extracted, unchanged, are skipped.
         
+        Args:
+            file_pattern: Glob pattern, .json and .ndjson files, plain or compressed, if None
+            workers: Processes to parse large NDJSON files with
+            
         Returns:
-            List of extracted and validated Order objects
+            List of extracted and validated order records
         """
         try:
             json_files = self._get_json_files(file_pattern)
             if not json_files:
-                logger.warning(f"No JSON files found in {self.data_directory}")
+                logger.warning(f"No order files found in {self.data_directory}")
                 return []
 
             all_orders = []
             for file_path in json_files:
                 try:
-                    logger.info(f"Processing file: {file_path}")
-                    data = self._read_json_file(file_path)
-                    
-                    if 'orders' not in data:
-                        logger.warning(f"No 'orders' key found in {file_path}")
-                        continue
-
-                    for order_data in data['orders']:
-                        try:
-                            order = self.extract_order(order_data)
-                            all_orders.append(order)
-                        except Exception as e:
-                            logger.error(f"Error processing order in {file_path}: {str(e)}")
-                            continue
-
+                    all_orders.extend(self.extract_file(file_path, workers))
                 except Exception as e:
                     logger.error(f"Error processing file {file_path}: {str(e)}")
                     continue
@@ -1,27 +1,31 @@
-from typing import List, Dict, Any
+from typing import List, Optional
 import logging
 from ..database.clickhouse_client import ClickHouseClient
+from ..models.records import OrderItemRow, OrderRow
+from .dedup import OrderDedupIndex, dedupe_batch
 
 logger = logging.getLogger(__name__)
 
 class ShopifyDataLoader:
     """Loads transformed Shopify data into ClickHouse"""
 
-    def __init__(self, db_client: ClickHouseClient):
+    def __init__(self, db_client: ClickHouseClient, dedup_index: Optional[OrderDedupIndex] = None):
         """
         Initialize the loader
         
         Args:
             db_client: ClickHouse client instance
+            dedup_index: Skip orders already loaded with the same updated_at, see OrderDedupIndex
         """
         self.db_client = db_client
+        self.dedup_index = dedup_index
 
-    def load_orders(self, orders: List[Dict[str, Any]], batch_size: int = 1000) -> None:
+    def load_orders(self, orders: List[OrderRow], batch_size: int = 1000) -> None:
         """
         Load orders into the database
         
         Args:
-            orders: List of transformed order data
+            orders: List of transformed order rows
             batch_size: Number of records to insert in each batch
         """
         try:
@@ -31,12 +35,12 @@ class ShopifyDataLoader:
             logger.error(f"Error loading orders: {str(e)}")
             raise
 
-    def load_order_items(self, order_items: List[Dict[str, Any]], batch_size: int = 1000) -> None:
+    def load_order_items(self, order_items: List[OrderItemRow], batch_size: int = 1000) -> None:
         """
         Load order items into the database
         
         Args:
-            order_items: List of transformed order item data
+            order_items: List of transformed order item rows
             batch_size: Number of records to insert in each batch
         """
         try:
@@ -46,24 +50,88 @@ class ShopifyDataLoader:
             logger.error(f"Error loading order items: {str(e)}")
             raise
 
-    def load_data(self, orders: List[Dict[str, Any]], order_items: List[Dict[str, Any]], 
+    def load_data(self, orders: List[OrderRow], order_items: List[OrderItemRow], 
                  batch_size: int = 1000) -> None:
         """
         Load both orders and order items into the database
         
         Args:
-            orders: List of transformed order data
-            order_items: List of transformed order item data
+            orders: List of transformed order rows
+            order_items: List of transformed order item rows
             batch_size: Number of records to insert in each batch
         """
         try:
+            if self.dedup_index is not None:
+                orders, order_items = self.dedup_index.filter(orders, order_items)
+                if not orders:
+                    logger.info("All orders were already loaded")
+                    return
+
             # Load orders first
             self.load_orders(orders, batch_size)
             
             # Then load order items
             self.load_order_items(order_items, batch_size)
             
+            if self.dedup_index is not None:
+                self.dedup_index.add(orders)
+            
             logger.info("Successfully loaded all data")
         except Exception as e:
             logger.error(f"Error loading data: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    def bulk_load(self, orders: List[OrderRow], order_items: List[OrderItemRow],
+                  batch_size: int = 100000, replace_partitions: bool = False) -> None:
+        """
+        Load a backfill through staging tables, swapping whole partitions into the live tables
+        
+        Without replace_partitions, only orders not loaded before are attached.
+        Attached rows would sit next to the loaded versions of changed orders
+        until a background merge, so those are inserted through load_data's
+        path instead, which replaces them.
+        
+        Args:
+            orders: List of transformed order rows
+            order_items: List of transformed order item rows
+            batch_size: Number of records to insert into the staging tables in each batch
+            replace_partitions: Replace the order partitions the backfill covers, and the
+                items of their orders, instead of adding to them
+        """
+        try:
+            if replace_partitions:
+                # A replaced partition must hold every order of it, loaded before or not
+                orders, order_items = dedupe_batch(orders, order_items)
+                dropped = self.db_client.bulk_replace_orders(orders, order_items, batch_size)
+                logger.info(f"Bulk loaded {len(orders)} orders and {len(order_items)} order items, "
+                            f"replacing their partitions and dropping {len(dropped)} orders")
+                if self.dedup_index is not None:
+                    self.dedup_index.replace(orders, dropped)
+                return
+
+            if self.dedup_index is not None:
+                orders, order_items = self.dedup_index.filter(orders, order_items)
+                loaded = {order.id for order in orders if order.id in self.dedup_index}
+            else:
+                orders, order_items = dedupe_batch(orders, order_items)
+                loaded = self.db_client.loaded_order_ids([order.id for order in orders])
+            if not orders:
+                logger.info("All orders were already loaded")
+                return
+
+            new_orders = [order for order in orders if order.id not in loaded]
+            new_items = [item for item in order_items if item.order_id not in loaded]
+            partitions = self.db_client.bulk_insert_orders(new_orders, batch_size)
+            logger.info(f"Bulk loaded {len(new_orders)} orders into {len(partitions)} partitions")
+            self.db_client.bulk_insert_order_items(new_items, batch_size)
+            logger.info(f"Bulk loaded {len(new_items)} order items")
+
+            if loaded:
+                self.load_orders([order for order in orders if order.id in loaded])
+                self.load_order_items([item for item in order_items if item.order_id in loaded])
+
+            if self.dedup_index is not None:
+                self.dedup_index.add(orders)
+        except Exception as e:
+            logger.error(f"Error bulk loading data: {str(e)}")
+            raise
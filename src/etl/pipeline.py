@@ -1,14 +1,20 @@
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 from src.etl.extractor import ShopifyDataExtractor
 from src.etl.loader import ShopifyDataLoader
 from src.etl.transformer import ShopifyDataTransformer
+from src.etl.watermarks import WatermarkStore, latest_update
+from src.models.records import OrderRecord
 from src.interfaces.file_watcher import FileWatcher
-from src.interfaces.event_queue import EventQueue
+from src.interfaces.event_queue import FILE_EVENT_KEY, EventQueue
 from src.processors.order_processor import OrderEventProcessor
+from src.monitoring.metrics import get_registry
 import logging
 
 logger = logging.getLogger(__name__)
 
+RUN_METRICS = get_registry().stage('pipeline_run')
+
 class ETLPipeline:
     def __init__(
         self,
@@ -17,14 +23,16 @@ class ETLPipeline:
         event_queue: EventQueue,
         extractor: ShopifyDataExtractor,
         transformer: ShopifyDataTransformer,
-        loader: ShopifyDataLoader
+        loader: ShopifyDataLoader,
+        watermarks: Optional[WatermarkStore] = None
     ):
         self.file_watcher = file_watcher
         self.event_queue = event_queue
         self.extractor = extractor
         self.transformer = transformer
         self.loader = loader
-        self.order_processor = OrderEventProcessor(extractor, transformer, loader)
+        self.watermarks = watermarks
+        self.order_processor = OrderEventProcessor(extractor, transformer, loader, watermarks)
         self._setup_event_processing()
 
     def _setup_event_processing(self):
@@ -35,22 +43,76 @@ class ETLPipeline:
     def _on_new_order(self, order_data: Dict[str, Any]):
         try:
             self.event_queue.put(order_data)
-            logger.info(f"Queued new event with {len(order_data.get('orders', []))} orders")
+            if FILE_EVENT_KEY in order_data:
+                logger.info(f"Queued new event for file {order_data[FILE_EVENT_KEY]}")
+            else:
+                logger.info(f"Queued new event with {len(order_data.get('orders', []))} orders")
         except Exception as e:
             logger.error(f"Error queuing order: {str(e)}")
 
-    def run(self, file_pattern: str = "*.json", batch_size: int = 1000) -> None:
+    def _extract_incremental(self, file_pattern: Optional[str], backfill: bool,
+                             since: Optional[datetime]) -> Tuple[List[OrderRecord], Dict[str, datetime]]:
+        """Extract the orders updated after each file's high-water mark, with the marks to advance to"""
+        orders = []
+        marks = {}
+        for file_path in self.extractor._get_json_files(file_pattern):
+            source = self.watermarks.source_of(file_path)
+            mark = None if backfill else since or self.watermarks.get(source)
+            try:
+                records = self.extractor.extract_file(file_path, updated_after=mark, skip_extracted=not backfill)
+            except Exception as e:
+                logger.error(f"Error processing file {file_path}: {str(e)}")
+                continue
+            latest = latest_update(records)
+            if latest is not None:
+                marks[source] = latest
+            orders.extend(records)
+        logger.info(f"Extracted {len(orders)} orders updated since the last load from {len(marks)} files")
+        return orders, marks
+
+    def run(self, file_pattern: Optional[str] = None, batch_size: int = 1000,
+            backfill: bool = False, since: Optional[datetime] = None, replace_partitions: bool = False) -> None:
+        """
+        Extract, transform and load the order files in the data directory
+
+        With a watermark store, only orders updated after each file's
+        high-water mark are loaded, and the marks advance once the load
+        succeeds.
+
+        Args:
+            file_pattern: Glob pattern of the files to load, all order files if None
+            batch_size: Number of records to insert in each batch
+            backfill: Ignore the high-water marks and reload every order in the files,
+                bulk loading them through staging tables so live tables are not merged
+            since: Load orders updated after this time instead of after each file's mark
+            replace_partitions: With backfill, replace the order partitions the files cover
+        """
         try:
-            # Process existing files
-            logger.info("Starting data extraction...")
-            orders = self.extractor.extract_orders(file_pattern)
-            if not orders:
-                logger.warning("No orders found to process")
-                return
-
-            # Transform and load existing orders
-            transformed_orders, transformed_line_items = self.transformer.transform_orders(orders)
-            self.loader.load_data(transformed_orders, transformed_line_items, batch_size)
+            with RUN_METRICS.measure() as measurement:
+                # Process existing files
+                logger.info("Starting data extraction...")
+                marks = {}
+                if self.watermarks is not None:
+                    orders, marks = self._extract_incremental(file_pattern, backfill, since)
+                else:
+                    orders = self.extractor.extract_orders(file_pattern)
+                if not orders:
+                    logger.warning("No orders found to process")
+                    return
+                measurement.rows_in = len(orders)
+
+                # Transform and load existing orders
+                transformed_orders, transformed_line_items = self.transformer.transform_orders(orders)
+                if backfill:
+                    self.loader.bulk_load(transformed_orders, transformed_line_items,
+                                          replace_partitions=replace_partitions)
+                else:
+                    self.loader.load_data(transformed_orders, transformed_line_items, batch_size)
+                measurement.rows_out = len(transformed_orders)
+
+                # Only advance once the orders are in the table, so a failed load is retried
+                if marks:
+                    self.watermarks.advance(marks)
 
             logger.info("ETL pipeline completed successfully")
         except Exception as e:
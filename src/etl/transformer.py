@@ -1,11 +1,17 @@
-from typing import Dict, List, Any, Tuple
+from typing import List, Tuple, Union
 import logging
 from decimal import Decimal
 
-from ..models.order import Order, LineItem
+from ..models.order import Order
+from ..models.records import OrderItemRow, OrderRecord, OrderRow
+from ..monitoring.metrics import get_registry
+from ..monitoring.profiling import profile_hook
 
 logger = logging.getLogger(__name__)
 
+TRANSFORM_METRICS = get_registry().stage('transform_orders')
+TRANSFORM_ERRORS = get_registry().counter('transform_order_errors', 'Orders dropped by the transformer')
+
 class ShopifyDataTransformer:
     """Transforms Shopify order data into database-ready format"""
 
@@ -26,85 +32,95 @@ class ShopifyDataTransformer:
             logger.error(f"Error converting money string {money_str}: {str(e)}")
             return Decimal('0.00')
 
-    def transform_order(self, order: Order) -> Dict[str, Any]:
+    @staticmethod
+    def _as_record(order: Union[Order, OrderRecord]) -> OrderRecord:
+        """Accept pydantic orders from callers that have not converted them yet"""
+        return OrderRecord.from_model(order) if isinstance(order, Order) else order
+
+    @profile_hook('transform_order')
+    def transform_order(self, order: Union[Order, OrderRecord]) -> OrderRow:
         """
         Transform a single order into database format
         
         Args:
-            order: Order object to transform
+            order: Order record to transform
             
         Returns:
-            Dictionary with order data ready for database insertion
+            Row with order data ready for database insertion
         """
         try:
-            return {
-                'id': order.id,
-                'name': order.name or '',
-                'email': order.email or '',
-                'created_at': order.created_at,
-                'updated_at': order.updated_at,
-                'processed_at': order.processed_at,
-                'total_price': self._convert_money_to_decimal(order.total_price),
-                'subtotal_price': self._convert_money_to_decimal(order.subtotal_price),
-                'total_tax': self._convert_money_to_decimal(order.total_tax),
-                'total_discounts': self._convert_money_to_decimal(order.total_discounts),
-                'currency': order.currency or '',
-                'financial_status': order.financial_status or '',
-                'fulfillment_status': order.fulfillment_status or '',
-                'customer_id': order.customer.id if order.customer else 0,
-                'customer_email': order.customer.email if order.customer else '',
-                'customer_first_name': order.customer.first_name if order.customer else '',
-                'customer_last_name': order.customer.last_name if order.customer else '',
-                'customer_phone': order.customer.phone if order.customer else '',
-                'billing_address_city': order.billing_address.city if order.billing_address else '',
-                'billing_address_province': order.billing_address.province if order.billing_address else '',
-                'billing_address_country': order.billing_address.country if order.billing_address else '',
-                'shipping_address_city': order.shipping_address.city if order.shipping_address else '',
-                'shipping_address_province': order.shipping_address.province if order.shipping_address else '',
-                'shipping_address_country': order.shipping_address.country if order.shipping_address else '',
-                'note': order.note or '',
-                'tags': order.tags or ''
-            }
+            order = self._as_record(order)
+            return OrderRow(
+                id=order.id,
+                name=order.name or '',
+                email=order.email or '',
+                created_at=order.created_at,
+                updated_at=order.updated_at,
+                processed_at=order.processed_at,
+                total_price=self._convert_money_to_decimal(order.total_price),
+                subtotal_price=self._convert_money_to_decimal(order.subtotal_price),
+                total_tax=self._convert_money_to_decimal(order.total_tax),
+                total_discounts=self._convert_money_to_decimal(order.total_discounts),
+                currency=order.currency or '',
+                financial_status=order.financial_status or '',
+                fulfillment_status=order.fulfillment_status or '',
+                customer_id=order.customer_id,
+                customer_email=order.customer_email,
+                customer_first_name=order.customer_first_name,
+                customer_last_name=order.customer_last_name,
+                customer_phone=order.customer_phone,
+                billing_address_city=order.billing_address_city,
+                billing_address_province=order.billing_address_province,
+                billing_address_country=order.billing_address_country,
+                shipping_address_city=order.shipping_address_city,
+                shipping_address_province=order.shipping_address_province,
+                shipping_address_country=order.shipping_address_country,
+                note=order.note or '',
+                tags=order.tags or ''
+            )
         except Exception as e:
             logger.error(f"Error transforming order {order.id}: {str(e)}")
             raise
 
-    def transform_order_items(self, order: Order) -> List[Dict[str, Any]]:
+    @profile_hook('transform_order_items')
+    def transform_order_items(self, order: Union[Order, OrderRecord]) -> List[OrderItemRow]:
         """
         Transform order items from an order into database format
         
         Args:
-            order: Order object containing order items
+            order: Order record containing order items
             
         Returns:
-            List of dictionaries with order item data ready for database insertion
+            List of rows with order item data ready for database insertion
         """
         try:
+            order = self._as_record(order)
             return [
-                {
-                    'id': item.id,
-                    'order_id': order.id,
-                    'name': item.name or '',
-                    'price': self._convert_money_to_decimal(item.price),
-                    'quantity': item.quantity or 0,
-                    'sku': item.sku or '',
-                    'title': item.title or '',
-                    'variant_id': item.variant_id or 0,
-                    'product_id': item.product_id or 0,
-                    'total_discount': self._convert_money_to_decimal(item.total_discount)
-                }
+                OrderItemRow(
+                    id=item.id,
+                    order_id=order.id,
+                    name=item.name or '',
+                    price=self._convert_money_to_decimal(item.price),
+                    quantity=item.quantity or 0,
+                    sku=item.sku or '',
+                    title=item.title or '',
+                    variant_id=item.variant_id or 0,
+                    product_id=item.product_id or 0,
+                    total_discount=self._convert_money_to_decimal(item.total_discount),
+                    order_created_at=order.created_at
+                )
                 for item in order.line_items
             ]
         except Exception as e:
             logger.error(f"Error transforming order items for order {order.id}: {str(e)}")
             raise
 
-    def transform_orders(self, orders: List[Order]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    def transform_orders(self, orders: List[OrderRecord]) -> Tuple[List[OrderRow], List[OrderItemRow]]:
         """
         Transform multiple orders and their order items
         
         Args:
-            orders: List of Order objects to transform
+            orders: List of order records to transform
             
         Returns:
             Tuple of (transformed_orders, transformed_order_items)
@@ -112,13 +128,16 @@ class ShopifyDataTransformer:
         transformed_orders = []
         transformed_order_items = []
         
-        for order in orders:
-            try:
-                transformed_orders.append(self.transform_order(order))
-                transformed_order_items.extend(self.transform_order_items(order))
-            except Exception as e:
-                logger.error(f"Error transforming order {order.id}: {str(e)}")
-                continue
+        with TRANSFORM_METRICS.measure(rows_in=len(orders)) as measurement:
+            for order in orders:
+                try:
+                    transformed_orders.append(self.transform_order(order))
+                    transformed_order_items.extend(self.transform_order_items(order))
+                except Exception as e:
+                    logger.error(f"Error transforming order {order.id}: {str(e)}")
+                    TRANSFORM_ERRORS.inc()
+                    continue
+            measurement.rows_out = len(transformed_orders)
         
         logger.info(f"Successfully transformed {len(transformed_orders)} orders and {len(transformed_order_items)} order items")
         return transformed_orders, transformed_order_items 
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+import json
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional, Union
+import logging
+
+from ..models.records import OrderRecord
+
+logger = logging.getLogger(__name__)
+
+
+def as_utc(value: datetime) -> datetime:
+    """Make a datetime comparable with the others; naive values are taken as UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def latest_update(records: Iterable[OrderRecord]) -> Optional[datetime]:
+    """Latest updated_at of the records, the mark their source can advance to; None if there are none"""
+    return max((as_utc(record.updated_at) for record in records), default=None)
+
+
+class WatermarkStore:
+    """
+    Persistent high-water marks on updated_at, one per source.
+
+    A source is an order file, named by its file name, so a cumulative
+    export rewritten under the same name is read incrementally: only orders
+    updated after the source's mark are extracted. Marks are saved as one
+    JSON file, replaced atomically so a crash never leaves it half written.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Initialize the store, loading any saved marks
+
+        Args:
+            path: JSON file the marks are kept in; created on the first save
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._marks: Dict[str, datetime] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._marks = {source: datetime.fromisoformat(mark) for source, mark in json.load(f).items()}
+            logger.info(f"Loaded {len(self._marks)} high-water marks from {self.path}")
+
+    @staticmethod
+    def source_of(file_path: Union[str, Path]) -> str:
+        """Source name of an order file"""
+        return Path(file_path).name
+
+    def get(self, source: str) -> Optional[datetime]:
+        """High-water mark of a source, None if it was never loaded"""
+        with self._lock:
+            return self._marks.get(source)
+
+    def marks(self) -> Dict[str, datetime]:
+        """Copy of all marks"""
+        with self._lock:
+            return dict(self._marks)
+
+    def advance(self, marks: Mapping[str, datetime]) -> None:
+        """
+        Raise the marks of sources to the given values and save them
+
+        Marks never move backwards, so loading an old export again does not
+        make the next run reprocess newer orders.
+        """
+        if not marks:
+            return
+        with self._lock:
+            changed = False
+            for source, mark in marks.items():
+                mark = as_utc(mark)
+                current = self._marks.get(source)
+                if current is None or mark > current:
+                    self._marks[source] = mark
+                    changed = True
+            if changed:
+                self._save()
+
+    def reset(self, source: Optional[str] = None) -> None:
+        """Forget the mark of one source, or of all sources if None, so they are loaded in full again"""
+        with self._lock:
+            if source is None:
+                self._marks.clear()
+            else:
+                self._marks.pop(source, None)
+            self._save()
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({source: mark.isoformat() for source, mark in self._marks.items()}, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
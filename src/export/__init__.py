@@ -0,0 +1,7 @@
+"""
+Columnar export of analytics results and table snapshots
+"""
+
+from .columnar_exporter import ColumnarExporter, arrow_type
+
+__all__ = ['ColumnarExporter', 'arrow_type']
\ No newline at end of file
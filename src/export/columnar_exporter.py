@@ -0,0 +1,202 @@
+import os
+import re
+from typing import Any, List, Optional, Sequence, Tuple
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import logging
+from src.database.clickhouse_client import ClickHouseClient, unwrap_type
+
+logger = logging.getLogger(__name__)
+
+# Arrow types for ClickHouse types that map one-to-one
+_ARROW_TYPES = {
+    'UInt8': pa.uint8(), 'UInt16': pa.uint16(), 'UInt32': pa.uint32(), 'UInt64': pa.uint64(),
+    'Int8': pa.int8(), 'Int16': pa.int16(), 'Int32': pa.int32(), 'Int64': pa.int64(),
+    'Float32': pa.float32(), 'Float64': pa.float64(), 'Bool': pa.bool_(),
+    'String': pa.string(), 'Date': pa.date32(), 'Date32': pa.date32(), 'DateTime': pa.timestamp('s')
+}
+
+_DECIMAL = re.compile(r'^Decimal(32|64|128|256)?\((\d+)\s*(?:,\s*(\d+))?\)$')
+_DATETIME64 = re.compile(r'^DateTime64\((\d)')
+_DECIMAL_PRECISION = {'32': 9, '64': 18, '128': 38, '256': 76}
+
+FILE_EXTENSIONS = {'parquet': 'parquet', 'arrow': 'arrow'}
+
+
+def arrow_type(column_type: str) -> Optional[pa.DataType]:
+    """
+    Map a ClickHouse column type to an Arrow type
+
+    Decimals stay decimals, so monetary values are exported without rounding.
+
+    Args:
+        column_type: ClickHouse type name from the column metadata
+
+    Returns:
+        Arrow type, or None for types without a fixed mapping (UUID, Tuple, Map, ...)
+    """
+    inner_type, _ = unwrap_type(column_type)
+
+    if inner_type in _ARROW_TYPES:
+        return _ARROW_TYPES[inner_type]
+
+    decimal_match = _DECIMAL.match(inner_type)
+    if decimal_match:
+        bits, first, second = decimal_match.groups()
+        # Decimal(P, S) carries the precision, Decimal32(S) and friends only the scale
+        precision, scale = (int(first), int(second)) if second is not None else (_DECIMAL_PRECISION[bits], int(first))
+        return pa.decimal128(precision, scale) if precision <= 38 else pa.decimal256(precision, scale)
+
+    datetime_match = _DATETIME64.match(inner_type)
+    if datetime_match:
+        digits = int(datetime_match.group(1))
+        return pa.timestamp('s' if digits == 0 else 'ms' if digits <= 3 else 'us' if digits <= 6 else 'ns')
+
+    if inner_type.startswith('DateTime('):
+        return pa.timestamp('s')
+
+    if inner_type.startswith('FixedString(') or inner_type.startswith('Enum'):
+        return pa.string()
+
+    if inner_type.startswith('Array(') and inner_type.endswith(')'):
+        value_type = arrow_type(inner_type[len('Array('):-1])
+        return pa.list_(value_type) if value_type is not None else None
+
+    return None
+
+
+class ColumnarExporter:
+    """
+    Writes DataFrames and query results as Parquet or Arrow IPC files.
+
+    Query results are streamed from ClickHouse in blocks and written one row
+    group (Parquet) or record batch (Arrow) at a time, so memory is bounded by
+    row_group_size regardless of the result size. Files are written under a
+    temporary name and renamed when complete, so readers never see partial files.
+    """
+
+    def __init__(self, output_dir: str, file_format: str = 'parquet',
+                 compression: Optional[str] = 'zstd', row_group_size: int = 100000):
+        """
+        Initialize the exporter
+
+        Args:
+            output_dir: Directory to write files to
+            file_format: 'parquet' or 'arrow' (Arrow IPC file)
+            compression: Codec name ('zstd', 'lz4', 'snappy' for Parquet), or None
+            row_group_size: Rows per Parquet row group or Arrow record batch
+        """
+        if file_format not in FILE_EXTENSIONS:
+            raise ValueError(f"file_format must be one of {sorted(FILE_EXTENSIONS)}")
+        if row_group_size < 1:
+            raise ValueError("row_group_size must be positive")
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.compression = compression
+        self.row_group_size = row_group_size
+        os.makedirs(output_dir, exist_ok=True)
+
+    def path_for(self, name: str) -> str:
+        """Path of the file written for the given export name"""
+        return os.path.join(self.output_dir, f"{name}.{FILE_EXTENSIONS[self.file_format]}")
+
+    def _open_writer(self, path: str, schema: pa.Schema):
+        if self.file_format == 'parquet':
+            return pq.ParquetWriter(path, schema, compression=self.compression or 'none')
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        return pa.ipc.new_file(path, schema, options=options)
+
+    def _write_table(self, writer, table: pa.Table) -> None:
+        if self.file_format == 'parquet':
+            writer.write_table(table, row_group_size=self.row_group_size)
+        else:
+            writer.write_table(table, max_chunksize=self.row_group_size)
+
+    def export_dataframe(self, name: str, df: pd.DataFrame) -> str:
+        """
+        Export a DataFrame
+
+        Args:
+            name: Export name, used as the file name
+            df: DataFrame to export
+
+        Returns:
+            Path of the written file
+        """
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path = self.path_for(name)
+        tmp_path = f"{path}.tmp"
+        with self._open_writer(tmp_path, table.schema) as writer:
+            self._write_table(writer, table)
+        os.replace(tmp_path, path)
+        logger.info(f"Exported {table.num_rows} rows to {path}")
+        return path
+
+    def export_query(self, db_client: ClickHouseClient, query: str, name: str) -> str:
+        """
+        Stream a query result into a file
+
+        Args:
+            db_client: ClickHouse client instance
+            query: SQL query to export
+            name: Export name, used as the file name
+
+        Returns:
+            Path of the written file
+        """
+        column_types, chunks = db_client.execute_iter(query, chunk_size=self.row_group_size)
+        schema, text_columns = self._schema(column_types)
+        path = self.path_for(name)
+        tmp_path = f"{path}.tmp"
+        rows = 0
+        try:
+            with self._open_writer(tmp_path, schema) as writer:
+                for chunk in chunks:
+                    self._write_table(writer, self._chunk_to_table(chunk, schema, text_columns))
+                    rows += len(chunk)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+        logger.info(f"Exported {rows} rows to {path}")
+        return path
+
+    def export_table(self, db_client: ClickHouseClient, table: str,
+                     columns: Optional[Sequence[str]] = None, final: bool = True) -> str:
+        """
+        Export a snapshot of a table
+
+        Args:
+            db_client: ClickHouse client instance
+            table: Table to export
+            columns: Columns to export, all columns if omitted
+            final: Read with FINAL so replaced rows are collapsed
+
+        Returns:
+            Path of the written file
+        """
+        column_list = ', '.join(columns) if columns else '*'
+        query = f"SELECT {column_list} FROM {table}{' FINAL' if final else ''}"
+        return self.export_query(db_client, query, table)
+
+    @staticmethod
+    def _schema(column_types: List[Tuple[str, str]]) -> Tuple[pa.Schema, List[bool]]:
+        """Build the Arrow schema, exporting columns without a fixed mapping as text"""
+        types = [arrow_type(column_type) for _, column_type in column_types]
+        schema = pa.schema([
+            pa.field(name, data_type or pa.string())
+            for (name, _), data_type in zip(column_types, types)
+        ])
+        return schema, [data_type is None for data_type in types]
+
+    @staticmethod
+    def _chunk_to_table(chunk: List[tuple], schema: pa.Schema, text_columns: List[bool]) -> pa.Table:
+        """Transpose a chunk of row tuples into an Arrow table"""
+        columns: List[Any] = list(zip(*chunk)) if chunk else [()] * len(schema)
+        arrays = [
+            pa.array([None if v is None else str(v) for v in values] if as_text else values, type=field.type)
+            for field, values, as_text in zip(schema, columns, text_columns)
+        ]
+        return pa.Table.from_arrays(arrays, schema=schema)
@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Callable
 
+# Events carry either parsed orders under 'orders', or a reference to an
+# order file under FILE_EVENT_KEY that the worker parses itself
+FILE_EVENT_KEY = 'file'
+
 class EventQueue(ABC):
     @abstractmethod
     def add_processor(self, processor: Callable[[Dict[str, Any]], None]) -> None:
@@ -0,0 +1,10 @@
+from abc import ABC, abstractmethod
+
+class MetricsExporter(ABC):
+    @abstractmethod
+    def start(self) -> None:
+        pass
+
+    @abstractmethod
+    def stop(self) -> None:
+        pass
\ No newline at end of file
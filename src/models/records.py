@@ -0,0 +1,233 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .order import LineItem, Order
+
+
+class Record:
+    """
+    Compact row passed between pipeline stages.
+
+    Subclasses list their fields in __slots__, so a record stores one
+    pointer per field and no per-instance dict, several times smaller than
+    the equivalent dict or pydantic model. Records read like mappings from
+    field name to value, so code written against row dicts keeps working.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **fields: Any):
+        if len(fields) != len(self.__slots__):
+            unknown = set(fields) - set(self.__slots__)
+            missing = set(self.__slots__) - set(fields)
+            raise TypeError(f"{type(self).__name__}: unknown fields {sorted(unknown)}, missing {sorted(missing)}")
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    def keys(self) -> Tuple[str, ...]:
+        """Field names, in column order"""
+        return self.__slots__
+
+    def values(self) -> Tuple[Any, ...]:
+        """Field values, in column order"""
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self.__slots__, self.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.values() == other.values()
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class LineItemRecord(Record):
+    """A validated line item, as passed from the extractor to the transformer"""
+
+    __slots__ = ('id', 'name', 'price', 'quantity', 'sku', 'title', 'variant_id', 'product_id', 'total_discount')
+
+    id: int
+    name: str
+    price: str
+    quantity: int
+    sku: str
+    title: str
+    variant_id: int
+    product_id: int
+    total_discount: str
+
+    @classmethod
+    def from_model(cls, item: LineItem) -> 'LineItemRecord':
+        return cls(
+            id=item.id,
+            name=item.name,
+            price=item.price,
+            quantity=item.quantity,
+            sku=item.sku,
+            title=item.title,
+            variant_id=item.variant_id,
+            product_id=item.product_id,
+            total_discount=item.total_discount
+        )
+
+
+class OrderRecord(Record):
+    """
+    A validated order, as passed from the extractor to the transformer.
+
+    Customer and addresses are flattened to the fields the tables store,
+    and shipping lines, tax lines and discount codes, which are not loaded,
+    are dropped.
+    """
+
+    __slots__ = (
+        'id', 'name', 'email', 'created_at', 'updated_at', 'processed_at',
+        'total_price', 'subtotal_price', 'total_tax', 'total_discounts',
+        'currency', 'financial_status', 'fulfillment_status',
+        'customer_id', 'customer_email', 'customer_first_name', 'customer_last_name', 'customer_phone',
+        'billing_address_city', 'billing_address_province', 'billing_address_country',
+        'shipping_address_city', 'shipping_address_province', 'shipping_address_country',
+        'note', 'tags', 'line_items'
+    )
+
+    id: int
+    name: str
+    email: str
+    created_at: datetime
+    updated_at: datetime
+    processed_at: datetime
+    total_price: str
+    subtotal_price: str
+    total_tax: str
+    total_discounts: str
+    currency: str
+    financial_status: str
+    fulfillment_status: Optional[str]
+    customer_id: int
+    customer_email: str
+    customer_first_name: str
+    customer_last_name: str
+    customer_phone: Optional[str]
+    billing_address_city: str
+    billing_address_province: str
+    billing_address_country: str
+    shipping_address_city: str
+    shipping_address_province: str
+    shipping_address_country: str
+    note: Optional[str]
+    tags: str
+    line_items: Tuple[LineItemRecord, ...]
+
+    @classmethod
+    def from_model(cls, order: Order) -> 'OrderRecord':
+        customer = order.customer
+        billing = order.billing_address
+        shipping = order.shipping_address
+        return cls(
+            id=order.id,
+            name=order.name,
+            email=order.email,
+            created_at=order.created_at,
+            updated_at=order.updated_at,
+            processed_at=order.processed_at,
+            total_price=order.total_price,
+            subtotal_price=order.subtotal_price,
+            total_tax=order.total_tax,
+            total_discounts=order.total_discounts,
+            currency=order.currency,
+            financial_status=order.financial_status,
+            fulfillment_status=order.fulfillment_status,
+            customer_id=customer.id if customer else 0,
+            customer_email=customer.email if customer else '',
+            customer_first_name=customer.first_name if customer else '',
+            customer_last_name=customer.last_name if customer else '',
+            customer_phone=customer.phone if customer else '',
+            billing_address_city=billing.city if billing else '',
+            billing_address_province=billing.province if billing else '',
+            billing_address_country=billing.country if billing else '',
+            shipping_address_city=shipping.city if shipping else '',
+            shipping_address_province=shipping.province if shipping else '',
+            shipping_address_country=shipping.country if shipping else '',
+            note=order.note,
+            tags=order.tags,
+            line_items=tuple(LineItemRecord.from_model(item) for item in order.line_items)
+        )
+
+
+class OrderRow(Record):
+    """A row of the orders table, as passed from the transformer to the loader"""
+
+    __slots__ = (
+        'id', 'name', 'email', 'created_at', 'updated_at', 'processed_at',
+        'total_price', 'subtotal_price', 'total_tax', 'total_discounts',
+        'currency', 'financial_status', 'fulfillment_status',
+        'customer_id', 'customer_email', 'customer_first_name', 'customer_last_name', 'customer_phone',
+        'billing_address_city', 'billing_address_province', 'billing_address_country',
+        'shipping_address_city', 'shipping_address_province', 'shipping_address_country',
+        'note', 'tags'
+    )
+
+    id: int
+    name: str
+    email: str
+    created_at: datetime
+    updated_at: datetime
+    processed_at: datetime
+    total_price: Decimal
+    subtotal_price: Decimal
+    total_tax: Decimal
+    total_discounts: Decimal
+    currency: str
+    financial_status: str
+    fulfillment_status: str
+    customer_id: int
+    customer_email: str
+    customer_first_name: str
+    customer_last_name: str
+    customer_phone: str
+    billing_address_city: str
+    billing_address_province: str
+    billing_address_country: str
+    shipping_address_city: str
+    shipping_address_province: str
+    shipping_address_country: str
+    note: str
+    tags: str
+
+
+class OrderItemRow(Record):
+    """A row of the order_items table, as passed from the transformer to the loader"""
+
+    __slots__ = ('id', 'order_id', 'name', 'price', 'quantity', 'sku', 'title', 'variant_id', 'product_id',
+                 'total_discount', 'order_created_at')
+
+    id: int
+    order_id: int
+    name: str
+    price: Decimal
+    quantity: int
+    sku: str
+    title: str
+    variant_id: int
+    product_id: int
+    total_discount: Decimal
+    order_created_at: datetime
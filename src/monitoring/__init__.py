@@ -0,0 +1,11 @@
+"""
+Pipeline metrics and exporters
+"""
+
+from .metrics import Counter, Gauge, Histogram, StageMetrics, MetricsRegistry, get_registry
+from .exporters import PrometheusExporter, LoggingExporter, render_prometheus
+from .profiling import ProfilingHooks, profiler, profile_hook
+
+__all__ = ['Counter', 'Gauge', 'Histogram', 'StageMetrics', 'MetricsRegistry', 'get_registry',
+           'PrometheusExporter', 'LoggingExporter', 'render_prometheus',
+           'ProfilingHooks', 'profiler', 'profile_hook']
\ No newline at end of file
@@ -0,0 +1,156 @@
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+import logging
+from src.interfaces.metrics_exporter import MetricsExporter
+from src.monitoring.metrics import MetricsRegistry, get_registry
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def render_prometheus(registry: MetricsRegistry, prefix: str = 'shopify_etl') -> str:
+    """
+    Render every metric in the Prometheus text exposition format
+
+    Stage metrics share one metric family per kind, labelled by stage.
+
+    Args:
+        registry: Registry to render
+        prefix: Prefix of every metric name
+
+    Returns:
+        Exposition text
+    """
+    lines: List[str] = []
+    stages = list(registry.stages.values())
+
+    for kind, help_text in (('calls', 'Stage calls'), ('rows_in', 'Rows received by a stage'),
+                            ('rows_out', 'Rows produced by a stage'), ('bytes', 'Bytes processed by a stage'),
+                            ('errors', 'Failed stage calls')):
+        name = f"{prefix}_stage_{kind}_total"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for stage in stages:
+            lines.append(f'{name}{{stage="{stage.name}"}} {_format_value(getattr(stage, kind).value)}')
+
+    name = f"{prefix}_stage_latency_seconds"
+    lines.append(f"# HELP {name} Sampled stage call latency")
+    lines.append(f"# TYPE {name} histogram")
+    for stage in stages:
+        buckets, total, count = stage.latency.snapshot()
+        for bound, cumulative in buckets:
+            lines.append(f'{name}_bucket{{stage="{stage.name}",le="{_format_value(bound)}"}} {_format_value(cumulative)}')
+        lines.append(f'{name}_sum{{stage="{stage.name}"}} {_format_value(total)}')
+        lines.append(f'{name}_count{{stage="{stage.name}"}} {_format_value(count)}')
+
+    for counter in list(registry.counters.values()):
+        name = f"{prefix}_{counter.name}_total"
+        lines.append(f"# HELP {name} {counter.description or counter.name}")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {_format_value(counter.value)}")
+
+    for gauge in list(registry.gauges.values()):
+        name = f"{prefix}_{gauge.name}"
+        lines.append(f"# HELP {name} {gauge.description or gauge.name}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {_format_value(gauge.value)}")
+
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusExporter(MetricsExporter):
+    """Serves metrics in the Prometheus text format over HTTP from a background thread"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9108, registry: Optional[MetricsRegistry] = None):
+        """
+        Initialize the exporter
+
+        Args:
+            host: Interface to bind, local only by default
+            port: Port to serve /metrics on, 0 to pick a free port
+            registry: Registry to expose, the process-wide registry if omitted
+        """
+        self.host = host
+        self.port = port
+        self.registry = registry or get_registry()
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        registry = self.registry
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = render_prometheus(registry).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+        logger.info("Metrics exporter stopped")
+
+
+class LoggingExporter(MetricsExporter):
+    """Logs a summary of every stage at a fixed interval"""
+
+    def __init__(self, interval: float = 60.0, registry: Optional[MetricsRegistry] = None):
+        """
+        Initialize the exporter
+
+        Args:
+            interval: Seconds between summaries
+            registry: Registry to log, the process-wide registry if omitted
+        """
+        self.interval = interval
+        self.registry = registry or get_registry()
+        self._stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.log_summary()
+
+    def log_summary(self) -> None:
+        for name, values in self.registry.snapshot().items():
+            logger.info(f"{name}: " + ', '.join(f"{key}={value:g}" for key, value in values.items()))
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self.thread:
+            self.thread.join()
+        self.log_summary()
@@ -0,0 +1,250 @@
+import time
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Latency bucket upper bounds in seconds, from 1ms to 1 minute
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _ThreadCells:
+    """
+    Per-thread value cells.
+
+    Each thread updates only its own cell, so updates need no lock; readers sum
+    all cells. A lock is taken once per thread, when its cell is created.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._cells: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def cell(self) -> List[float]:
+        cell = getattr(self._local, 'cell', None)
+        if cell is None:
+            cell = [0.0] * self._size
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+        return cell
+
+    def totals(self) -> List[float]:
+        totals = [0.0] * self._size
+        for cell in list(self._cells):
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+
+class Counter:
+    """Monotonically increasing value"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._cells.cell()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._cells.totals()[0]
+
+
+class Gauge:
+    """Value read from a callback whenever metrics are collected"""
+
+    def __init__(self, name: str, callback: Callable[[], float], description: str = ""):
+        self.name = name
+        self.description = description
+        self.callback = callback
+
+    @property
+    def value(self) -> float:
+        try:
+            return float(self.callback())
+        except Exception as e:
+            logger.debug(f"Gauge {self.name} callback failed: {str(e)}")
+            return float('nan')
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets"""
+
+    def __init__(self, name: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, description: str = ""):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        # One cell per bucket, one for values above the last bucket, then sum and count
+        self._cells = _ThreadCells(len(self.buckets) + 3)
+
+    def observe(self, value: float) -> None:
+        cell = self._cells.cell()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def snapshot(self) -> Tuple[List[Tuple[float, float]], float, float]:
+        """
+        Return cumulative bucket counts, the sum and the count of observations
+
+        Returns:
+            Tuple of ([(upper bound, cumulative count), ...], sum, count), with
+            the last bound being infinity
+        """
+        totals = self._cells.totals()
+        cumulative, running = [], 0.0
+        for bound, count in zip(self.buckets + (float('inf'),), totals[:-2]):
+            running += count
+            cumulative.append((bound, running))
+        return cumulative, totals[-2], totals[-1]
+
+
+class _Measurement:
+    """Tracks one execution of a stage, see StageMetrics.measure"""
+
+    __slots__ = ('stage', 'rows_in', 'rows_out', 'bytes', 'started')
+
+    def __init__(self, stage: 'StageMetrics', rows_in: int, nbytes: int, sampled: bool):
+        self.stage = stage
+        self.rows_in = rows_in
+        self.rows_out = 0
+        self.bytes = nbytes
+        self.started = time.perf_counter() if sampled else None
+
+    def __enter__(self) -> '_Measurement':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        stage = self.stage
+        if self.started is not None:
+            stage.latency.observe(time.perf_counter() - self.started)
+        stage.calls.inc()
+        if self.rows_in:
+            stage.rows_in.inc(self.rows_in)
+        if self.rows_out:
+            stage.rows_out.inc(self.rows_out)
+        if self.bytes:
+            stage.bytes.inc(self.bytes)
+        if exc_type is not None:
+            stage.errors.inc()
+        return False
+
+
+class StageMetrics:
+    """
+    Throughput, error and latency metrics of one pipeline stage.
+
+    Latency is timed on every sample_every-th call per thread, so hot stages
+    can be measured without paying for a clock read on every call.
+    """
+
+    def __init__(self, name: str, sample_every: int = 1):
+        """
+        Initialize the stage metrics
+
+        Args:
+            name: Stage name, used as the 'stage' label
+            sample_every: Time one call out of every sample_every
+        """
+        self.name = name
+        self.sample_every = max(1, sample_every)
+        self.calls = Counter(f"{name}_calls", "Calls")
+        self.rows_in = Counter(f"{name}_rows_in", "Rows received")
+        self.rows_out = Counter(f"{name}_rows_out", "Rows produced")
+        self.bytes = Counter(f"{name}_bytes", "Bytes processed")
+        self.errors = Counter(f"{name}_errors", "Failed calls")
+        self.latency = Histogram(f"{name}_latency_seconds", description="Call latency")
+        self._sampling = threading.local()
+
+    def _sampled(self) -> bool:
+        if self.sample_every == 1:
+            return True
+        tick = getattr(self._sampling, 'tick', 0) + 1
+        self._sampling.tick = tick
+        return tick % self.sample_every == 0
+
+    def measure(self, rows_in: int = 0, nbytes: int = 0) -> _Measurement:
+        """
+        Measure one call of the stage
+
+        Use as a context manager and set rows_out (and optionally bytes) on the
+        returned measurement; exceptions are counted as errors and re-raised.
+
+        Args:
+            rows_in: Number of rows received
+            nbytes: Number of bytes received
+        """
+        return _Measurement(self, rows_in, nbytes, self._sampled())
+
+
+class MetricsRegistry:
+    """Holds every stage, counter and gauge exposed by exporters"""
+
+    def __init__(self):
+        self.stages: Dict[str, StageMetrics] = {}
+        self.counters: Dict[str, Counter] = {}
+        self.gauges: Dict[str, Gauge] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str, sample_every: int = 1) -> StageMetrics:
+        """Get or create the metrics of a stage"""
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = StageMetrics(name, sample_every)
+            return self.stages[name]
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Get or create a standalone counter"""
+        with self._lock:
+            if name not in self.counters:
+                self.counters[name] = Counter(name, description)
+            return self.counters[name]
+
+    def gauge(self, name: str, callback: Callable[[], float], description: str = "") -> Gauge:
+        """Register a gauge, replacing any gauge with the same name"""
+        with self._lock:
+            self.gauges[name] = Gauge(name, callback, description)
+            return self.gauges[name]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize every metric
+
+        Returns:
+            Dict mapping stage names (and 'counters'/'gauges') to metric values
+        """
+        summary: Dict[str, Dict[str, float]] = {}
+        for name, stage in list(self.stages.items()):
+            _, latency_sum, latency_count = stage.latency.snapshot()
+            summary[name] = {
+                'calls': stage.calls.value,
+                'rows_in': stage.rows_in.value,
+                'rows_out': stage.rows_out.value,
+                'bytes': stage.bytes.value,
+                'errors': stage.errors.value,
+                'avg_latency_seconds': latency_sum / latency_count if latency_count else 0.0
+            }
+        summary['counters'] = {name: counter.value for name, counter in list(self.counters.items())}
+        summary['gauges'] = {name: gauge.value for name, gauge in list(self.gauges.items())}
+        return summary
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """Return the process-wide metrics registry"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry()
+    return _registry
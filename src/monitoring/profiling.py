@@ -0,0 +1,225 @@
+import os
+import sys
+import time
+import signal
+import functools
+import itertools
+import threading
+import tracemalloc
+from collections import Counter as StackCounter
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingHooks:
+    """
+    Opt-in profiling of hot paths in a running process.
+
+    Functions wrapped with hook() cost one attribute check while profiling is
+    off. While it is on, every sample_every-th call of each hook is profiled:
+    a background thread samples the stacks of threads inside profiled calls
+    and counts them in the folded format read by flamegraph.pl and speedscope.
+    With trace_memory, tracemalloc runs too and a snapshot is written on stop.
+
+    Profiling is toggled with start/stop, SIGUSR1, or by creating and removing
+    a control file.
+    """
+
+    def __init__(self, output_dir: str = 'profiles', sample_every: int = 1,
+                 interval: float = 0.005, trace_memory: bool = False):
+        """
+        Initialize the hooks
+
+        Args:
+            output_dir: Directory profiles are written to
+            sample_every: Profile one call in every sample_every per hook
+            interval: Seconds between stack samples
+            trace_memory: Also record allocations with tracemalloc
+        """
+        self.output_dir = output_dir
+        self.sample_every = max(1, sample_every)
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.active = False
+        self.stacks: StackCounter = StackCounter()
+        self._calls: Dict[str, Any] = {}
+        self._profiled_threads: Dict[int, str] = {}
+        self._sampler: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._started_at: Optional[datetime] = None
+
+    def hook(self, name: str) -> Callable[[Callable], Callable]:
+        """
+        Decorator marking a function as a profiling hook
+
+        Args:
+            name: Hook name, used as the root frame of its stacks
+        """
+        calls = self._calls.setdefault(name, itertools.count(1))
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.active or next(calls) % self.sample_every:
+                    return func(*args, **kwargs)
+                thread_id = threading.get_ident()
+                if thread_id in self._profiled_threads:
+                    # Already inside a profiled call, the outer hook owns this stack
+                    return func(*args, **kwargs)
+                self._profiled_threads[thread_id] = name
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._profiled_threads.pop(thread_id, None)
+            return wrapper
+        return decorator
+
+    def _sample(self) -> None:
+        """Count the stacks of threads currently inside profiled calls"""
+        own_id = threading.get_ident()
+        while self.active:
+            frames = sys._current_frames()
+            for thread_id, name in list(self._profiled_threads.items()):
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(name)
+                self.stacks[';'.join(reversed(stack))] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start profiling hooked calls"""
+        with self._lock:
+            if self.active:
+                return
+            self.stacks = StackCounter()
+            self._started_at = datetime.now()
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+            self.active = True
+            self._sampler = threading.Thread(target=self._sample, name='profiling-sampler', daemon=True)
+            self._sampler.start()
+        logger.info(f"Profiling started (every {self.sample_every} call(s) per hook)")
+
+    def stop(self) -> Optional[str]:
+        """
+        Stop profiling and write the collected profile
+
+        Returns:
+            Path of the folded stack file, or None if profiling was not running
+        """
+        with self._lock:
+            if not self.active:
+                return None
+            self.active = False
+            self._sampler.join()
+            os.makedirs(self.output_dir, exist_ok=True)
+            prefix = os.path.join(self.output_dir, f"profile-{self._started_at.strftime('%Y%m%d-%H%M%S')}")
+
+            folded_path = f"{prefix}.folded"
+            with open(folded_path, 'w', encoding='utf-8') as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+            if tracemalloc.is_tracing():
+                self._write_memory_snapshot(prefix)
+                tracemalloc.stop()
+
+        logger.info(f"Profiling stopped, {sum(self.stacks.values())} samples written to {folded_path}")
+        return folded_path
+
+    @staticmethod
+    def _write_memory_snapshot(prefix: str) -> None:
+        """Write a tracemalloc snapshot, its top allocation sites and allocation stacks in folded format"""
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        ])
+        snapshot.dump(f"{prefix}.tracemalloc")
+
+        with open(f"{prefix}.memory.txt", 'w', encoding='utf-8') as f:
+            for stat in snapshot.statistics('lineno')[:50]:
+                f.write(f"{stat}\n")
+
+        # Folded allocation stacks weighted by live bytes, for memory flame graphs
+        with open(f"{prefix}.memory.folded", 'w', encoding='utf-8') as f:
+            for stat in snapshot.statistics('traceback'):
+                stack = ';'.join(
+                    f"{os.path.basename(frame.filename)}:{frame.lineno}"
+                    for frame in reversed(stat.traceback)
+                )
+                f.write(f"{stack} {stat.size}\n")
+
+    def toggle(self) -> None:
+        """Start profiling if it is off, stop it otherwise"""
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+    def install_signal_handler(self, signum: int = getattr(signal, 'SIGUSR1', 0)) -> bool:
+        """
+        Toggle profiling when the process receives a signal (SIGUSR1 by default)
+
+        Only possible from the main thread on platforms with SIGUSR1.
+
+        Returns:
+            True if the handler was installed
+        """
+        if not signum or threading.current_thread() is not threading.main_thread():
+            return False
+        # Stopping joins the sampler and writes files, so do it off the signal handler
+        signal.signal(signum, lambda *_: threading.Thread(target=self.toggle, daemon=True).start())
+        logger.info(f"Send signal {signum} to pid {os.getpid()} to toggle profiling")
+        return True
+
+    def watch_control_file(self, path: str, poll_interval: float = 1.0) -> threading.Thread:
+        """
+        Profile while a control file exists
+
+        Args:
+            path: Control file; creating it starts profiling, removing it stops and writes the profile
+            poll_interval: Seconds between checks
+
+        Returns:
+            The daemon thread polling the file
+        """
+        def poll():
+            while True:
+                exists = os.path.exists(path)
+                if exists and not self.active:
+                    self.start()
+                elif not exists and self.active:
+                    self.stop()
+                time.sleep(poll_interval)
+
+        thread = threading.Thread(target=poll, name='profiling-control-file', daemon=True)
+        thread.start()
+        logger.info(f"Create {path} to start profiling, remove it to stop")
+        return thread
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# Process-wide hooks, configured from the environment
+profiler = ProfilingHooks(
+    output_dir=os.getenv('PROFILE_DIR', 'profiles'),
+    sample_every=_env_int('PROFILE_SAMPLE_EVERY', 1),
+    trace_memory=os.getenv('PROFILE_TRACE_MEMORY', '0') == '1'
+)
+
+profile_hook = profiler.hook
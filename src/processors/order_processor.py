@@ -1,68 +1,107 @@
 from src.etl.extractor import ShopifyDataExtractor
 from src.etl.loader import ShopifyDataLoader
 from src.etl.transformer import ShopifyDataTransformer
+from src.etl.watermarks import WatermarkStore, latest_update
 from src.interfaces.event_processor import EventProcessor
-from typing import Dict, Any
+from src.interfaces.event_queue import FILE_EVENT_KEY
+from src.monitoring.metrics import get_registry
+from pathlib import Path
+from typing import Dict, Any, Optional
 import logging
 import traceback
 
 logger = logging.getLogger(__name__)
 
+PROCESS_METRICS = get_registry().stage('process_event')
+
 class OrderEventProcessor(EventProcessor):
-    def __init__(self, extractor: ShopifyDataExtractor, transformer: ShopifyDataTransformer, loader: ShopifyDataLoader):
+    def __init__(self, extractor: ShopifyDataExtractor, transformer: ShopifyDataTransformer, loader: ShopifyDataLoader,
+                 watermarks: Optional[WatermarkStore] = None):
         self.extractor = extractor
         self.transformer = transformer
         self.loader = loader
+        self.watermarks = watermarks
+
+    def _process_file_event(self, event: Dict[str, Any]) -> None:
+        """Parse, extract, transform and load the order file an event refers to"""
+        with PROCESS_METRICS.measure(nbytes=event.get('size', 0)) as measurement:
+            file_path = Path(event[FILE_EVENT_KEY])
+            logger.info(f"Processing order file {file_path}")
+            source = mark = None
+            if self.watermarks is not None:
+                source = self.watermarks.source_of(file_path)
+                mark = self.watermarks.get(source)
+            # One streaming parse straight into records; the file was not parsed before queuing
+            records = self.extractor.extract_file(file_path, updated_after=mark)
+            measurement.rows_in = len(records)
+            if not records:
+                return
+
+            transformed_orders, transformed_items = self.transformer.transform_orders(records)
+            if transformed_orders:
+                logger.info(f"Loading {len(transformed_orders)} orders and {len(transformed_items)} items")
+                self.loader.load_data(transformed_orders, transformed_items)
+                measurement.rows_out = len(transformed_orders)
+                logger.info(f"Successfully processed {len(transformed_orders)} orders from {file_path}")
+                if source is not None:
+                    self.watermarks.advance({source: latest_update(records)})
 
     def process_event(self, event: Dict[str, Any]) -> None:
         try:
-            logger.info(f"Processing batch of orders")
             # Validate event structure
             if not isinstance(event, dict):
                 raise ValueError(f"Expected dict, got {type(event)}")
+
+            if FILE_EVENT_KEY in event:
+                self._process_file_event(event)
+                return
+
+            with PROCESS_METRICS.measure() as measurement:
+                logger.info(f"Processing batch of orders")
+                if 'orders' not in event:
+                    raise ValueError("No 'orders' key found in event")
             
-            if 'orders' not in event:
-                raise ValueError("No 'orders' key found in event")
-            
-            orders = event['orders']
-            if not isinstance(orders, list):
-                raise ValueError(f"Expected list of orders, got {type(orders)}")
+                orders = event['orders']
+                if not isinstance(orders, list):
+                    raise ValueError(f"Expected list of orders, got {type(orders)}")
+                measurement.rows_in = len(orders)
             
-            # Extract all orders
-            extracted_orders = []
-            extracted_items = []
+                # Extract all orders
+                extracted_orders = []
+                extracted_items = []
             
-            for order in orders:
-                try:
-                    if not isinstance(order, dict):
-                        logger.error(f"Invalid order format")
-                        continue
+                for order in orders:
+                    try:
+                        if not isinstance(order, dict):
+                            logger.error(f"Invalid order format")
+                            continue
                         
-                    if 'id' not in order:
-                        logger.error(f"Order missing ID")
-                        continue
+                        if 'id' not in order:
+                            logger.error(f"Order missing ID")
+                            continue
                     
-                    # Extract order
-                    extracted_order = self.extractor.extract_order(order)
-                    extracted_orders.append(extracted_order)
+                        # Extract order
+                        extracted_order = self.extractor.extract_record(order)
+                        extracted_orders.append(extracted_order)
                     
-                    # Extract items
-                    items = self.transformer.transform_order_items(extracted_order)
-                    extracted_items.extend(items)
+                        # Extract items
+                        items = self.transformer.transform_order_items(extracted_order)
+                        extracted_items.extend(items)
                     
-                except Exception as e:
-                    logger.error(f"Error processing order {order.get('id', 'unknown')}: {str(e)}")
-                    logger.error(f"Stack trace: {traceback.format_exc()}")
-                    continue
+                    except Exception as e:
+                        logger.error(f"Error processing order {order.get('id', 'unknown')}: {str(e)}")
+                        logger.error(f"Stack trace: {traceback.format_exc()}")
+                        continue
             
-            # Transform all orders at once
-            transformed_orders = [self.transformer.transform_order(order) for order in extracted_orders]
+                # Transform all orders at once
+                transformed_orders = [self.transformer.transform_order(order) for order in extracted_orders]
             
-            # Load all data at once
-            if transformed_orders:
-                logger.info(f"Loading {len(transformed_orders)} orders and {len(extracted_items)} items")
-                self.loader.load_data(transformed_orders, extracted_items)
-                logger.info(f"Successfully processed batch of {len(transformed_orders)} orders")
+                # Load all data at once
+                if transformed_orders:
+                    logger.info(f"Loading {len(transformed_orders)} orders and {len(extracted_items)} items")
+                    self.loader.load_data(transformed_orders, extracted_items)
+                    measurement.rows_out = len(transformed_orders)
+                    logger.info(f"Successfully processed batch of {len(transformed_orders)} orders")
             
         except Exception as e:
             logger.error(f"Error processing batch: {str(e)}")
@@ -83,7 +122,7 @@ class OrderEventProcessor(EventProcessor):
 
             # Extract order
             logger.info(f"Extracting order {order_id}")
-            extracted_order = self.extractor.extract_order(order)
+            extracted_order = self.extractor.extract_record(order)
 
             # Transform order
             logger.info(f"Transforming order {order_id}")
@@ -3,6 +3,7 @@ from threading import Thread
 import logging
 from typing import Dict, Any, Callable, List
 from src.interfaces.event_queue import EventQueue
+from src.monitoring.metrics import get_registry
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +13,9 @@ class InMemoryEventQueue(EventQueue):
         self.processors: List[Callable[[Dict[str, Any]], None]] = []
         self.running = False
         self.worker_thread = None
+        registry = get_registry()
+        registry.gauge('event_queue_depth', self.queue.qsize, 'Events waiting in the queue')
+        self.dropped_events = registry.counter('event_queue_dropped', 'Events dropped because the queue was full')
 
     def add_processor(self, processor: Callable[[Dict[str, Any]], None]):
         self.processors.append(processor)
@@ -34,6 +38,7 @@ class InMemoryEventQueue(EventQueue):
             logger.debug(f"Added event to queue with {len(event.get('orders', []))} orders")
         except Full:
             logger.warning("Event queue is full, dropping event")
+            self.dropped_events.inc()
 
     def _process_events(self):
         while self.running:
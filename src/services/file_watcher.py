@@ -1,7 +1,10 @@
 import json
+import threading
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileCreatedEvent
+from watchdog.events import FileSystemEventHandler, FileCreatedEvent, FileModifiedEvent
+from src.interfaces.event_queue import FILE_EVENT_KEY
 from src.interfaces.file_watcher import FileWatcher
+from src.utils.order_files import detect_codec, is_complete, is_ndjson, is_order_file, iter_ndjson, iter_orders
 import logging
 import traceback
 from typing import Callable, Dict, Any, Set
@@ -11,44 +14,125 @@ import time
 logger = logging.getLogger(__name__)
 
 class ShopifyFileHandler(FileSystemEventHandler):
-    def __init__(self, callback: Callable[[Dict[str, Any]], None]):
+    def __init__(self, callback: Callable[[Dict[str, Any]], None], file_refs: bool = False,
+                 settle_delay: float = 0.5, warn_after_checks: int = 20):
+        """
+        Initialize the handler
+
+        Args:
+            callback: Receives one event per new order file
+            file_refs: Pass {'file': path, 'size': bytes} events once the file
+                is completely written, leaving parsing to the event processor,
+                instead of parsing the file here and passing its orders
+            settle_delay: Seconds between size checks of a referenced file
+            warn_after_checks: Checks after which a file still being written is logged
+        """
         self.callback = callback
+        self.file_refs = file_refs
+        self.settle_delay = settle_delay
+        self.warn_after_checks = warn_after_checks
         self.processed_files: Set[str] = set()
+        # Files being checked, and the size each referenced file was queued at
+        self.pending_files: Set[str] = set()
+        self.queued_sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _read_ndjson(self, file_path: str) -> Dict[str, Any]:
+        """Read an NDJSON file into the same event shape as a JSON order file"""
+        with open(file_path, 'rb') as f:
+            f.seek(-1, 2)
+            # A last line without its newline is still being written
+            if f.read(1) != b'\n':
+                raise json.JSONDecodeError("Incomplete last line", file_path, f.tell())
+        return {'orders': list(iter_ndjson(file_path))}
+
+    def _read_orders(self, file_path: str) -> Dict[str, Any]:
+        """
+        Parse an order file in one streaming pass
+
+        Plain files are parsed straight from a memory map and compressed ones
+        as they decompress; the file is never read or decoded as a whole.
+        """
+        if is_ndjson(file_path) and not detect_codec(file_path):
+            return self._read_ndjson(file_path)
+        try:
+            return {'orders': list(iter_orders(file_path))}
+        except (EOFError, ValueError) as e:
+            # Documents cut short, mid-frame, mid-line or mid-order, are still being written
+            raise json.JSONDecodeError(f"Truncated order file: {str(e)}", file_path, 0)
+
+    def _reference_file(self, file_path: str) -> None:
+        """Check a file until it is written, on timer threads so the observer thread never waits"""
+        with self._lock:
+            if file_path in self.pending_files:
+                return
+            self.pending_files.add(file_path)
+        self._schedule_check(file_path, -1, 0)
+
+    def _schedule_check(self, file_path: str, size: int, checks: int) -> None:
+        timer = threading.Timer(self.settle_delay, self._check_file, args=(file_path, size, checks))
+        timer.daemon = True
+        timer.start()
+
+    def _check_file(self, file_path: str, size: int, checks: int) -> None:
+        """
+        Pass a reference to a file once its size has stopped changing and it is complete
+
+        A writer can pause mid-file, so a plain file must also end with a
+        whole line or document. Compressed files are not decompressed here;
+        one cut short fails the worker's parse and is queued again when its
+        writer resumes, see on_modified. Files are checked until they are done.
+        """
+        path = Path(file_path)
+        try:
+            current = path.stat().st_size
+        except FileNotFoundError:
+            with self._lock:
+                self.pending_files.discard(file_path)
+            logger.warning(f"Order file {file_path} was removed before it was completely written")
+            return
+
+        if current and current == size and is_complete(path):
+            with self._lock:
+                self.pending_files.discard(file_path)
+                self.queued_sizes[file_path] = current
+            self.callback({FILE_EVENT_KEY: str(path), 'size': current})
+            self.processed_files.add(file_path)
+            logger.info(f"Queued order file: {file_path}")
+            return
+
+        checks += 1
+        if checks == self.warn_after_checks:
+            logger.warning(f"Order file {file_path} is still being written after {checks} checks, waiting for it")
+        self._schedule_check(file_path, current, checks)
 
     def _process_file(self, file_path: str):
         if file_path in self.processed_files:
             return
 
+        if self.file_refs:
+            self._reference_file(file_path)
+            return
+
         # Wait for file to be fully written
         max_retries = 3
         retry_delay = 1  # seconds
         
         for attempt in range(max_retries):
             try:
-                if not Path(file_path).exists():
+                path = Path(file_path)
+                if not path.exists() or path.stat().st_size == 0:
                     time.sleep(retry_delay)
                     continue
                     
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if not content:
-                        time.sleep(retry_delay)
-                        continue
-                        
-                    data = json.loads(content)
-                    if not isinstance(data, dict):
-                        raise ValueError(f"Expected dict, got {type(data)}")
-                    
-                    if 'orders' not in data:
-                        logger.warning(f"No 'orders' key found in {file_path}")
-                        return
-                    
-                    if not isinstance(data['orders'], list):
-                        raise ValueError(f"Expected list of orders, got {type(data['orders'])}")
-                    
-                    # Process all orders at once
-                    logger.info(f"Processing {len(data['orders'])} orders from {file_path}")
-                    self.callback(data)  # Pass the entire data object
+                data = self._read_orders(file_path)
+                if not data['orders']:
+                    logger.warning(f"No orders found in {file_path}")
+                    return
+                
+                # Process all orders at once
+                logger.info(f"Processing {len(data['orders'])} orders from {file_path}")
+                self.callback(data)  # Pass the entire data object
                     
                 self.processed_files.add(file_path)
                 logger.info(f"Successfully processed file: {file_path}")
@@ -63,19 +147,45 @@ class ShopifyFileHandler(FileSystemEventHandler):
     def on_created(self, event: FileCreatedEvent):
         if event.is_directory:
             return
-        if not event.src_path.endswith('.json'):
+        if not is_order_file(event.src_path):
             return
         logger.info(f"New file detected: {event.src_path}")
         self._process_file(event.src_path)
 
+    def on_modified(self, event: FileModifiedEvent):
+        """Reference a queued file again once it settles, if it grew or shrank since it was queued"""
+        if not self.file_refs or event.is_directory or not is_order_file(event.src_path):
+            return
+        file_path = event.src_path
+        try:
+            current = Path(file_path).stat().st_size
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self.queued_sizes.get(file_path, current) == current:
+                return
+            del self.queued_sizes[file_path]
+        logger.info(f"Order file {file_path} changed after it was queued, queuing it again once written")
+        self.processed_files.discard(file_path)
+        self._reference_file(file_path)
+
 class FileWatcherService(FileWatcher):
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, file_refs: bool = False):
+        """
+        Initialize the watcher
+
+        Args:
+            data_dir: Directory to watch for order files
+            file_refs: Queue file references for the event processor to
+                parse, instead of parsed orders, see ShopifyFileHandler
+        """
         self.data_dir = Path(data_dir)
+        self.file_refs = file_refs
         self.observer = Observer()
         self.handler = None
 
     def start(self, callback: Callable):
-        self.handler = ShopifyFileHandler(callback)
+        self.handler = ShopifyFileHandler(callback, self.file_refs)
         self.observer.schedule(self.handler, str(self.data_dir), recursive=False)
         self.observer.start()
         logger.info(f"Started watching directory: {self.data_dir}")
@@ -1,14 +1,42 @@
+import gc
+import os
+import sys
 import random
-import json
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 import uuid
+import numpy as np
 from faker import Faker
+try:
+    from . import json_backend
+    from .order_files import JSON_SUFFIX, NDJSON_SUFFIX, write_ndjson
+except ImportError:
+    # Run as a script, python src/utils/data_generator.py, outside the src package
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.utils import json_backend
+    from src.utils.order_files import JSON_SUFFIX, NDJSON_SUFFIX, write_ndjson
 
 fake = Faker()
 
+# Upper bound of line items per order, used to size ID blocks
+MAX_LINE_ITEMS = 5
+
 class ShopifyOrderGenerator:
-    def __init__(self):
+    def __init__(self, first_id: Optional[int] = None):
+        """
+        Initialize the generator
+
+        Args:
+            first_id: First ID to allocate; customers, orders, line items and
+                shipping lines get consecutive IDs from it, so they never
+                collide within a run. A random 9-digit start if omitted.
+        """
+        if first_id is None:
+            first_id = random.randint(100000000, 899999999)
+        self._next_id = itertools.count(first_id).__next__
         self.products = [
             # Electronics
             {"id": 632910392, "title": "iPhone 14 Pro", "variants": [
@@ -368,7 +396,7 @@ class ShopifyOrderGenerator:
         last_name = fake.last_name()
         created_at = fake.date_time_between(start_date="-1y", end_date="now")
         return {
-            "id": random.randint(100000000, 999999999),
+            "id": self._next_id(),
             "email": f"{first_name.lower()}.{last_name.lower()}@example.com",
             "created_at": created_at.isoformat(),
             "updated_at": created_at.isoformat(),
@@ -424,7 +452,7 @@ class ShopifyOrderGenerator:
         tax_amount = round(taxable_amount * 0.06, 2)  # 6% tax rate
         
         return {
-            "id": random.randint(100000000, 999999999),
+            "id": self._next_id(),
             "order_id": order_id,
             "name": f"{product['title']} - {variant['title']}",
             "price": str(round(price, 2)),
@@ -455,8 +483,8 @@ class ShopifyOrderGenerator:
 
     def _generate_order(self, customer: Dict[str, Any], order_date: datetime) -> Dict[str, Any]:
         """Generate an order for a specific customer"""
-        order_id = random.randint(100000000, 999999999)
-        num_items = random.randint(1, 5)
+        order_id = self._next_id()
+        num_items = random.randint(1, MAX_LINE_ITEMS)
         
         line_items = [self._generate_line_item(order_id, customer["segment"]) for _ in range(num_items)]
         total_price = sum(float(item["price"]) * item["quantity"] for item in line_items)
@@ -465,7 +493,7 @@ class ShopifyOrderGenerator:
         
         # Generate shipping line
         shipping_line = {
-            "id": random.randint(100000000, 999999999),
+            "id": self._next_id(),
             "title": random.choice(["Standard Shipping", "Express Shipping", "Free Shipping"]),
             "price": "0.00",
             "code": "Standard",
@@ -574,16 +602,472 @@ class ShopifyOrderGenerator:
 
     def save_to_json(self, orders: List[Dict[str, Any]], filepath: str) -> None:
         """Save generated orders to a JSON file"""
-        with open(filepath, 'w') as f:
-            json.dump({"orders": orders}, f, indent=2)
+        with open(filepath, 'wb') as f:
+            f.write(json_backend.dumps({"orders": orders}, indent=True))
+
+    def save_to_ndjson(self, orders: Iterable[Dict[str, Any]], filepath: str) -> int:
+        """Stream orders to an NDJSON file, one per line, and return how many were written"""
+        return write_ndjson(orders, filepath)
+
+class VectorizedOrderGenerator(ShopifyOrderGenerator):
+    """
+    High-volume order generator.
+
+    IDs, dates, prices, quantities and segments are drawn as NumPy arrays one
+    chunk at a time, and names, addresses, phone numbers and notes are sampled
+    from pools built with Faker once. Each chunk covers its share of the
+    year, so chunks come out in creation order without a global sort and
+    memory is bounded by the chunk size plus a few bytes per customer.
+
+    Pooled address dicts are shared between orders and must not be mutated.
+    """
+
+    SEGMENT_WEIGHTS = (0.2, 0.5, 0.3)
+    TAX_RATE = 0.06
+    # Returning customers pick from 'fulfilled'/'partial', new ones from None/'fulfilled'/'unfulfilled'
+    FULFILLMENT_STATUSES = (None, "fulfilled", "unfulfilled", "partial")
+    SHIPPING_TITLES = ("Standard Shipping", "Express Shipping", "Free Shipping")
+
+    def __init__(self, seed: Optional[int] = None, pool_size: int = 1000, first_id: int = 100000000,
+                 end_date: Optional[datetime] = None):
+        """
+        Initialize the generator
+
+        Args:
+            seed: Seed for NumPy and Faker, for reproducible datasets
+            pool_size: Number of pooled names, phone numbers and addresses
+            first_id: First ID; orders, line items and customers are each numbered from it, so
+                n orders use IDs below first_id + n * MAX_LINE_ITEMS
+            end_date: End of the year orders are spread over, now if omitted
+        """
+        super().__init__(first_id)
+        self.rng = np.random.default_rng(seed)
+        self.fake = Faker()
+        if seed is not None:
+            self.fake.seed_instance(seed)
+        self.pool_size = pool_size
+        self.first_id = first_id
+        self.end_date = end_date
+        self._pools: Optional[Dict[str, List[Any]]] = None
+
+        # Variants flattened into arrays, with each product's slice of them
+        self._variants = [(product, variant) for product in self.products for variant in product["variants"]]
+        self._variant_count = np.array([len(product["variants"]) for product in self.products])
+        self._variant_start = np.concatenate(([0], np.cumsum(self._variant_count)[:-1]))
+
+        segments = list(self.customer_segments.values())
+        self._segment_names = list(self.customer_segments)
+        self._segment_min_value = np.array([segment["avg_order_value"][0] for segment in segments], dtype=float)
+        self._segment_max_value = np.array([segment["avg_order_value"][1] for segment in segments], dtype=float)
+        self._segment_discount_usage = np.array([segment["discount_usage"] for segment in segments])
+        self._segment_frequency = np.array([sum(segment["order_frequency"]) / 2 for segment in segments])
+
+    def _build_pools(self) -> Dict[str, List[Any]]:
+        """Generate the Faker values orders are sampled from"""
+        fake = self.fake
+        addresses = [
+            {
+                "first_name": fake.first_name(),
+                "last_name": fake.last_name(),
+                "address1": fake.street_address(),
+                "address2": fake.random.choice(["", fake.secondary_address()]),
+                "city": fake.city(),
+                "province": fake.state(),
+                "country": "United States",
+                "zip": fake.zipcode(),
+                "phone": fake.phone_number(),
+                "company": fake.random.choice([None, fake.company()]),
+                "latitude": float(fake.latitude()),
+                "longitude": float(fake.longitude()),
+                "name": fake.name(),
+                "country_code": "US",
+                "province_code": fake.state_abbr()
+            }
+            for _ in range(self.pool_size)
+        ]
+        return {
+            "first_names": [fake.first_name() for _ in range(self.pool_size)],
+            "last_names": [fake.last_name() for _ in range(self.pool_size)],
+            "phones": [fake.phone_number() for _ in range(self.pool_size)],
+            "addresses": addresses,
+            "notes": [fake.text(max_nb_chars=200) for _ in range(max(1, self.pool_size // 10))]
+        }
+
+    def _generate_customers(self, num_customers: int, end: np.datetime64) -> Dict[str, np.ndarray]:
+        """Draw customer segments, names and signup dates, and the cumulative weights orders pick customers by"""
+        rng = self.rng
+        segment = rng.choice(len(self._segment_names), size=num_customers, p=self.SEGMENT_WEIGHTS).astype(np.int8)
+        weights = np.cumsum(self._segment_frequency[segment])
+        return {
+            "segment": segment,
+            "first_name": rng.integers(0, self.pool_size, num_customers, dtype=np.int32),
+            "last_name": rng.integers(0, self.pool_size, num_customers, dtype=np.int32),
+            "phone": rng.integers(0, self.pool_size, num_customers, dtype=np.int32),
+            "created_at": end - rng.integers(0, 365 * 86400, num_customers).astype("timedelta64[s]"),
+            "cdf": weights / weights[-1]
+        }
+
+    def generate_order_chunks(self, num_orders: int, chunk_size: int = 20000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Generate orders over the last year in chunks, oldest first
+
+        Customers are drawn by segment, weighted by their order frequency, and
+        an order is tagged as returning when its customer ordered before.
+
+        Args:
+            num_orders: Total number of orders
+            chunk_size: Orders per chunk
+
+        Yields:
+            Lists of order dicts in the ShopifyOrderGenerator format
+        """
+        if self._pools is None:
+            self._pools = self._build_pools()
+        end = np.datetime64((self.end_date or datetime.now()).replace(microsecond=0, tzinfo=None), "s")
+        start = end - np.timedelta64(365, "D")
+        span = 365 * 86400
+
+        customers = self._generate_customers(max(1, int(num_orders * 0.4)), end)
+        seen = np.zeros(len(customers["segment"]), dtype=bool)
+        next_item_id = self.first_id
+
+        for chunk_start in range(0, num_orders, chunk_size):
+            size = min(chunk_size, num_orders - chunk_start)
+            window_start = span * chunk_start // num_orders
+            window_end = max(window_start + 1, span * (chunk_start + size) // num_orders)
+            created_at = start + np.sort(self.rng.integers(window_start, window_end, size)).astype("timedelta64[s]")
+            # A chunk allocates millions of dicts and no cycles, so skip the collections they would trigger
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                orders = self._generate_chunk(customers, seen, created_at, self.first_id + chunk_start, next_item_id)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            next_item_id += sum(len(order["line_items"]) for order in orders)
+            yield orders
+
+    def _generate_chunk(self, customers: Dict[str, np.ndarray], seen: np.ndarray, created_at: np.ndarray,
+                        first_order_id: int, first_item_id: int) -> List[Dict[str, Any]]:
+        """Generate the orders created at the given sorted times"""
+        rng = self.rng
+        pools = self._pools
+        size = len(created_at)
+
+        customer = np.searchsorted(customers["cdf"], rng.random(size), side="right")
+        np.minimum(customer, len(seen) - 1, out=customer)
+        segment = customers["segment"][customer]
+        first_in_chunk = np.zeros(size, dtype=bool)
+        first_in_chunk[np.unique(customer, return_index=True)[1]] = True
+        returning = seen[customer] | ~first_in_chunk
+        seen[customer] = True
+
+        # Line items, with each order's items contiguous
+        num_items = rng.integers(1, MAX_LINE_ITEMS + 1, size)
+        item_order = np.repeat(np.arange(size), num_items)
+        num_line_items = len(item_order)
+        product = rng.integers(0, len(self.products), num_line_items)
+        variant = self._variant_start[product] + (rng.random(num_line_items) * self._variant_count[product]).astype(np.int64)
+        quantity = rng.integers(1, 4, num_line_items)
+        item_segment = segment[item_order]
+        price = np.round(rng.uniform(self._segment_min_value[item_segment], self._segment_max_value[item_segment]), 2)
+        discounted = rng.random(num_line_items) < self._segment_discount_usage[item_segment]
+        item_discount = np.where(discounted, np.round(price * quantity * rng.uniform(0.1, 0.3, num_line_items), 2), 0.0)
+        item_tax = np.round((price * quantity - item_discount) * self.TAX_RATE, 2)
+
+        starts = np.concatenate(([0], np.cumsum(num_items)[:-1]))
+        subtotal = np.add.reduceat(price * quantity, starts)
+        total_discount = np.round(np.add.reduceat(item_discount, starts), 2)
+        total_tax = np.round(subtotal * self.TAX_RATE, 2)
+        total_price = np.round(subtotal - total_discount + total_tax, 2)
+
+        financial_status = np.where(returning, 0, rng.integers(0, 2, size))
+        fulfillment_status = np.where(returning, np.array([1, 3])[rng.integers(0, 2, size)], rng.integers(0, 3, size))
+        discount_code = np.where(rng.random(size) < self._segment_discount_usage[segment],
+                                 rng.integers(0, len(self.discount_codes), size), -1)
+        note = np.where(rng.random(size) < 0.5, rng.integers(0, len(pools["notes"]), size), -1)
+        addresses = rng.integers(0, self.pool_size, (2, size))
+        updated_at = created_at + rng.integers(1, 6, size).astype("timedelta64[D]")
+
+        order_ids = range(first_order_id, first_order_id + size)
+        line_items = [
+            self._line_item(item_id, order_id, self._variants[variant_index], qty, item_price, discount, tax)
+            for item_id, order_id, variant_index, qty, item_price, discount, tax in zip(
+                range(first_item_id, first_item_id + num_line_items),
+                (first_order_id + item_order).tolist(), variant.tolist(), quantity.tolist(),
+                price.tolist(), item_discount.tolist(), item_tax.tolist()
+            )
+        ]
+
+        first_names, last_names, phones = pools["first_names"], pools["last_names"], pools["phones"]
+        customer_created_at = np.datetime_as_string(customers["created_at"][customer], unit="s").tolist()
+        columns = zip(
+            order_ids, customer.tolist(), segment.tolist(), returning.tolist(),
+            customers["first_name"][customer].tolist(), customers["last_name"][customer].tolist(),
+            customers["phone"][customer].tolist(), customer_created_at,
+            np.datetime_as_string(created_at, unit="s").tolist(), np.datetime_as_string(updated_at, unit="s").tolist(),
+            starts.tolist(), num_items.tolist(), subtotal.tolist(), total_discount.tolist(), total_tax.tolist(),
+            total_price.tolist(), financial_status.tolist(), fulfillment_status.tolist(), discount_code.tolist(),
+            note.tolist(), addresses[0].tolist(), addresses[1].tolist(), rng.integers(1000, 10000, size).tolist(),
+            rng.integers(0, len(self.SHIPPING_TITLES), size).tolist()
+        )
+
+        orders = []
+        for (order_id, customer_index, segment_index, is_returning, first_name, last_name, phone, customer_created,
+             created, updated, item_start, item_count, order_subtotal, order_discount, order_tax, order_total,
+             financial, fulfillment, code, note_index, billing, shipping, order_number,
+             shipping_title) in columns:
+            first_name, last_name = first_names[first_name], last_names[last_name]
+            email = f"{first_name.lower()}.{last_name.lower()}@example.com"
+            customer_id = self.first_id + customer_index
+            orders.append({
+                "id": order_id,
+                "name": f"#{order_number}",
+                "email": email,
+                "created_at": created,
+                "updated_at": updated,
+                "processed_at": created,
+                "total_price": str(order_total),
+                "subtotal_price": str(round(order_subtotal, 2)),
+                "total_tax": str(order_tax),
+                "total_discounts": str(order_discount),
+                "currency": "USD",
+                "financial_status": "paid" if financial == 0 else "pending",
+                "fulfillment_status": self.FULFILLMENT_STATUSES[fulfillment],
+                "customer_id": customer_id,
+                "customer_email": email,
+                "customer_first_name": first_name,
+                "customer_last_name": last_name,
+                "customer_phone": phones[phone],
+                "billing_address": pools["addresses"][billing],
+                "shipping_address": pools["addresses"][shipping],
+                "note": pools["notes"][note_index] if note_index >= 0 else None,
+                "tags": "Returning Customer" if is_returning else "New Customer",
+                "line_items": line_items[item_start:item_start + item_count],
+                "customer": {
+                    "id": customer_id,
+                    "email": email,
+                    "created_at": customer_created,
+                    "updated_at": customer_created,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "state": "enabled",
+                    "verified_email": True,
+                    "tax_exempt": False,
+                    "phone": phones[phone],
+                    "tags": "",
+                    "currency": "USD",
+                    "segment": self._segment_names[segment_index]
+                },
+                "shipping_lines": [{
+                    "id": order_id,  # one shipping line per order
+                    "title": self.SHIPPING_TITLES[shipping_title],
+                    "price": "0.00",
+                    "code": "Standard",
+                    "source": "shopify",
+                    "carrier_identifier": None,
+                    "requested_fulfillment_service_id": None,
+                    "discount_allocations": [],
+                    "tax_lines": []
+                }],
+                "tax_lines": [self._tax_line(order_tax)],
+                "discount_codes": [self.discount_codes[code]] if code >= 0 else []
+            })
+        return orders
+
+    def _line_item(self, item_id: int, order_id: int, variant: tuple, quantity: int, price: float,
+                   total_discount: float, tax: float) -> Dict[str, Any]:
+        product, variant = variant
+        return {
+            "id": item_id,
+            "order_id": order_id,
+            "name": f"{product['title']} - {variant['title']}",
+            "price": str(price),
+            "quantity": quantity,
+            "sku": variant["sku"],
+            "title": product["title"],
+            "variant_id": variant["id"],
+            "product_id": product["id"],
+            "total_discount": str(total_discount),
+            "tax_lines": [self._tax_line(tax)]
+        }
+
+    def _tax_line(self, amount: float) -> Dict[str, Any]:
+        amount = str(amount)
+        return {
+            "price": amount,
+            "rate": self.TAX_RATE,
+            "title": "State Tax",
+            "price_set": {
+                "shop_money": {"amount": amount, "currency_code": "USD"},
+                "presentment_money": {"amount": amount, "currency_code": "USD"}
+            }
+        }
+
+    def generate_orders(self, num_orders: int) -> List[Dict[str, Any]]:
+        """Generate exactly num_orders orders, sorted by creation date"""
+        return [order for chunk in self.generate_order_chunks(num_orders) for order in chunk]
+
+    def save_chunks_to_json(self, num_orders: int, output_dir: str, chunk_size: int = 20000,
+                            prefix: str = "generated_orders", ndjson: bool = False) -> List[str]:
+        """
+        Generate orders and write each chunk to its own JSON file
+
+        Files stay small enough for the extractor to load one at a time.
+
+        Args:
+            num_orders: Total number of orders
+            output_dir: Directory to write the files to
+            chunk_size: Orders per file
+            prefix: File name prefix, followed by the chunk number
+            ndjson: Write .ndjson files, one order per line
+
+        Returns:
+            Paths of the written files
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        dumps = json_backend.dumps
+        suffix = NDJSON_SUFFIX if ndjson else JSON_SUFFIX
+        paths = []
+        for index, orders in enumerate(self.generate_order_chunks(num_orders, chunk_size)):
+            path = os.path.join(output_dir, f"{prefix}_{index:05d}{suffix}")
+            if ndjson:
+                write_ndjson(orders, path)
+                paths.append(path)
+                continue
+            # Encode order by order so the file never exists as one string in memory
+            with open(path, 'wb') as f:
+                f.write(b'{"orders":[')
+                for position, order in enumerate(orders):
+                    if position:
+                        f.write(b',')
+                    f.write(dumps(order))
+                f.write(b']}')
+            paths.append(path)
+        return paths
+
+    def save_to_ndjson_stream(self, num_orders: int, filepath: str, chunk_size: int = 20000) -> int:
+        """
+        Generate orders straight into one NDJSON file
+
+        Chunks are written as they are generated, so memory stays bounded by
+        the chunk size however large the file gets.
+
+        Returns:
+            Number of orders written
+        """
+        chunks = self.generate_order_chunks(num_orders, chunk_size)
+        return write_ndjson((order for chunk in chunks for order in chunk), filepath)
+
+def _generate_shard(seed: int, first_id: int, end_date: datetime, num_orders: int, output_dir: str,
+                    chunk_size: int, prefix: str, ndjson: bool) -> List[str]:
+    """Generate one shard in a worker process"""
+    generator = VectorizedOrderGenerator(seed=seed, first_id=first_id, end_date=end_date)
+    return generator.save_chunks_to_json(num_orders, output_dir, chunk_size, prefix, ndjson)
+
+
+class ShardedOrderGenerator:
+    """
+    Generates large reproducible datasets in parallel.
+
+    Orders are split into shards, each generated by a VectorizedOrderGenerator
+    in its own process. Shard seeds are spawned from one SeedSequence, so a
+    seed always yields the same corpus regardless of the number of workers,
+    and each shard owns a disjoint block of IDs, so no two shards produce
+    the same order, line item or customer ID. Customers are not shared
+    between shards.
+    """
+
+    def __init__(self, num_shards: int, seed: int = 0, first_id: int = 100000000, workers: Optional[int] = None,
+                 end_date: Optional[datetime] = None):
+        """
+        Initialize the generator
+
+        Args:
+            num_shards: Number of shards, each written to its own files
+            seed: Root seed of the corpus
+            first_id: First ID of the first shard's block
+            workers: Worker processes, one per CPU if omitted
+            end_date: End of the year orders are spread over; fix it for byte-identical corpora
+        """
+        self.num_shards = max(1, num_shards)
+        self.seed = seed
+        self.first_id = first_id
+        self.workers = workers
+        self.end_date = end_date
+
+    def shard_sizes(self, num_orders: int) -> List[int]:
+        """Split num_orders as evenly as possible across shards"""
+        base, extra = divmod(num_orders, self.num_shards)
+        return [base + (1 if shard < extra else 0) for shard in range(self.num_shards)]
+
+    def id_block_size(self, num_orders: int) -> int:
+        """IDs reserved per shard, enough for its orders, line items and customers"""
+        return max(self.shard_sizes(num_orders)) * MAX_LINE_ITEMS
+
+    def generate(self, num_orders: int, output_dir: str, chunk_size: int = 20000,
+                 prefix: str = "generated_orders", ndjson: bool = False) -> List[str]:
+        """
+        Generate the corpus
+
+        Args:
+            num_orders: Total number of orders
+            output_dir: Directory to write the files to
+            chunk_size: Orders per file
+            prefix: File name prefix, followed by the shard and chunk numbers
+            ndjson: Write .ndjson files, one order per line
+
+        Returns:
+            Paths of the written files, in shard order
+        """
+        sizes = self.shard_sizes(num_orders)
+        block_size = self.id_block_size(num_orders)
+        end_date = self.end_date or datetime.now()
+        seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(self.seed).spawn(self.num_shards)]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(_generate_shard, seeds[shard], self.first_id + shard * block_size, end_date, sizes[shard],
+                                output_dir, chunk_size, f"{prefix}_shard{shard:03d}", ndjson)
+                for shard in range(self.num_shards) if sizes[shard]
+            ]
+            return [path for future in futures for path in future.result()]
+
 
 def main():
-    """Example usage of the order generator"""
-    generator = ShopifyOrderGenerator()
-    orders = generator.generate_orders(50)
+    """Generate sample orders into the data directory"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--orders', type=int, default=50, help="Number of orders")
+    parser.add_argument('--vectorized', action='store_true', help="Use the vectorized generator, for large datasets")
+    parser.add_argument('--chunk-size', type=int, default=20000, help="Orders per file with --vectorized")
+    parser.add_argument('--seed', type=int, help="Random seed with --vectorized")
+    parser.add_argument('--end-date', type=datetime.fromisoformat,
+                        help="End of the year orders span with --vectorized, now if omitted; "
+                             "fix it with --seed to reproduce a dataset")
+    parser.add_argument('--shards', type=int, default=0, help="Generate vectorized shards in parallel processes")
+    parser.add_argument('--output-dir', default='data', help="Directory to write to")
+    parser.add_argument('--ndjson', action='store_true', help="Write NDJSON files, one order per line")
+    args = parser.parse_args()
+
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    json_file_path = f"data/generated_orders_{timestamp}.json"
-    generator.save_to_json(orders, json_file_path)
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.shards:
+        generator = ShardedOrderGenerator(args.shards, seed=args.seed or 0, end_date=args.end_date)
+        generator.generate(args.orders, args.output_dir, args.chunk_size, f"generated_orders_{timestamp}", args.ndjson)
+        return
+    if args.vectorized:
+        generator = VectorizedOrderGenerator(seed=args.seed, end_date=args.end_date)
+        generator.save_chunks_to_json(args.orders, args.output_dir, args.chunk_size, f"generated_orders_{timestamp}",
+                                      args.ndjson)
+        return
+    generator = ShopifyOrderGenerator()
+    orders = generator.generate_orders(args.orders)
+    suffix = NDJSON_SUFFIX if args.ndjson else JSON_SUFFIX
+    json_file_path = os.path.join(args.output_dir, f"generated_orders_{timestamp}{suffix}")
+    if args.ndjson:
+        generator.save_to_ndjson(orders, json_file_path)
+    else:
+        generator.save_to_json(orders, json_file_path)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
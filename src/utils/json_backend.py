@@ -0,0 +1,131 @@
+import os
+import json
+from typing import Any, Callable, Dict, List, Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Optional faster parsers, used when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# Backends in order of preference
+PREFERENCE = ('orjson', 'simdjson', 'json')
+
+JsonInput = Union[bytes, bytearray, memoryview, str]
+
+
+class JsonBackend:
+    """
+    A JSON parser and serializer pair.
+
+    Every backend parses to plain dicts, lists, strings and numbers, and
+    raises json.JSONDecodeError on invalid input, so results are the same
+    whichever backend is used. Serializers write UTF-8 with the same
+    separators: compact, or indented by two spaces.
+    """
+
+    def __init__(self, name: str, parse: Callable[[Any], Any], serialize: Callable[[Any, bool], bytes],
+                 accepts_buffer: bool = False):
+        """
+        Initialize the backend
+
+        Args:
+            name: Backend name
+            parse: Parses bytes or str into Python objects
+            serialize: Serializes an object to UTF-8 bytes, indented if the flag is set
+            accepts_buffer: Whether parse takes a memoryview without copying it to bytes
+        """
+        self.name = name
+        self._parse = parse
+        self._serialize = serialize
+        self.accepts_buffer = accepts_buffer
+
+    def loads(self, data: JsonInput) -> Any:
+        """Parse a JSON document"""
+        if isinstance(data, memoryview) and not self.accepts_buffer:
+            data = data.tobytes()
+        try:
+            return self._parse(data)
+        except json.JSONDecodeError:
+            raise
+        except ValueError as e:
+            raise json.JSONDecodeError(str(e), '', 0) from e
+
+    def dumps(self, obj: Any, indent: bool = False) -> bytes:
+        """Serialize an object to UTF-8 JSON, indented by two spaces if indent is set"""
+        return self._serialize(obj, indent)
+
+    def __repr__(self) -> str:
+        return f"JsonBackend({self.name!r})"
+
+
+def _stdlib_serialize(obj: Any, indent: bool) -> bytes:
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, check_circular=False).encode('utf-8')
+
+
+def _orjson_serialize(obj: Any, indent: bool) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+
+
+def _build_backends() -> Dict[str, JsonBackend]:
+    backends = {}
+    if orjson is not None:
+        backends['orjson'] = JsonBackend('orjson', orjson.loads, _orjson_serialize, accepts_buffer=True)
+    if simdjson is not None:
+        # pysimdjson only parses; serialize with orjson if present, else stdlib
+        serialize = _orjson_serialize if orjson is not None else _stdlib_serialize
+        backends['simdjson'] = JsonBackend('simdjson', simdjson.loads, serialize)
+    backends['json'] = JsonBackend('json', json.loads, _stdlib_serialize)
+    return backends
+
+
+_BACKENDS = _build_backends()
+
+
+def available_backends() -> List[str]:
+    """Names of the installed backends, fastest first"""
+    return [name for name in PREFERENCE if name in _BACKENDS]
+
+
+def get_backend(name: Optional[str] = None) -> JsonBackend:
+    """
+    Get a backend by name, or the fastest installed one
+
+    Args:
+        name: Backend name, the JSON_BACKEND environment variable or the
+            fastest installed backend if omitted
+
+    Raises:
+        ValueError: If the named backend is not installed
+    """
+    name = name or os.getenv('JSON_BACKEND')
+    if not name:
+        return _BACKENDS[available_backends()[0]]
+    if name not in _BACKENDS:
+        raise ValueError(f"JSON backend {name!r} is not installed, available: {', '.join(available_backends())}")
+    return _BACKENDS[name]
+
+
+def set_backend(name: Optional[str] = None) -> JsonBackend:
+    """Switch the process-wide backend, see get_backend"""
+    global backend, loads, dumps
+    backend = get_backend(name)
+    loads = backend.loads
+    dumps = backend.dumps
+    logger.debug(f"Using JSON backend {backend.name}")
+    return backend
+
+
+# Process-wide backend, read at call time as json_backend.loads / json_backend.dumps
+backend = loads = dumps = None
+set_backend()
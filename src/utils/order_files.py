@@ -0,0 +1,370 @@
+import os
+import io
+import gzip
+import json
+import mmap
+import codecs
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import logging
+import zstandard
+from src.utils import json_backend
+
+logger = logging.getLogger(__name__)
+
+# Order files are either one {"orders": [...]} document or NDJSON, one order per line,
+# optionally gzip or zstd compressed
+JSON_SUFFIX = '.json'
+NDJSON_SUFFIX = '.ndjson'
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+ORDER_FILE_SUFFIXES = tuple(
+    f"{suffix}{compression}"
+    for suffix in (JSON_SUFFIX, NDJSON_SUFFIX)
+    for compression in ('',) + COMPRESSED_SUFFIXES
+)
+ORDER_FILE_PATTERNS = tuple(f"*{suffix}" for suffix in ORDER_FILE_SUFFIXES)
+
+# Codecs are detected from the leading bytes, whatever the file is called
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Bytes decompressed and decoded per read when parsing incrementally
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Uncompressed JSON documents up to this size are parsed whole rather than order by order
+WHOLE_DOCUMENT_MAX_BYTES = 64 * 1024 * 1024
+
+PathLike = Union[str, Path]
+
+
+def _strip_compression(path: PathLike) -> str:
+    name = str(path)
+    for compression in COMPRESSED_SUFFIXES:
+        if name.endswith(compression):
+            return name[:-len(compression)]
+    return name
+
+
+def is_ndjson(path: PathLike) -> bool:
+    """Whether a path names an NDJSON order file, compressed or not"""
+    return _strip_compression(path).endswith(NDJSON_SUFFIX)
+
+
+def is_order_file(path: PathLike) -> bool:
+    """Whether a path names an order file in any supported format"""
+    return str(path).endswith(ORDER_FILE_SUFFIXES)
+
+
+def detect_codec(path: PathLike) -> Optional[str]:
+    """
+    Detect the compression of a file from its magic bytes
+
+    Returns:
+        'gzip', 'zstd', or None for uncompressed files
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(ZSTD_MAGIC))
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+
+def map_file(path: PathLike) -> BinaryIO:
+    """
+    Memory-map a file read-only
+
+    The mapping reads like a binary file, but its pages come straight from
+    the page cache: reads copy only the bytes asked for, with no read
+    buffer or text decoding in between. Empty files, which cannot be
+    mapped, come back as an empty stream.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return io.BytesIO()
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        # Order files are read front to back once; let the kernel read ahead and drop behind
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return mapped
+
+
+def open_order_file(path: PathLike) -> BinaryIO:
+    """
+    Open an order file for reading, decompressing on the fly
+
+    Nothing is written to disk; the returned stream yields the decompressed
+    bytes as they are read. Uncompressed files are memory-mapped.
+    """
+    codec = detect_codec(path)
+    if codec == 'gzip':
+        return gzip.open(path, 'rb')
+    if codec == 'zstd':
+        return io.BufferedReader(_ZstdReader(path), buffer_size=READ_CHUNK_SIZE)
+    return map_file(path)
+
+
+class _ZstdReader(io.RawIOBase):
+    """
+    Streaming zstd decompression of one frame
+
+    zstandard's stream reader ends quietly where a file is cut short; this
+    raises EOFError instead, as gzip does, so a parse never mistakes a file
+    still being written for a complete one.
+    """
+
+    def __init__(self, path: PathLike):
+        self._file = open(path, 'rb')
+        self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+        self._pending = memoryview(b'')
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            if self._decompressor.eof:
+                return 0
+            chunk = self._file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise EOFError("Compressed file ended before the end-of-frame marker was reached")
+            self._pending = memoryview(self._decompressor.decompress(chunk))
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+# Bytes from the end of a file checked for a complete last line or document
+TAIL_BYTES = 64
+
+
+def is_complete(path: PathLike) -> bool:
+    """
+    Whether an order file looks fully written, from its last bytes only
+
+    NDJSON must end with a newline and a JSON document with its closing
+    bracket. Compressed files are not decompressed to check: a stream cut
+    short is only found by parsing it, so they always pass.
+    """
+    if detect_codec(path) is not None:
+        return True
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(max(size - TAIL_BYTES, 0))
+        tail = f.read()
+    if is_ndjson(path):
+        return tail.endswith(b'\n')
+    return tail.rstrip().endswith((b'}', b']'))
+
+
+def write_ndjson(orders: Iterable[Dict[str, Any]], path: PathLike, append: bool = False) -> int:
+    """
+    Write orders to an NDJSON file, one compact JSON document per line
+
+    Orders are encoded one at a time, so any iterable, including a generator
+    of chunks flattened on the fly, can be written without holding it all.
+
+    Args:
+        orders: Orders to write
+        path: Destination file
+        append: Append to the file instead of replacing it
+
+    Returns:
+        Number of orders written
+    """
+    dumps = json_backend.dumps
+    count = 0
+    with open(path, 'ab' if append else 'wb') as f:
+        for order in orders:
+            f.write(dumps(order))
+            f.write(b'\n')
+            count += 1
+    return count
+
+
+def byte_ranges(path: PathLike, num_splits: int) -> List[Tuple[int, int]]:
+    """
+    Split a file into num_splits contiguous byte ranges of about equal size
+
+    Ranges need not fall on line boundaries; iter_ndjson assigns every line
+    to the range its first byte falls in.
+
+    Returns:
+        List of (start, end) offsets, end exclusive
+    """
+    size = os.path.getsize(path)
+    num_splits = max(1, min(num_splits, size))
+    bounds = [size * split // num_splits for split in range(num_splits + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_ndjson(path: PathLike, start: int = 0, end: Optional[int] = None,
+                skip_invalid: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Parse the NDJSON lines starting within a byte range
+
+    A line belongs to the range containing its first byte, so reading the
+    ranges of byte_ranges in parallel parses every line exactly once.
+    Blank lines are skipped. Compressed files cannot be split and are
+    always read whole, with offsets counted in decompressed bytes.
+
+    Args:
+        path: NDJSON file
+        start: First byte of the range
+        end: End of the range (exclusive), the end of the file if None
+        skip_invalid: Log and skip lines that are not valid JSON instead of raising
+
+    Yields:
+        Parsed orders
+    """
+    compressed = detect_codec(path) is not None
+    if compressed and (start > 0 or end is not None):
+        raise ValueError(f"Cannot read a byte range of compressed file {path}")
+    with open_order_file(path) as f:
+        if start > 0:
+            # Skip the line in progress at start; it belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        position = start if compressed else f.tell()
+        while end is None or position < end:
+            line = f.readline()
+            if not line:
+                break
+            line_start = position
+            position += len(line)
+            if not line.strip():
+                continue
+            try:
+                yield json_backend.loads(line)
+            except json.JSONDecodeError as e:
+                message = f"Invalid JSON in {path} at byte {line_start}: {str(e)}"
+                if not skip_invalid:
+                    raise ValueError(message) from e
+                logger.error(message)
+
+
+class _IncrementalReader:
+    """Decodes a binary stream into a text buffer on demand for raw_decode"""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.decode = json.JSONDecoder().raw_decode
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Read another chunk, dropping the consumed part of the buffer; False at end of stream"""
+        if self.eof:
+            return False
+        chunk = self.stream.read(READ_CHUNK_SIZE)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk, final=self.eof)
+        self.pos = 0
+        return bool(chunk)
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, '' at end of stream"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode the next JSON value, reading more until it is complete"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end < len(self.buffer) or self.eof:
+                self.pos = end
+                return value
+            self.fill()
+
+
+def iter_json_orders(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """
+    Parse the orders of a {"orders": [...]} document incrementally
+
+    Orders are decoded one at a time as the stream is read, so only the
+    current order and one read chunk are held in memory. Keys other than
+    'orders' are skipped, and reading stops at the end of the orders array.
+
+    Raises:
+        json.JSONDecodeError: If the document is malformed or truncated
+    """
+    reader = _IncrementalReader(stream)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key != 'orders':
+            reader.value()
+        else:
+            reader.expect('[')
+            if reader.peek() == ']':
+                return
+            while True:
+                yield reader.value()
+                if reader.expect(',]') == ']':
+                    return
+        if reader.expect(',}') == '}':
+            return
+
+
+def load_document(path: PathLike) -> Any:
+    """
+    Parse a whole JSON file with the process-wide backend
+
+    Backends that accept buffers parse uncompressed files straight from the
+    memory map, without copying them to bytes first.
+    """
+    with open_order_file(path) as f:
+        if isinstance(f, mmap.mmap) and json_backend.backend.accepts_buffer:
+            with memoryview(f) as view:
+                return json_backend.loads(view)
+        return json_backend.loads(f.read())
+
+
+def iter_orders(path: PathLike) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate the orders of a file in any supported format, compressed or not
+
+    Uncompressed documents up to WHOLE_DOCUMENT_MAX_BYTES are parsed whole
+    with the process-wide backend. Larger or compressed ones are always
+    parsed order by order, so memory stays bounded by one order and one read
+    chunk whichever backend is selected.
+    """
+    if is_ndjson(path):
+        yield from iter_ndjson(path)
+        return
+    if detect_codec(path) or os.path.getsize(path) > WHOLE_DOCUMENT_MAX_BYTES:
+        with open_order_file(path) as f:
+            yield from iter_json_orders(f)
+        return
+    data = load_document(path)
+    if not isinstance(data, dict):
+        raise json.JSONDecodeError(f"Expected an object, got {type(data).__name__}", str(path), 0)
+    yield from data.get('orders', [])